@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 from lightrag.kg.postgres_impl import PostgreSQLDB, PGKVStorage
 from lightrag.kg.json_kv_impl import JsonKVStorage
 from lightrag.namespace import NameSpace
+from lightrag.utils import make_cache_key
 
 load_dotenv()
 ROOT_DIR = os.environ.get("ROOT_DIR")
@@ -60,9 +61,7 @@ async def copy_from_postgres_to_json():
         _id = c_id["id"]
         postgres_db.workspace = workspace
         obj = await from_llm_response_cache.get_by_mode_and_id(mode, _id)
-        if mode not in kv:
-            kv[mode] = {}
-        kv[mode][_id] = obj[_id]
+        kv[make_cache_key(mode, _id)] = obj[_id]
         print(f"Object {obj}")
     await to_llm_response_cache.upsert(kv)
     await to_llm_response_cache.index_done_callback()
@@ -85,13 +84,10 @@ async def copy_from_json_to_postgres():
         db=postgres_db,
     )
 
-    for mode in await from_llm_response_cache.all_keys():
-        print(f"Copying {mode}")
-        caches = await from_llm_response_cache.get_by_id(mode)
-        for k, v in caches.items():
-            item = {mode: {k: v}}
-            print(f"\tCopying {item}")
-            await to_llm_response_cache.upsert(item)
+    for cache_key, v in (await from_llm_response_cache.get_all()).items():
+        item = {cache_key: v}
+        print(f"\tCopying {item}")
+        await to_llm_response_cache.upsert(item)
 
 
 if __name__ == "__main__":
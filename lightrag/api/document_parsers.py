@@ -0,0 +1,89 @@
+"""
+Parsers extracting the text content of binary document files (PDF, DOCX, PPTX, XLSX).
+
+The parsers are CPU-bound and run in the CPU worker pool of LightRAG, this module only
+imports what the parsers need so that worker processes start quickly.
+"""
+
+from io import BytesIO
+from pathlib import Path
+
+import pipmaster as pm
+
+
+def _parse_with_docling(file_path: Path) -> str:
+    if not pm.is_installed("docling"):  # type: ignore
+        pm.install("docling")
+    from docling.document_converter import DocumentConverter  # type: ignore
+
+    converter = DocumentConverter()
+    result = converter.convert(file_path)
+    return result.document.export_to_markdown()
+
+
+def parse_document_file(
+    file: bytes, file_path: Path, ext: str, document_loading_engine: str
+) -> str:
+    """Extract the text content of a PDF, DOCX, PPTX or XLSX file
+
+    Args:
+        file: Content of the file
+        file_path: Path to the saved file, used by the DOCLING engine
+        ext: Lower case file extension
+        document_loading_engine: "DOCLING" or "DEFAULT"
+
+    Returns:
+        str: Text content of the file
+    """
+    content = ""
+    if document_loading_engine == "DOCLING":
+        return _parse_with_docling(file_path)
+
+    match ext:
+        case ".pdf":
+            if not pm.is_installed("pypdf2"):  # type: ignore
+                pm.install("pypdf2")
+            from PyPDF2 import PdfReader  # type: ignore
+
+            pdf_file = BytesIO(file)
+            reader = PdfReader(pdf_file)
+            for page in reader.pages:
+                content += page.extract_text() + "\n"
+        case ".docx":
+            if not pm.is_installed("python-docx"):  # type: ignore
+                try:
+                    pm.install("python-docx")
+                except Exception:
+                    pm.install("docx")
+            from docx import Document  # type: ignore
+
+            docx_file = BytesIO(file)
+            doc = Document(docx_file)
+            content = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        case ".pptx":
+            if not pm.is_installed("python-pptx"):  # type: ignore
+                pm.install("pptx")
+            from pptx import Presentation  # type: ignore
+
+            pptx_file = BytesIO(file)
+            prs = Presentation(pptx_file)
+            for slide in prs.slides:
+                for shape in slide.shapes:
+                    if hasattr(shape, "text"):
+                        content += shape.text + "\n"
+        case ".xlsx":
+            if not pm.is_installed("openpyxl"):  # type: ignore
+                pm.install("openpyxl")
+            from openpyxl import load_workbook  # type: ignore
+
+            xlsx_file = BytesIO(file)
+            wb = load_workbook(xlsx_file)
+            for sheet in wb:
+                content += f"Sheet: {sheet.title}\n"
+                for row in sheet.iter_rows(values_only=True):
+                    content += (
+                        "\t".join(str(cell) if cell is not None else "" for cell in row)
+                        + "\n"
+                    )
+                content += "\n"
+    return content
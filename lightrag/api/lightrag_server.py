@@ -469,6 +469,11 @@ def create_app(args):
                 },
                 "auth_mode": auth_mode,
                 "pipeline_busy": pipeline_status.get("busy", False),
+                "embedding_vector_cache": (
+                    rag.embedding_vector_cache.stats()
+                    if rag.embedding_vector_cache is not None
+                    else None
+                ),
                 "core_version": core_version,
                 "api_version": __api_version__,
                 "webui_title": webui_title,
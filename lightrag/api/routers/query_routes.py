@@ -83,6 +83,12 @@ class QueryRequest(BaseModel):
         description="User-provided prompt for the query. If provided, this will be used instead of the default value from prompt template.",
     )
 
+    retrieval_timeout: Optional[float] = Field(
+        ge=0,
+        default=None,
+        description="Seconds each retrieval branch of hybrid and mix queries may take before it is dropped, 0 for no limit.",
+    )
+
     @field_validator("query", mode="after")
     @classmethod
     def query_strip_after(cls, query: str) -> str:
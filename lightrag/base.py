@@ -5,6 +5,7 @@ from enum import Enum
 import os
 from dotenv import load_dotenv
 from dataclasses import dataclass, field
+import numpy as np
 from typing import (
     Any,
     Literal,
@@ -12,7 +13,7 @@ from typing import (
     TypeVar,
     Callable,
 )
-from .utils import EmbeddingFunc
+from .utils import EmbeddingFunc, make_cache_key
 from .types import KnowledgeGraph
 
 # use the .env that is inside the current folder
@@ -98,6 +99,9 @@ class QueryParam:
     If proivded, this will be use instead of the default vaulue from prompt template.
     """
 
+    retrieval_timeout: float = float(os.getenv("RETRIEVAL_BRANCH_TIMEOUT", "0"))
+    """Seconds each retrieval branch (local, global, vector) of hybrid and mix queries may take before it is dropped from the context, 0 for no limit."""
+
 
 @dataclass
 class StorageNameSpace(ABC):
@@ -155,10 +159,23 @@ class BaseVectorStorage(StorageNameSpace, ABC):
     ) -> list[dict[str, Any]]:
         """Query the vector storage and retrieve top_k results."""
 
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
+        """Query the vector storage with a precomputed query embedding.
+
+        Storages that cannot search by vector do not override it, callers then fall
+        back to query().
+        """
+        raise NotImplementedError
+
     @abstractmethod
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         """Insert or update vectors in the storage.
 
+        Storages keeping a content hash per id (NanoVectorDB, Faiss) only embed the records
+        whose content changed, unchanged records just get their metadata updated.
+
         Importance notes for in-memory storage:
         1. Changes will be persisted to disk during the next index_done_callback
         2. Only one process should updating the storage at a time before index_done_callback,
@@ -239,6 +256,28 @@ class BaseKVStorage(StorageNameSpace, ABC):
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Return un-exist keys"""
 
+    async def get_by_mode_and_id(self, mode: str, id: str) -> dict[str, Any] | None:
+        """Get an LLM response cache entry by its cache mode and args hash
+
+        Cache entries are stored one record per entry under the flat key
+        make_cache_key(mode, id), storages with another layout override this.
+
+        Returns:
+            {id: entry} if the entry exists, otherwise None
+        """
+        entry = await self.get_by_id(make_cache_key(mode, id))
+        return {id: entry} if entry is not None else None
+
+    async def get_by_mode(self, mode: str) -> dict[str, dict[str, Any]]:
+        """Get all LLM response cache entries of a cache mode, keyed by their args hash
+
+        Used by the embedding similarity cache and the query cache size bound, the
+        storages not supporting it raise NotImplementedError.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support listing cache entries by mode"
+        )
+
     @abstractmethod
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         """Upsert data
@@ -295,7 +334,9 @@ class BaseGraphStorage(StorageNameSpace, ABC):
         """
 
     @abstractmethod
-    async def has_edge(self, source_node_id: str, target_node_id: str, **kwargs: Any) -> bool:
+    async def has_edge(
+        self, source_node_id: str, target_node_id: str, **kwargs: Any
+    ) -> bool:
         """Check if an edge exists between two nodes.
 
         Args:
@@ -330,7 +371,9 @@ class BaseGraphStorage(StorageNameSpace, ABC):
         """
 
     @abstractmethod
-    async def get_node(self, node_id: str, case_insensitive: bool = False) -> dict[str, str] | None:
+    async def get_node(
+        self, node_id: str, case_insensitive: bool = False
+    ) -> dict[str, str] | None:
         """Get node by its ID, returning only node properties.
 
         Args:
@@ -380,6 +423,25 @@ class BaseGraphStorage(StorageNameSpace, ABC):
                 result[node_id] = node
         return result
 
+    async def get_nodes_batch_case_insensitive(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        """Get nodes as a batch, matching node IDs case-insensitively
+
+        The result is keyed by the requested node ID, the stored node ID is
+        available in the `entity_id` property of the returned node.
+
+        Default implementation fetches nodes one by one.
+        Override this method for better performance in storage backends
+        that support batch operations.
+        """
+        result = {}
+        for node_id in node_ids:
+            node = await self.get_node(node_id, case_insensitive=True)
+            if node is not None:
+                result[node_id] = node
+        return result
+
     async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
         """Node degrees as a batch using UNWIND
 
@@ -413,6 +475,9 @@ class BaseGraphStorage(StorageNameSpace, ABC):
     ) -> dict[tuple[str, str], dict]:
         """Get edges as a batch using UNWIND
 
+        A pair may carry an optional "source_project" key to restrict the match
+        to edges of that project.
+
         Default implementation fetches edges one by one.
         Override this method for better performance in storage backends
         that support batch operations.
@@ -421,7 +486,12 @@ class BaseGraphStorage(StorageNameSpace, ABC):
         for pair in pairs:
             src_id = pair["src"]
             tgt_id = pair["tgt"]
-            edge = await self.get_edge(src_id, tgt_id)
+            if "source_project" in pair:
+                edge = await self.get_edge(
+                    src_id, tgt_id, source_project=pair["source_project"]
+                )
+            else:
+                edge = await self.get_edge(src_id, tgt_id)
             if edge is not None:
                 result[(src_id, tgt_id)] = edge
         return result
@@ -472,6 +542,34 @@ class BaseGraphStorage(StorageNameSpace, ABC):
             edge_data: A dictionary of edge properties
         """
 
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """Insert or update multiple nodes in the graph.
+
+        Default implementation upserts nodes one by one.
+        Override this method for better performance in storage backends
+        that support batch operations.
+
+        Args:
+            nodes: List of (node_id, node_data) tuples
+        """
+        for node_id, node_data in nodes:
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, Any]]]
+    ) -> None:
+        """Insert or update multiple edges in the graph.
+
+        Default implementation upserts edges one by one.
+        Override this method for better performance in storage backends
+        that support batch operations.
+
+        Args:
+            edges: List of (source_node_id, target_node_id, edge_data) tuples
+        """
+        for source_node_id, target_node_id, edge_data in edges:
+            await self.upsert_edge(source_node_id, target_node_id, edge_data)
+
     @abstractmethod
     async def delete_node(self, node_id: str) -> None:
         """Delete a node from the graph.
@@ -574,6 +672,10 @@ class DocProcessingStatus:
     """ISO format timestamp when document was last updated"""
     chunks_count: int | None = None
     """Number of chunks after splitting, used for processing"""
+    chunks_done: int | None = None
+    """Number of chunks with a stored extraction result, used to resume processing"""
+    chunks_list: list[str] | None = None
+    """Ids of the chunks of the document, used for incremental updates"""
     error: str | None = None
     """Error message if failed"""
     metadata: dict[str, Any] = field(default_factory=dict)
@@ -12,6 +12,42 @@ DEFAULT_FORCE_LLM_SUMMARY_ON_MERGE = 6
 DEFAULT_WOKERS = 2
 DEFAULT_TIMEOUT = 150
 
+# Number of optimistic merge attempts before summarizing under the graph lock
+MAX_MERGE_ATTEMPTS = 3
+
+# Seconds a packed extraction prompt waits for more small chunks before it is sent
+EXTRACT_PACK_LINGER = 0.1
+
+# Adaptive gleaning: minimum new entities and relations per extra LLM call of a gleaning round,
+# number of recent samples per round the yield is averaged over, and how often a skipped round is probed
+DEFAULT_GLEANING_YIELD_THRESHOLD = 0.5
+GLEANING_YIELD_WINDOW = 20
+GLEANING_PROBE_INTERVAL = 10
+
+# Number of lock stripes the graph database lock is sharded into by entity name,
+# and maximum number of entity names a merge locks at once
+GRAPH_DB_LOCK_STRIPES = 256
+GRAPH_DB_LOCK_GROUP_SIZE = 8
+
+# Near-duplicate document detection defaults
+# Estimated Jaccard similarity of the shingle sets
+DEFAULT_NEAR_DUPLICATE_THRESHOLD = 0.9
+DEFAULT_MINHASH_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5  # Words per shingle
+
+# Default maximum number of vectors in the persistent embedding cache
+DEFAULT_EMBEDDING_VECTOR_CACHE_MAX_ENTRIES = 100000
+
+# Default maximum number of cached query answers per query mode, 0 disables the bound
+DEFAULT_QUERY_CACHE_MAX_ENTRIES = 10000
+
+# Default size and time to live in seconds of the in-memory retrieval context cache
+DEFAULT_RETRIEVAL_CACHE_MAX_ENTRIES = 1000
+DEFAULT_RETRIEVAL_CACHE_TTL = 300
+
+# Number of texts whose token counts are memoized for the query context truncation
+TOKEN_COUNT_CACHE_SIZE = 100000
+
 # Logging configuration defaults
 DEFAULT_LOG_MAX_BYTES = 10485760  # Default 10MB
 DEFAULT_LOG_BACKUP_COUNT = 5  # Default 5 backups
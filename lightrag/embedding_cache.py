@@ -0,0 +1,264 @@
+"""
+Persistent content-addressed cache of embedding vectors.
+
+Vectors are keyed by the SHA-256 of the embedded text and stored as float16 rows of a
+memory-mapped array file in the working dir, one file per embedding model and dimension,
+so every vector namespace embedding the same text shares the same cache row. An index
+file maps the keys to their rows in least recently used order, the least recently used
+rows are reused once the cache reaches its maximum number of entries. A tag file holds a
+64-bit tag of the key of every row, which is checked around every read so that a row
+reused by another process since the index was loaded is never returned for the old key.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable
+
+import numpy as np
+
+from lightrag.kg.shared_storage import get_storage_lock
+from lightrag.utils import load_json, logger, write_json
+
+# Rows added to the vector file at least whenever it grows
+_MIN_GROW_ROWS = 1024
+
+
+class EmbeddingVectorCache:
+    """LRU cache of embedding vectors persisted in a float16 memmap and a JSON index
+
+    New vectors are kept in memory until flush(), which assigns them rows, writes them to
+    the memmap and rewrites the index under the shared storage lock. Lookups reload the
+    index when another process flushed it, and read rows without the lock: a row whose
+    tag does not match the key before and after copying it counts as a miss.
+    """
+
+    def __init__(
+        self,
+        working_dir: str,
+        model_name: str,
+        embedding_dim: int,
+        max_entries: int,
+        save_interval: int = 256,
+    ):
+        self.model_name = model_name
+        self.embedding_dim = embedding_dim
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+
+        safe_model_name = re.sub(r"[^\w.-]+", "_", model_name) or "default"
+        base_name = os.path.join(
+            working_dir, f"embedding_cache_{safe_model_name}_{embedding_dim}"
+        )
+        self._vector_file = base_name + ".f16"
+        self._tag_file = base_name + ".tags"
+        self._index_file = base_name + ".index.json"
+
+        self._vectors: np.memmap | None = None
+        self._tags: np.memmap | None = None
+        self._rows: OrderedDict[str, int] = OrderedDict()
+        self._pending: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._loaded_mtime: float | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._pending)
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _tag(key: str) -> int:
+        # Tag 0 marks a row being written
+        return int(key[:16], 16) or 1
+
+    @staticmethod
+    def _ensure_size(file_name: str, size: int) -> None:
+        if not os.path.exists(file_name):
+            with open(file_name, "wb"):
+                pass
+        if os.path.getsize(file_name) < size:
+            with open(file_name, "r+b") as f:
+                f.truncate(size)
+
+    def _open_vectors(self, capacity: int) -> None:
+        self._ensure_size(self._vector_file, capacity * self.embedding_dim * 2)
+        self._ensure_size(self._tag_file, capacity * 8)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._tags.flush()
+        self._vectors = np.memmap(
+            self._vector_file,
+            dtype=np.float16,
+            mode="r+",
+            shape=(capacity, self.embedding_dim),
+        )
+        self._tags = np.memmap(
+            self._tag_file, dtype=np.uint64, mode="r+", shape=(capacity,)
+        )
+
+    def _read_row(self, row: int, key: str) -> np.ndarray | None:
+        """Copy of the vector of key at row, None if the row holds another key"""
+        tag = self._tag(key)
+        if row >= self._tags.shape[0] or self._tags[row] != tag:
+            return None
+        vector = np.array(self._vectors[row], dtype=np.float32)
+        if self._tags[row] != tag:
+            return None
+        return vector
+
+    def load(self) -> None:
+        """(Re)load the index file if it changed since it was last loaded or saved"""
+        if not os.path.exists(self._index_file):
+            return
+        mtime = os.path.getmtime(self._index_file)
+        if mtime == self._loaded_mtime:
+            return
+
+        data = load_json(self._index_file) or {}
+        self._loaded_mtime = mtime
+        if (
+            data.get("embedding_dim") != self.embedding_dim
+            or not os.path.exists(self._vector_file)
+            or not os.path.exists(self._tag_file)
+        ):
+            logger.warning(
+                f"Embedding cache {self._index_file} does not match its vector file, starting a new cache"
+            )
+            self._rows = OrderedDict()
+            return
+        self._rows = OrderedDict(data.get("rows", []))
+        capacity = os.path.getsize(self._vector_file) // (self.embedding_dim * 2)
+        self._open_vectors(capacity)
+        logger.debug(f"Loaded embedding cache with {len(self._rows)} vectors")
+
+    def lookup(self, texts: list[str]) -> list[np.ndarray | None]:
+        """Return the cached vector of every text, None for the texts not cached"""
+        self.load()
+        results: list[np.ndarray | None] = []
+        for text in texts:
+            key = self.key(text)
+            vector = self._pending.get(key)
+            if vector is not None:
+                vector = np.asarray(vector, dtype=np.float32)
+            elif key in self._rows:
+                vector = self._read_row(self._rows[key], key)
+                if vector is None:
+                    # The row was reused by another process since the index was loaded
+                    del self._rows[key]
+                else:
+                    self._rows.move_to_end(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            results.append(vector)
+        return results
+
+    def store(self, texts: list[str], vectors: np.ndarray) -> None:
+        """Add the vectors of texts, they are persisted by the next flush()"""
+        for text, vector in zip(texts, vectors):
+            self._pending[self.key(text)] = np.asarray(vector, dtype=np.float16)
+
+    async def flush(self) -> None:
+        """Persist the pending vectors under the shared storage lock"""
+        if self._pending:
+            async with get_storage_lock():
+                self.save()
+
+    def save(self) -> None:
+        """Write the pending vectors to the memmap, evicting the least recently used"""
+        if not self._pending:
+            return
+        self.load()
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        needed = min(len(self._rows) + len(self._pending), self.max_entries)
+        if needed > capacity:
+            self._open_vectors(
+                min(max(needed, capacity * 2, _MIN_GROW_ROWS), self.max_entries)
+            )
+            capacity = self._vectors.shape[0]
+
+        used_rows = set(self._rows.values())
+        free_rows = (row for row in range(capacity) if row not in used_rows)
+        pending = list(self._pending.items())[-self.max_entries :]
+        for key, vector in pending:
+            if key in self._rows:
+                row = self._rows[key]
+                self._rows.move_to_end(key)
+            else:
+                row = next(free_rows, None)
+                if row is None:
+                    _, row = self._rows.popitem(last=False)
+                self._rows[key] = row
+            # Invalidate the row while it is written, lookups of other processes read it
+            # without the lock
+            self._tags[row] = 0
+            self._vectors[row] = vector
+            self._tags[row] = self._tag(key)
+        self._pending.clear()
+
+        self._vectors.flush()
+        self._tags.flush()
+        write_json(
+            {
+                "model_name": self.model_name,
+                "embedding_dim": self.embedding_dim,
+                "rows": list(self._rows.items()),
+            },
+            self._index_file,
+        )
+        self._loaded_mtime = os.path.getmtime(self._index_file)
+        logger.debug(f"Embedding cache saved: {self.stats()}")
+
+    def stats(self) -> dict[str, Any]:
+        """Hit-rate metrics of this process and the cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+    def wrap(self, embedding_func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap an embedding function so that only the texts not cached are embedded
+
+        Keyword arguments such as _priority are passed on to the wrapped function for the
+        texts it embeds. The new vectors are flushed every save_interval vectors.
+        """
+
+        @wraps(embedding_func)
+        async def cached_embedding_func(texts: list[str], *args, **kwargs):
+            if not texts:
+                return await embedding_func(texts, *args, **kwargs)
+            cached = self.lookup(texts)
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            if not missing:
+                return np.stack(cached)
+
+            embedded = await embedding_func(
+                [texts[i] for i in missing], *args, **kwargs
+            )
+            embedded = np.asarray(embedded)
+            self.store([texts[i] for i in missing], embedded)
+            if len(self._pending) >= self.save_interval:
+                await self.flush()
+
+            result = np.empty((len(texts), embedded.shape[1]), dtype=embedded.dtype)
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    result[i] = vector
+            result[missing] = embedded
+            return result
+
+        cached_embedding_func.embedding_cache = self
+        return cached_embedding_func
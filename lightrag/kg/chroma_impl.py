@@ -167,15 +167,19 @@ class ChromaVectorDBStorage(BaseVectorStorage):
     async def query(
         self, query: str, top_k: int, ids: list[str] | None = None
     ) -> list[dict[str, Any]]:
-        try:
-            embedding = await self.embedding_func(
-                [query], _priority=5
-            )  # higher priority for query
+        embedding = await self.embedding_func(
+            [query], _priority=5
+        )  # higher priority for query
+        return await self.query_by_vector(embedding[0], top_k, ids)
 
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
+        try:
             results = self._collection.query(
-                query_embeddings=embedding.tolist()
-                if not isinstance(embedding, list)
-                else embedding,
+                query_embeddings=[
+                    embedding.tolist() if not isinstance(embedding, list) else embedding
+                ],
                 n_results=top_k * 2,  # Request more results to allow for filtering
                 include=["metadatas", "distances", "documents"],
             )
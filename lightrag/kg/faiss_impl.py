@@ -61,6 +61,8 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # Keep a local store for metadata, IDs, etc.
         # Maps <int faiss_id> → metadata (including your original ID).
         self._id_to_meta = {}
+        # Maps <custom id> → <int faiss_id>, kept in sync with _id_to_meta
+        self._custom_id_to_fid = {}
 
         self._load_faiss_index()
 
@@ -81,8 +83,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
                     f"Process {os.getpid()} FAISS reloading {self.namespace} due to update by another process"
                 )
                 # Reload data
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
+                self._reset_index()
                 self._load_faiss_index()
                 self.storage_updated.value = False
             return self._index
@@ -109,16 +110,28 @@ class FaissVectorDBStorage(BaseVectorStorage):
 
         current_time = int(time.time())
 
-        # Prepare data for embedding
+        # Prepare data for embedding, reusing the stored vectors of records
+        # whose content did not change
         list_data = []
+        vectors = []
         contents = []
         for k, v in data.items():
             # Store only known meta fields if needed
             meta = {mf: v[mf] for mf in self.meta_fields if mf in v}
             meta["__id__"] = k
             meta["__created_at__"] = current_time
+            meta["__content_hash__"] = compute_mdhash_id(v["content"])
             list_data.append(meta)
-            contents.append(v["content"])
+            stored = self._id_to_meta.get(self._custom_id_to_fid.get(k))
+            if stored and stored.get("__content_hash__") == meta["__content_hash__"]:
+                vectors.append(stored["__vector__"])
+            else:
+                vectors.append(None)
+                contents.append(v["content"])
+        if len(contents) < len(list_data):
+            logger.debug(
+                f"FAISS: Skipped embedding of {len(list_data) - len(contents)} unchanged records in {self.namespace}"
+            )
 
         # Split into batches for embedding if needed
         batches = [
@@ -130,16 +143,25 @@ class FaissVectorDBStorage(BaseVectorStorage):
         embeddings_list = await asyncio.gather(*embedding_tasks)
 
         # Flatten the list of arrays
-        embeddings = np.concatenate(embeddings_list, axis=0)
-        if len(embeddings) != len(list_data):
+        new_embeddings = (
+            np.concatenate(embeddings_list, axis=0)
+            if embeddings_list
+            else np.empty((0, self._dim))
+        )
+        if len(new_embeddings) != len(contents):
             logger.error(
-                f"Embedding size mismatch. Embeddings: {len(embeddings)}, Data: {len(list_data)}"
+                f"Embedding size mismatch. Embeddings: {len(new_embeddings)}, Data: {len(contents)}"
             )
             return []
 
         # Convert to float32 and normalize embeddings for cosine similarity (in-place)
-        embeddings = embeddings.astype(np.float32)
-        faiss.normalize_L2(embeddings)
+        new_embeddings = new_embeddings.astype(np.float32)
+        faiss.normalize_L2(new_embeddings)
+        new_vectors = iter(new_embeddings)
+        embeddings = np.array(
+            [v if v is not None else next(new_vectors) for v in vectors],
+            dtype=np.float32,
+        )
 
         # Upsert logic:
         # 1. Identify which vectors to remove if they exist
@@ -165,6 +187,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
             # Store the raw vector so we can rebuild if something is removed
             meta["__vector__"] = embeddings[i].tolist()
             self._id_to_meta.update({fid: meta})
+            self._custom_id_to_fid[meta["__id__"]] = fid
 
         logger.info(f"Upserted {len(list_data)} vectors into Faiss index.")
         return [m["__id__"] for m in list_data]
@@ -178,13 +201,17 @@ class FaissVectorDBStorage(BaseVectorStorage):
         embedding = await self.embedding_func(
             [query], _priority=5
         )  # higher priority for query
-        # embedding is shape (1, dim)
-        embedding = np.array(embedding, dtype=np.float32)
-        faiss.normalize_L2(embedding)  # we do in-place normalization
-
         logger.info(
             f"Query: {query}, top_k: {top_k}, threshold: {self.cosine_better_than_threshold}"
         )
+        return await self.query_by_vector(embedding[0], top_k, ids)
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
+        # embedding is shape (1, dim)
+        embedding = np.array([embedding], dtype=np.float32)
+        faiss.normalize_L2(embedding)  # we do in-place normalization
 
         # Perform the similarity search
         index = await self._get_index()
@@ -279,10 +306,13 @@ class FaissVectorDBStorage(BaseVectorStorage):
         """
         Return the Faiss internal ID for a given custom ID, or None if not found.
         """
-        for fid, meta in self._id_to_meta.items():
-            if meta.get("__id__") == custom_id:
-                return fid
-        return None
+        return self._custom_id_to_fid.get(custom_id)
+
+    def _reset_index(self):
+        """Replace the index and metadata with empty ones"""
+        self._index = faiss.IndexFlatIP(self._dim)
+        self._id_to_meta = {}
+        self._custom_id_to_fid = {}
 
     async def _remove_faiss_ids(self, fid_list):
         """
@@ -290,7 +320,8 @@ class FaissVectorDBStorage(BaseVectorStorage):
         Because IndexFlatIP doesn't support 'removals',
         we rebuild the index excluding those vectors.
         """
-        keep_fids = [fid for fid in self._id_to_meta if fid not in fid_list]
+        fid_set = set(fid_list)
+        keep_fids = [fid for fid in self._id_to_meta if fid not in fid_set]
 
         # Rebuild the index
         vectors_to_keep = []
@@ -308,6 +339,9 @@ class FaissVectorDBStorage(BaseVectorStorage):
                 self._index.add(arr)
 
             self._id_to_meta = new_id_to_meta
+            self._custom_id_to_fid = {
+                meta["__id__"]: fid for fid, meta in new_id_to_meta.items()
+            }
 
     def _save_faiss_index(self):
         """
@@ -346,6 +380,9 @@ class FaissVectorDBStorage(BaseVectorStorage):
             for fid_str, meta in stored_dict.items():
                 fid = int(fid_str)
                 self._id_to_meta[fid] = meta
+            self._custom_id_to_fid = {
+                meta["__id__"]: fid for fid, meta in self._id_to_meta.items()
+            }
 
             logger.info(
                 f"Faiss index loaded with {self._index.ntotal} vectors from {self._faiss_index_file}"
@@ -353,8 +390,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
         except Exception as e:
             logger.error(f"Failed to load Faiss index or metadata: {e}")
             logger.warning("Starting with an empty Faiss index.")
-            self._index = faiss.IndexFlatIP(self._dim)
-            self._id_to_meta = {}
+            self._reset_index()
 
     async def index_done_callback(self) -> None:
         async with self._storage_lock:
@@ -364,8 +400,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
                 logger.warning(
                     f"Storage for FAISS {self.namespace} was updated by another process, reloading..."
                 )
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
+                self._reset_index()
                 self._load_faiss_index()
                 self.storage_updated.value = False
                 return False  # Return error
@@ -457,8 +492,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
         try:
             async with self._storage_lock:
                 # Reset the index
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
+                self._reset_index()
 
                 # Remove storage files if they exist
                 if os.path.exists(self._faiss_index_file):
@@ -466,7 +500,6 @@ class FaissVectorDBStorage(BaseVectorStorage):
                 if os.path.exists(self._meta_file):
                     os.remove(self._meta_file)
 
-                self._id_to_meta = {}
                 self._load_faiss_index()
 
                 # Notify other processes
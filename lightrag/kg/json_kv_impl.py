@@ -5,9 +5,12 @@ from typing import Any, final
 from lightrag.base import (
     BaseKVStorage,
 )
+from lightrag.namespace import NameSpace, is_namespace
 from lightrag.utils import (
+    flatten_cache_data,
     load_json,
     logger,
+    make_cache_key,
     write_json,
 )
 from .shared_storage import (
@@ -41,23 +44,23 @@ class JsonKVStorage(BaseKVStorage):
             self._data = await get_namespace_data(self.namespace)
             if need_init:
                 loaded_data = load_json(self._file_name) or {}
+                # LLM response caches used to hold one dict of entries per cache mode
+                migrated = False
+                if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+                    flat_data = flatten_cache_data(loaded_data)
+                    if flat_data is not None:
+                        loaded_data, migrated = flat_data, True
+                        logger.info(
+                            f"Migrated {self.namespace} to flat mode:hash keys, "
+                            f"{len(flat_data)} entries"
+                        )
                 async with self._storage_lock:
                     self._data.update(loaded_data)
-
-                    # Calculate data count based on namespace
-                    if self.namespace.endswith("cache"):
-                        # For cache namespaces, sum the cache entries across all cache types
-                        data_count = sum(
-                            len(first_level_dict)
-                            for first_level_dict in loaded_data.values()
-                            if isinstance(first_level_dict, dict)
-                        )
-                    else:
-                        # For non-cache namespaces, use the original count method
-                        data_count = len(loaded_data)
+                    if migrated:
+                        await set_all_update_flags(self.namespace)
 
                     logger.info(
-                        f"Process {os.getpid()} KV load {self.namespace} with {data_count} records"
+                        f"Process {os.getpid()} KV load {self.namespace} with {len(loaded_data)} records"
                     )
 
     async def index_done_callback(self) -> None:
@@ -66,21 +69,8 @@ class JsonKVStorage(BaseKVStorage):
                 data_dict = (
                     dict(self._data) if hasattr(self._data, "_getvalue") else self._data
                 )
-
-                # Calculate data count based on namespace
-                if self.namespace.endswith("cache"):
-                    # # For cache namespaces, sum the cache entries across all cache types
-                    data_count = sum(
-                        len(first_level_dict)
-                        for first_level_dict in data_dict.values()
-                        if isinstance(first_level_dict, dict)
-                    )
-                else:
-                    # For non-cache namespaces, use the original count method
-                    data_count = len(data_dict)
-
                 logger.debug(
-                    f"Process {os.getpid()} KV writting {data_count} records to {self.namespace}"
+                    f"Process {os.getpid()} KV writting {len(data_dict)} records to {self.namespace}"
                 )
                 write_json(data_dict, self._file_name)
                 await clear_all_update_flags(self.namespace)
@@ -98,6 +88,15 @@ class JsonKVStorage(BaseKVStorage):
         async with self._storage_lock:
             return self._data.get(id)
 
+    async def get_by_mode(self, mode: str) -> dict[str, dict[str, Any]]:
+        prefix = make_cache_key(mode, "")
+        async with self._storage_lock:
+            return {
+                key[len(prefix) :]: value
+                for key, value in self._data.items()
+                if key.startswith(prefix)
+            }
+
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         async with self._storage_lock:
             return [
@@ -150,7 +149,7 @@ class JsonKVStorage(BaseKVStorage):
                 await set_all_update_flags(self.namespace)
 
     async def drop_cache_by_modes(self, modes: list[str] | None = None) -> bool:
-        """Delete specific records from storage by by cache mode
+        """Delete the cache entries of the given modes, i.e. the keys with their prefix
 
         Importance notes for in-memory storage:
         1. Changes will be persisted to disk during the next index_done_callback
@@ -167,7 +166,10 @@ class JsonKVStorage(BaseKVStorage):
             return False
 
         try:
-            await self.delete(modes)
+            prefixes = tuple(make_cache_key(mode, "") for mode in modes)
+            async with self._storage_lock:
+                keys = [key for key in self._data.keys() if key.startswith(prefixes)]
+            await self.delete(keys)
             return True
         except Exception:
             return False
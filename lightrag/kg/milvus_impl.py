@@ -117,9 +117,14 @@ class MilvusVectorDBStorage(BaseVectorStorage):
         embedding = await self.embedding_func(
             [query], _priority=5
         )  # higher priority for query
+        return await self.query_by_vector(embedding[0], top_k, ids)
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
         results = self._client.search(
             collection_name=self.namespace,
-            data=embedding,
+            data=[embedding],
             limit=top_k,
             output_fields=list(self.meta_fields) + ["created_at"],
             search_params={
@@ -15,7 +15,7 @@ from ..base import (
     DocStatusStorage,
 )
 from ..namespace import NameSpace, is_namespace
-from ..utils import logger, compute_mdhash_id
+from ..utils import logger, compute_mdhash_id, parse_cache_key
 from ..types import KnowledgeGraph, KnowledgeGraphNode, KnowledgeGraphEdge
 import pipmaster as pm
 
@@ -95,8 +95,16 @@ class MongoKVStorage(BaseKVStorage):
             self.db = None
             self._data = None
 
+    def _doc_id(self, id: str) -> str:
+        """Document id of a key, LLM cache entries are stored as {mode}_{args_hash}"""
+        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            cache_key = parse_cache_key(id)
+            if cache_key is not None:
+                return "_".join(cache_key)
+        return id
+
     async def get_by_id(self, id: str) -> dict[str, Any] | None:
-        return await self._data.find_one({"_id": id})
+        return await self._data.find_one({"_id": self._doc_id(id)})
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         cursor = self._data.find({"_id": {"$in": ids}})
@@ -114,15 +122,12 @@ class MongoKVStorage(BaseKVStorage):
 
         if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
             update_tasks: list[Any] = []
-            for mode, items in data.items():
-                for k, v in items.items():
-                    key = f"{mode}_{k}"
-                    data[mode][k]["_id"] = f"{mode}_{k}"
-                    update_tasks.append(
-                        self._data.update_one(
-                            {"_id": key}, {"$setOnInsert": v}, upsert=True
-                        )
-                    )
+            for k, v in data.items():
+                key = self._doc_id(k)
+                data[k]["_id"] = key
+                update_tasks.append(
+                    self._data.update_one({"_id": key}, {"$set": v}, upsert=True)
+                )
             await asyncio.gather(*update_tasks)
         else:
             update_tasks = []
@@ -146,6 +151,10 @@ class MongoKVStorage(BaseKVStorage):
         else:
             return None
 
+    async def get_by_mode(self, mode: str) -> dict[str, dict[str, Any]]:
+        cursor = self._data.find({"_id": {"$regex": f"^{mode}_"}})
+        return {doc["_id"][len(mode) + 1 :]: doc async for doc in cursor}
+
     async def index_done_callback(self) -> None:
         # Mongo handles persistence automatically
         pass
@@ -160,7 +169,9 @@ class MongoKVStorage(BaseKVStorage):
             return
 
         try:
-            result = await self._data.delete_many({"_id": {"$in": ids}})
+            result = await self._data.delete_many(
+                {"_id": {"$in": [self._doc_id(id) for id in ids]}}
+            )
             logger.info(
                 f"Deleted {result.deleted_count} documents from {self.namespace}"
             )
@@ -1041,9 +1052,14 @@ class MongoVectorDBStorage(BaseVectorStorage):
         embedding = await self.embedding_func(
             [query], _priority=5
         )  # higher priority for query
+        return await self.query_by_vector(embedding[0], top_k, ids)
 
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
+        """Queries Atlas Vector Search with a precomputed query embedding."""
         # Convert numpy array to a list to ensure compatibility with MongoDB
-        query_vector = embedding[0].tolist()
+        query_vector = embedding.tolist()
 
         # Define the aggregation pipeline with the converted query vector
         pipeline = [
@@ -1,4 +1,5 @@
 import asyncio
+import json
 import os
 from typing import Any, final
 from dataclasses import dataclass
@@ -23,6 +24,22 @@ from .shared_storage import (
 )
 
 
+def _record_hash(record: dict[str, Any]) -> str:
+    """Hash of the content hash and meta fields of a record, without its id, creation time and vector"""
+    return compute_mdhash_id(
+        json.dumps(
+            {
+                k: v
+                for k, v in record.items()
+                if k not in ("__id__", "__created_at__", "__vector__")
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+    )
+
+
 @final
 @dataclass
 class NanoVectorDBStorage(BaseVectorStorage):
@@ -31,6 +48,9 @@ class NanoVectorDBStorage(BaseVectorStorage):
         self._client = None
         self._storage_lock = None
         self.storage_updated = None
+        # Record hashes of the stored records by id, filled on demand and kept up to date
+        # by upsert and delete, so unchanged records are neither embedded nor rewritten
+        self._record_hashes: dict[str, str] = {}
 
         # Use global config value if specified, otherwise use default
         kwargs = self.global_config.get("vector_db_storage_cls_kwargs", {})
@@ -72,6 +92,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
                     self.embedding_func.embedding_dim,
                     storage_file=self._client_file_name,
                 )
+                self._record_hashes = {}
                 # Reset update flag
                 self.storage_updated.value = False
 
@@ -94,11 +115,33 @@ class NanoVectorDBStorage(BaseVectorStorage):
             {
                 "__id__": k,
                 "__created_at__": current_time,
+                "__content_hash__": compute_mdhash_id(v["content"]),
                 **{k1: v1 for k1, v1 in v.items() if k1 in self.meta_fields},
             }
             for k, v in data.items()
         ]
-        contents = [v["content"] for v in data.values()]
+
+        # Skip the records whose content and meta fields did not change
+        client = await self._get_client()
+        unknown_ids = {
+            d["__id__"] for d in list_data if d["__id__"] not in self._record_hashes
+        }
+        if unknown_ids:
+            for dp in client.get(unknown_ids):
+                self._record_hashes[dp["__id__"]] = _record_hash(dp)
+        to_embed = [
+            d
+            for d in list_data
+            if self._record_hashes.get(d["__id__"]) != _record_hash(d)
+        ]
+        if len(to_embed) < len(list_data):
+            logger.debug(
+                f"Skipped {len(list_data) - len(to_embed)} unchanged records in {self.namespace}"
+            )
+        if not to_embed:
+            return
+
+        contents = [data[d["__id__"]]["content"] for d in to_embed]
         batches = [
             contents[i : i + self._max_batch_size]
             for i in range(0, len(contents), self._max_batch_size)
@@ -108,17 +151,20 @@ class NanoVectorDBStorage(BaseVectorStorage):
         embedding_tasks = [self.embedding_func(batch) for batch in batches]
         embeddings_list = await asyncio.gather(*embedding_tasks)
 
-        embeddings = np.concatenate(embeddings_list)
-        if len(embeddings) == len(list_data):
-            for i, d in enumerate(list_data):
+        embeddings = (
+            np.concatenate(embeddings_list) if embeddings_list else np.empty((0,))
+        )
+        if len(embeddings) == len(to_embed):
+            for i, d in enumerate(to_embed):
+                self._record_hashes[d["__id__"]] = _record_hash(d)
                 d["__vector__"] = embeddings[i]
             client = await self._get_client()
-            results = client.upsert(datas=list_data)
+            results = client.upsert(datas=to_embed)
             return results
         else:
             # sometimes the embedding is not returned correctly. just log it.
             logger.error(
-                f"embedding is not 1-1 with data, {len(embeddings)} != {len(list_data)}"
+                f"embedding is not 1-1 with data, {len(embeddings)} != {len(to_embed)}"
             )
 
     async def query(
@@ -128,8 +174,11 @@ class NanoVectorDBStorage(BaseVectorStorage):
         embedding = await self.embedding_func(
             [query], _priority=5
         )  # higher priority for query
-        embedding = embedding[0]
+        return await self.query_by_vector(embedding[0], top_k, ids)
 
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
         client = await self._get_client()
         results = client.query(
             query=embedding,
@@ -166,6 +215,8 @@ class NanoVectorDBStorage(BaseVectorStorage):
         try:
             client = await self._get_client()
             client.delete(ids)
+            for id_ in ids:
+                self._record_hashes.pop(id_, None)
             logger.debug(
                 f"Successfully deleted {len(ids)} vectors from {self.namespace}"
             )
@@ -190,6 +241,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
             client = await self._get_client()
             if client.get([entity_id]):
                 client.delete([entity_id])
+                self._record_hashes.pop(entity_id, None)
                 logger.debug(f"Successfully deleted entity {entity_name}")
             else:
                 logger.debug(f"Entity {entity_name} not found in storage")
@@ -218,6 +270,8 @@ class NanoVectorDBStorage(BaseVectorStorage):
             if ids_to_delete:
                 client = await self._get_client()
                 client.delete(ids_to_delete)
+                for id_ in ids_to_delete:
+                    self._record_hashes.pop(id_, None)
                 logger.debug(
                     f"Deleted {len(ids_to_delete)} relations for {entity_name}"
                 )
@@ -239,6 +293,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
                     self.embedding_func.embedding_dim,
                     storage_file=self._client_file_name,
                 )
+                self._record_hashes = {}
                 # Reset update flag
                 self.storage_updated.value = False
                 return False  # Return error
@@ -328,6 +383,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
                     self.embedding_func.embedding_dim,
                     storage_file=self._client_file_name,
                 )
+                self._record_hashes = {}
 
                 # Notify other processes that data has been updated
                 await set_all_update_flags(self.namespace)
@@ -369,6 +369,49 @@ class Neo4JStorage(BaseGraphStorage):
             await result.consume()  # Make sure to consume the result fully
             return nodes
 
+    async def get_nodes_batch_case_insensitive(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        """
+        Retrieve multiple nodes in one query using UNWIND, matching entity IDs case-insensitively.
+
+        Args:
+            node_ids: List of node entity IDs to fetch.
+
+        Returns:
+            A dictionary mapping each requested node_id to its node data.
+            The stored entity ID is available in the `entity_id` property.
+        """
+        async with self._driver.session(
+            database=self._DATABASE, default_access_mode="READ"
+        ) as session:
+            query = """
+            UNWIND $node_ids AS id
+            MATCH (n:base)
+            WHERE toLower(n.entity_id) = toLower(id)
+            RETURN id AS requested_id, n
+            """
+            result = await session.run(query, node_ids=node_ids)
+            nodes = {}
+            async for record in result:
+                requested_id = record["requested_id"]
+                if requested_id in nodes:
+                    logger.warning(
+                        f"Multiple nodes found with label '{requested_id}'. Using first node."
+                    )
+                    continue
+                node_dict = dict(record["n"])
+                # Remove the 'base' label if present in a 'labels' property
+                if "labels" in node_dict:
+                    node_dict["labels"] = [
+                        label for label in node_dict["labels"] if label != "base"
+                    ]
+                # Remove embedding field if it exists
+                node_dict.pop("embedding", None)
+                nodes[requested_id] = node_dict
+            await result.consume()  # Make sure to consume the result fully
+            return nodes
+
     async def node_degree(self, node_id: str) -> int:
         """Get the degree (number of relationships) of a node with the given label.
         If multiple nodes have the same label, returns the degree of the first node.
@@ -599,11 +642,17 @@ class Neo4JStorage(BaseGraphStorage):
         Retrieve edge properties for multiple (src, tgt) pairs in one query.
 
         Args:
-            pairs: List of dictionaries, e.g. [{"src": "node1", "tgt": "node2"}, ...]
+            pairs: List of dictionaries, e.g. [{"src": "node1", "tgt": "node2"}, ...],
+                an optional "source_project" key restricts the match to edges of that project
 
         Returns:
             A dictionary mapping (src, tgt) tuples to their edge properties.
         """
+        source_projects = {
+            (pair["src"], pair["tgt"]): pair["source_project"]
+            for pair in pairs
+            if "source_project" in pair
+        }
         async with self._driver.session(
             database=self._DATABASE, default_access_mode="READ"
         ) as session:
@@ -618,6 +667,14 @@ class Neo4JStorage(BaseGraphStorage):
                 src = record["src_id"]
                 tgt = record["tgt_id"]
                 edges = record["edges"]
+                if (src, tgt) in source_projects:
+                    edges = [
+                        e
+                        for e in edges
+                        if e.get("source_project") == source_projects[(src, tgt)]
+                    ]
+                    if not edges:
+                        continue
                 if edges and len(edges) > 0:
                     edge_props = edges[0]  # choose the first if multiple exist
                     # Remove embedding field if it exists
@@ -887,6 +944,144 @@ class Neo4JStorage(BaseGraphStorage):
             logger.error(f"Error during edge upsert: {str(e)}")
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_nodes_batch(
+        self, nodes: list[tuple[str, dict[str, str]]]
+    ) -> None:
+        """
+        Upsert multiple nodes in a single transaction using UNWIND.
+        Nodes are grouped by entity type, as node labels cannot be parameterized,
+        so the number of queries depends on the number of distinct entity types only.
+
+        Args:
+            nodes: List of (node_id, node_data) tuples
+        """
+        if not nodes:
+            return
+
+        nodes_by_type: dict[str, list[dict[str, Any]]] = {}
+        mentions = []
+        for node_id, node_data in nodes:
+            if "entity_id" not in node_data:
+                raise ValueError(
+                    "Neo4j: node properties must contain an 'entity_id' field"
+                )
+            nodes_by_type.setdefault(node_data["entity_type"], []).append(
+                {"entity_id": node_id, "properties": node_data}
+            )
+            if "source_id" in node_data:
+                mentions.append(
+                    {
+                        "entity_id": node_id,
+                        "source_ids": node_data["source_id"].split(GRAPH_FIELD_SEP),
+                    }
+                )
+
+        try:
+            async with self._driver.session(database=self._DATABASE) as session:
+
+                async def execute_upsert(tx: AsyncManagedTransaction):
+                    for entity_type, batch in nodes_by_type.items():
+                        query = (
+                            """
+                        UNWIND $nodes AS node
+                        MERGE (n:base {entity_id: node.entity_id})
+                        SET n += node.properties
+                        SET n:`%s`
+                        """
+                            % entity_type
+                        )
+                        result = await tx.run(query, nodes=batch)
+                        await result.consume()  # Ensure result is fully consumed
+
+                    if mentions:
+                        query = """
+                        UNWIND $mentions AS mention
+                        MATCH (n:base {entity_id: mention.entity_id})
+                        WITH n, mention
+                        UNWIND mention.source_ids AS source_id
+                        MATCH (c:_Chunk {id: source_id})
+                        MERGE (n)-[:_MENTIONED_IN]->(c)
+                        """
+                        result = await tx.run(query, mentions=mentions)
+                        await result.consume()
+
+                    logger.debug(
+                        f"Upserted {len(nodes)} nodes of {len(nodes_by_type)} entity types"
+                    )
+
+                await session.execute_write(execute_upsert)
+        except Exception as e:
+            logger.error(f"Error during batch node upsert: {str(e)}")
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, Any]]]
+    ) -> None:
+        """
+        Upsert multiple edges in a single transaction using UNWIND.
+        Source and target nodes must already exist, edges between missing nodes are skipped.
+
+        Args:
+            edges: List of (source_node_id, target_node_id, edge_data) tuples
+        """
+        if not edges:
+            return
+
+        batch = [
+            {
+                "src": source_node_id,
+                "tgt": target_node_id,
+                "source_project": edge_data.get("source_project", "generic"),
+                "properties": edge_data,
+            }
+            for source_node_id, target_node_id, edge_data in edges
+        ]
+
+        try:
+            async with self._driver.session(database=self._DATABASE) as session:
+
+                async def execute_upsert(tx: AsyncManagedTransaction):
+                    query = """
+                    UNWIND $edges AS edge
+                    MATCH (source:base {entity_id: edge.src})
+                    WITH source, edge
+                    MATCH (target:base {entity_id: edge.tgt})
+                    MERGE (source)-[r:DIRECTED {source_project: edge.source_project}]-(target)
+                    SET r += edge.properties
+                    """
+                    result = await tx.run(query, edges=batch)
+                    await result.consume()  # Ensure result is fully consumed
+                    logger.debug(f"Upserted {len(batch)} edges")
+
+                await session.execute_write(execute_upsert)
+        except Exception as e:
+            logger.error(f"Error during batch edge upsert: {str(e)}")
+            raise
+
     async def get_knowledge_graph(
         self,
         node_label: str,
@@ -94,14 +94,40 @@ class NetworkXStorage(BaseGraphStorage):
         graph = await self._get_graph()
         return graph.has_node(node_id)
 
-    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+    async def has_edge(
+        self, source_node_id: str, target_node_id: str, **kwargs
+    ) -> bool:
         graph = await self._get_graph()
         return graph.has_edge(source_node_id, target_node_id)
 
-    async def get_node(self, node_id: str) -> dict[str, str] | None:
+    async def get_node(
+        self, node_id: str, case_insensitive: bool = False
+    ) -> dict[str, str] | None:
         graph = await self._get_graph()
+        if case_insensitive and not graph.has_node(node_id):
+            node_id_lower = node_id.lower()
+            for existing_id in graph.nodes:
+                if existing_id.lower() == node_id_lower:
+                    return graph.nodes[existing_id]
+            return None
         return graph.nodes.get(node_id)
 
+    async def get_nodes_batch_case_insensitive(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        graph = await self._get_graph()
+        lower_ids = {}
+        for existing_id in graph.nodes:
+            lower_ids.setdefault(existing_id.lower(), existing_id)
+        result = {}
+        for node_id in node_ids:
+            existing_id = (
+                node_id if graph.has_node(node_id) else lower_ids.get(node_id.lower())
+            )
+            if existing_id is not None:
+                result[node_id] = graph.nodes[existing_id]
+        return result
+
     async def node_degree(self, node_id: str) -> int:
         graph = await self._get_graph()
         return graph.degree(node_id)
@@ -111,7 +137,7 @@ class NetworkXStorage(BaseGraphStorage):
         return graph.degree(src_id) + graph.degree(tgt_id)
 
     async def get_edge(
-        self, source_node_id: str, target_node_id: str
+        self, source_node_id: str, target_node_id: str, **kwargs
     ) -> dict[str, str] | None:
         graph = await self._get_graph()
         return graph.edges.get((source_node_id, target_node_id))
@@ -144,6 +170,28 @@ class NetworkXStorage(BaseGraphStorage):
         graph = await self._get_graph()
         graph.add_edge(source_node_id, target_node_id, **edge_data)
 
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """
+        Importance notes:
+        1. Changes will be persisted to disk during the next index_done_callback
+        2. Only one process should updating the storage at a time before index_done_callback,
+           KG-storage-log should be used to avoid data corruption
+        """
+        graph = await self._get_graph()
+        graph.add_nodes_from(nodes)
+
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, str]]]
+    ) -> None:
+        """
+        Importance notes:
+        1. Changes will be persisted to disk during the next index_done_callback
+        2. Only one process should updating the storage at a time before index_done_callback,
+           KG-storage-log should be used to avoid data corruption
+        """
+        graph = await self._get_graph()
+        graph.add_edges_from(edges)
+
     async def delete_node(self, node_id: str) -> None:
         """
         Importance notes:
@@ -26,7 +26,7 @@ from ..base import (
     DocStatusStorage,
 )
 from ..namespace import NameSpace, is_namespace
-from ..utils import logger
+from ..utils import logger, make_cache_key, parse_cache_key
 
 import pipmaster as pm
 
@@ -46,6 +46,9 @@ load_dotenv(dotenv_path=".env", override=False)
 # Get maximum number of graph nodes from environment variable, default is 1000
 MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", 1000))
 
+# Number of graph upsert statements sent to the database in one round trip
+GRAPH_UPSERT_BATCH_SIZE = 100
+
 
 class PostgreSQLDB:
     def __init__(self, config: dict[str, Any], **kwargs: Any):
@@ -159,6 +162,31 @@ class PostgreSQLDB:
                     # Log error but don't interrupt the process
                     logger.warning(f"Failed to migrate {table_name}.{column_name}: {e}")
 
+    async def _migrate_add_columns(self):
+        """Add the columns of TABLE_ADDED_COLUMNS to tables created without them"""
+        for table_name, columns in TABLE_ADDED_COLUMNS.items():
+            for column_name, column_type in columns.items():
+                try:
+                    check_column_sql = f"""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = '{table_name.lower()}'
+                    AND column_name = '{column_name}'
+                    """
+
+                    if await self.query(check_column_sql):
+                        continue
+
+                    logger.info(f"Adding column {table_name}.{column_name}")
+                    await self.execute(
+                        f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"
+                    )
+                except Exception as e:
+                    # Log error but don't interrupt the process
+                    logger.warning(
+                        f"Failed to add column {table_name}.{column_name}: {e}"
+                    )
+
     async def check_tables(self):
         # First create all tables
         for k, v in TABLES.items():
@@ -203,6 +231,11 @@ class PostgreSQLDB:
             logger.error(f"PostgreSQL, Failed to migrate timestamp columns: {e}")
             # Don't throw an exception, allow the initialization process to continue
 
+        try:
+            await self._migrate_add_columns()
+        except Exception as e:
+            logger.error(f"PostgreSQL, Failed to add missing columns: {e}")
+
     async def query(
         self,
         sql: str,
@@ -381,13 +414,12 @@ class PGKVStorage(BaseKVStorage):
             results = await self.db.query(sql, params, multirows=True)
 
             if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
-                result_dict = {}
-                for row in results:
-                    mode = row["mode"]
-                    if mode not in result_dict:
-                        result_dict[mode] = {}
-                    result_dict[mode][row["id"]] = row
-                return result_dict
+                return {
+                    make_cache_key(row["mode"], row["id"]): _decode_llm_cache(row)
+                    for row in results
+                }
+            elif is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
+                return {row["id"]: _decode_text_chunk(row) for row in results}
             else:
                 return {row["id"]: row for row in results}
         except Exception as e:
@@ -396,14 +428,20 @@ class PGKVStorage(BaseKVStorage):
 
     async def get_by_id(self, id: str) -> dict[str, Any] | None:
         """Get doc_full data by id."""
+        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            # Cache entries are addressed by flat "mode:args_hash" keys
+            cache_key = parse_cache_key(id)
+            if cache_key is None:
+                return None
+            return (await self.get_by_mode_and_id(*cache_key)).get(cache_key[1])
+
         sql = SQL_TEMPLATES["get_by_id_" + self.namespace]
         params = {"workspace": self.db.workspace, "id": id}
-        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
-            array_res = await self.db.query(sql, params, multirows=True)
-            res = {}
-            for row in array_res:
-                res[row["id"]] = row
-            return res if res else None
+        if is_namespace(self.namespace, NameSpace.KV_STORE_CHUNK_EXTRACTIONS):
+            response = await self.db.query(sql, params)
+            return _decode_chunk_extraction(response) if response else None
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
+            return _decode_text_chunk(await self.db.query(sql, params))
         else:
             response = await self.db.query(sql, params)
             return response if response else None
@@ -416,30 +454,52 @@ class PGKVStorage(BaseKVStorage):
             array_res = await self.db.query(sql, params, multirows=True)
             res = {}
             for row in array_res:
-                res[row["id"]] = row
+                res[row["id"]] = _decode_llm_cache(row)
             return res
         else:
             return None
 
+    async def get_by_mode(self, mode: str) -> dict[str, dict[str, Any]]:
+        if not is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            return await super().get_by_mode(mode)
+        sql = SQL_TEMPLATES["get_by_mode_" + self.namespace]
+        params = {"workspace": self.db.workspace, "mode": mode}
+        array_res = await self.db.query(sql, params, multirows=True)
+        return {row["id"]: _decode_llm_cache(row) for row in array_res or []}
+
     # Query by id
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         """Get doc_chunks data by id"""
+        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            # Cache entries are addressed by flat "mode:args_hash" keys
+            cache_keys = [
+                cache_key for cache_key in map(parse_cache_key, ids) if cache_key
+            ]
+            if not cache_keys:
+                return [None] * len(ids)
+            sql = SQL_TEMPLATES["get_by_ids_" + self.namespace].format(
+                ids=",".join(
+                    [f"('{mode}','{args_hash}')" for mode, args_hash in cache_keys]
+                )
+            )
+            params = {"workspace": self.db.workspace}
+            array_res = await self.db.query(sql, params, multirows=True)
+            rows = {
+                make_cache_key(row["mode"], row["id"]): _decode_llm_cache(row)
+                for row in array_res or []
+            }
+            return [rows.get(id) for id in ids]
+
         sql = SQL_TEMPLATES["get_by_ids_" + self.namespace].format(
             ids=",".join([f"'{id}'" for id in ids])
         )
         params = {"workspace": self.db.workspace}
-        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+        if is_namespace(self.namespace, NameSpace.KV_STORE_CHUNK_EXTRACTIONS):
             array_res = await self.db.query(sql, params, multirows=True)
-            modes = set()
-            dict_res: dict[str, dict] = {}
-            for row in array_res:
-                modes.add(row["mode"])
-            for mode in modes:
-                if mode not in dict_res:
-                    dict_res[mode] = {}
-            for row in array_res:
-                dict_res[row["mode"]][row["id"]] = row
-            return [{k: v} for k, v in dict_res.items()]
+            return [_decode_chunk_extraction(row) for row in array_res or []]
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
+            array_res = await self.db.query(sql, params, multirows=True)
+            return [_decode_text_chunk(row) for row in array_res or []]
         else:
             return await self.db.query(sql, params, multirows=True)
 
@@ -477,7 +537,26 @@ class PGKVStorage(BaseKVStorage):
             return
 
         if is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
-            pass
+            # Keeps the provenance of chunks shared by several documents, the chunk
+            # vectors are written by the chunks vector storage
+            for k, v in data.items():
+                upsert_sql = SQL_TEMPLATES["upsert_text_chunk"]
+                _data = {
+                    "workspace": self.db.workspace,
+                    "id": k,
+                    "tokens": v["tokens"],
+                    "chunk_order_index": v["chunk_order_index"],
+                    "full_doc_id": v["full_doc_id"],
+                    "content": v["content"],
+                    "file_path": v["file_path"],
+                    "full_doc_ids": json.dumps(
+                        v.get("full_doc_ids") or [v["full_doc_id"]]
+                    ),
+                    "file_paths": json.dumps(v.get("file_paths") or [v["file_path"]]),
+                    "start_offset": v.get("start_offset"),
+                    "end_offset": v.get("end_offset"),
+                }
+                await self.db.execute(upsert_sql, _data)
         elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_DOCS):
             for k, v in data.items():
                 upsert_sql = SQL_TEMPLATES["upsert_doc_full"]
@@ -488,18 +567,39 @@ class PGKVStorage(BaseKVStorage):
                 }
                 await self.db.execute(upsert_sql, _data)
         elif is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
-            for mode, items in data.items():
-                for k, v in items.items():
-                    upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
-                    _data = {
-                        "workspace": self.db.workspace,
-                        "id": k,
-                        "original_prompt": v["original_prompt"],
-                        "return_value": v["return"],
-                        "mode": mode,
-                    }
-
-                    await self.db.execute(upsert_sql, _data)
+            for k, v in data.items():
+                mode, args_hash = parse_cache_key(k)
+                upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
+                _data = {
+                    "workspace": self.db.workspace,
+                    "id": args_hash,
+                    "original_prompt": v["original_prompt"],
+                    "return_value": v["return"],
+                    "mode": mode,
+                    "cache_type": v.get("cache_type"),
+                    "cache_scope": v.get("cache_scope"),
+                    "created_at": v.get("created_at"),
+                    "embedding": v.get("embedding"),
+                    "embedding_shape": json.dumps(list(v["embedding_shape"]))
+                    if v.get("embedding_shape") is not None
+                    else None,
+                    "embedding_min": v.get("embedding_min"),
+                    "embedding_max": v.get("embedding_max"),
+                }
+
+                await self.db.execute(upsert_sql, _data)
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_CHUNK_EXTRACTIONS):
+            for k, v in data.items():
+                upsert_sql = SQL_TEMPLATES["upsert_chunk_extraction"]
+                _data = {
+                    "workspace": self.db.workspace,
+                    "id": k,
+                    "prompt_version": v["prompt_version"],
+                    "extraction": json.dumps(
+                        {"nodes": v["nodes"], "edges": v["edges"]}, ensure_ascii=False
+                    ),
+                }
+                await self.db.execute(upsert_sql, _data)
 
     async def index_done_callback(self) -> None:
         # PG handles persistence automatically
@@ -525,9 +625,21 @@ class PGKVStorage(BaseKVStorage):
         delete_sql = f"DELETE FROM {table_name} WHERE workspace=$1 AND id = ANY($2)"
 
         try:
-            await self.db.execute(
-                delete_sql, {"workspace": self.db.workspace, "ids": ids}
-            )
+            if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+                # LLM cache rows are keyed by mode and id, the ids are mode:hash keys
+                ids_by_mode: dict[str, list[str]] = {}
+                for cache_key in map(parse_cache_key, ids):
+                    if cache_key is not None:
+                        ids_by_mode.setdefault(cache_key[0], []).append(cache_key[1])
+                for mode, mode_ids in ids_by_mode.items():
+                    await self.db.execute(
+                        f"DELETE FROM {table_name} WHERE workspace=$1 AND mode=$2 AND id = ANY($3)",
+                        {"workspace": self.db.workspace, "mode": mode, "ids": mode_ids},
+                    )
+            else:
+                await self.db.execute(
+                    delete_sql, {"workspace": self.db.workspace, "ids": ids}
+                )
             logger.debug(
                 f"Successfully deleted {len(ids)} records from {self.namespace}"
             )
@@ -624,6 +736,12 @@ class PGVectorStorage(BaseVectorStorage):
                 "content": item["content"],
                 "content_vector": json.dumps(item["__vector__"].tolist()),
                 "file_path": item["file_path"],
+                "full_doc_ids": json.dumps(
+                    item.get("full_doc_ids") or [item["full_doc_id"]]
+                ),
+                "file_paths": json.dumps(item.get("file_paths") or [item["file_path"]]),
+                "start_offset": item.get("start_offset"),
+                "end_offset": item.get("end_offset"),
                 "create_time": current_time,
                 "update_time": current_time,
             }
@@ -725,7 +843,11 @@ class PGVectorStorage(BaseVectorStorage):
         embeddings = await self.embedding_func(
             [query], _priority=5
         )  # higher priority for query
-        embedding = embeddings[0]
+        return await self.query_by_vector(embeddings[0], top_k, ids)
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
         embedding_string = ",".join(map(str, embedding))
         # Use parameterized document IDs (None means search across all documents)
         sql = SQL_TEMPLATES[self.namespace].format(embedding_string=embedding_string)
@@ -921,16 +1043,7 @@ class PGDocStatusStorage(DocStatusStorage):
         if result is None or result == []:
             return None
         else:
-            return dict(
-                content=result[0]["content"],
-                content_length=result[0]["content_length"],
-                content_summary=result[0]["content_summary"],
-                status=result[0]["status"],
-                chunks_count=result[0]["chunks_count"],
-                created_at=result[0]["created_at"],
-                updated_at=result[0]["updated_at"],
-                file_path=result[0]["file_path"],
-            )
+            return _decode_doc_status(result[0])
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         """Get doc_chunks data by multiple IDs."""
@@ -944,19 +1057,7 @@ class PGDocStatusStorage(DocStatusStorage):
 
         if not results:
             return []
-        return [
-            {
-                "content": row["content"],
-                "content_length": row["content_length"],
-                "content_summary": row["content_summary"],
-                "status": row["status"],
-                "chunks_count": row["chunks_count"],
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"],
-                "file_path": row["file_path"],
-            }
-            for row in results
-        ]
+        return [_decode_doc_status(row) for row in results]
 
     async def get_status_counts(self) -> dict[str, int]:
         """Get counts of documents in each status"""
@@ -978,16 +1079,7 @@ class PGDocStatusStorage(DocStatusStorage):
         params = {"workspace": self.db.workspace, "status": status.value}
         result = await self.db.query(sql, params, True)
         docs_by_status = {
-            element["id"]: DocProcessingStatus(
-                content=element["content"],
-                content_summary=element["content_summary"],
-                content_length=element["content_length"],
-                status=element["status"],
-                created_at=element["created_at"],
-                updated_at=element["updated_at"],
-                chunks_count=element["chunks_count"],
-                file_path=element["file_path"],
-            )
+            element["id"]: DocProcessingStatus(**_decode_doc_status(element))
             for element in result
         }
         return docs_by_status
@@ -1055,8 +1147,8 @@ class PGDocStatusStorage(DocStatusStorage):
 
         # Modified SQL to include created_at and updated_at in both INSERT and UPDATE operations
         # Both fields are updated from the input data in both INSERT and UPDATE cases
-        sql = """insert into LIGHTRAG_DOC_STATUS(workspace,id,content,content_summary,content_length,chunks_count,status,file_path,created_at,updated_at)
-                 values($1,$2,$3,$4,$5,$6,$7,$8,$9,$10)
+        sql = """insert into LIGHTRAG_DOC_STATUS(workspace,id,content,content_summary,content_length,chunks_count,status,file_path,created_at,updated_at,chunks_done,chunks_list,metadata)
+                 values($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13)
                   on conflict(id,workspace) do update set
                   content = EXCLUDED.content,
                   content_summary = EXCLUDED.content_summary,
@@ -1065,7 +1157,10 @@ class PGDocStatusStorage(DocStatusStorage):
                   status = EXCLUDED.status,
                   file_path = EXCLUDED.file_path,
                   created_at = EXCLUDED.created_at,
-                  updated_at = EXCLUDED.updated_at"""
+                  updated_at = EXCLUDED.updated_at,
+                  chunks_done = EXCLUDED.chunks_done,
+                  chunks_list = EXCLUDED.chunks_list,
+                  metadata = EXCLUDED.metadata"""
         for k, v in data.items():
             # Remove timezone information, store utc time in db
             created_at = parse_datetime(v.get("created_at"))
@@ -1085,6 +1180,11 @@ class PGDocStatusStorage(DocStatusStorage):
                     "file_path": v["file_path"],
                     "created_at": created_at,  # Use the converted datetime object
                     "updated_at": updated_at,  # Use the converted datetime object
+                    "chunks_done": v.get("chunks_done"),
+                    "chunks_list": json.dumps(v["chunks_list"])
+                    if v.get("chunks_list") is not None
+                    else None,
+                    "metadata": json.dumps(v.get("metadata") or {}, ensure_ascii=False),
                 },
             )
 
@@ -1490,18 +1590,7 @@ class PGGraphStorage(BaseGraphStorage):
                 "PostgreSQL: node properties must contain an 'entity_id' field"
             )
 
-        label = self._normalize_node_id(node_id)
-        properties = self._format_properties(node_data)
-
-        query = """SELECT * FROM cypher('%s', $$
-                     MERGE (n:base {entity_id: "%s"})
-                     SET n += %s
-                     RETURN n
-                   $$) AS (n agtype)""" % (
-            self.graph_name,
-            label,
-            properties,
-        )
+        query = self._upsert_node_query(node_id, node_data)
 
         try:
             await self._query(query, readonly=False, upsert=True)
@@ -1526,11 +1615,39 @@ class PGGraphStorage(BaseGraphStorage):
             target_node_id (str): Label of the target node (used as identifier)
             edge_data (dict): dictionary of properties to set on the edge
         """
+        query = self._upsert_edge_query(source_node_id, target_node_id, edge_data)
+
+        try:
+            await self._query(query, readonly=False, upsert=True)
+
+        except Exception:
+            logger.error(
+                f"POSTGRES, upsert_edge error on edge: `{source_node_id}`-`{target_node_id}`"
+            )
+            raise
+
+    def _upsert_node_query(self, node_id: str, node_data: dict[str, str]) -> str:
+        label = self._normalize_node_id(node_id)
+        properties = self._format_properties(node_data)
+
+        return """SELECT * FROM cypher('%s', $$
+                     MERGE (n:base {entity_id: "%s"})
+                     SET n += %s
+                     RETURN n
+                   $$) AS (n agtype)""" % (
+            self.graph_name,
+            label,
+            properties,
+        )
+
+    def _upsert_edge_query(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ) -> str:
         src_label = self._normalize_node_id(source_node_id)
         tgt_label = self._normalize_node_id(target_node_id)
         edge_properties = self._format_properties(edge_data)
 
-        query = """SELECT * FROM cypher('%s', $$
+        return """SELECT * FROM cypher('%s', $$
                      MATCH (source:base {entity_id: "%s"})
                      WITH source
                      MATCH (target:base {entity_id: "%s"})
@@ -1546,14 +1663,64 @@ class PGGraphStorage(BaseGraphStorage):
             edge_properties,  # https://github.com/HKUDS/LightRAG/issues/1438#issuecomment-2826000195
         )
 
-        try:
-            await self._query(query, readonly=False, upsert=True)
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def _upsert_batch(self, queries: list[str]) -> None:
+        """Run upsert statements as one multi-statement query, i.e. in one round trip and transaction
 
-        except Exception:
-            logger.error(
-                f"POSTGRES, upsert_edge error on edge: `{source_node_id}`-`{target_node_id}`"
-            )
-            raise
+        The statements are the ones of upsert_node and upsert_edge, so a failed batch is
+        rolled back as a whole and can be retried.
+        """
+        await self._query(";\n".join(queries), readonly=False, upsert=True)
+
+    async def upsert_nodes_batch(self, nodes: list[tuple[str, dict[str, str]]]) -> None:
+        """
+        Upsert multiple nodes, GRAPH_UPSERT_BATCH_SIZE nodes per round trip.
+
+        Args:
+            nodes: List of (node_id, node_data) tuples
+        """
+        for node_id, node_data in nodes:
+            if "entity_id" not in node_data:
+                raise ValueError(
+                    "PostgreSQL: node properties must contain an 'entity_id' field"
+                )
+        queries = [
+            self._upsert_node_query(node_id, node_data) for node_id, node_data in nodes
+        ]
+        for i in range(0, len(queries), GRAPH_UPSERT_BATCH_SIZE):
+            try:
+                await self._upsert_batch(queries[i : i + GRAPH_UPSERT_BATCH_SIZE])
+            except Exception:
+                logger.error(
+                    f"POSTGRES, upsert_nodes_batch error on nodes {i}-{i + GRAPH_UPSERT_BATCH_SIZE - 1}"
+                )
+                raise
+
+    async def upsert_edges_batch(
+        self, edges: list[tuple[str, str, dict[str, Any]]]
+    ) -> None:
+        """
+        Upsert multiple edges, GRAPH_UPSERT_BATCH_SIZE edges per round trip.
+
+        Args:
+            edges: List of (source_node_id, target_node_id, edge_data) tuples
+        """
+        queries = [
+            self._upsert_edge_query(source_node_id, target_node_id, edge_data)
+            for source_node_id, target_node_id, edge_data in edges
+        ]
+        for i in range(0, len(queries), GRAPH_UPSERT_BATCH_SIZE):
+            try:
+                await self._upsert_batch(queries[i : i + GRAPH_UPSERT_BATCH_SIZE])
+            except Exception:
+                logger.error(
+                    f"POSTGRES, upsert_edges_batch error on edges {i}-{i + GRAPH_UPSERT_BATCH_SIZE - 1}"
+                )
+                raise
 
     async def delete_node(self, node_id: str) -> None:
         """
@@ -2276,6 +2443,64 @@ class PGGraphStorage(BaseGraphStorage):
             return {"status": "error", "message": str(e)}
 
 
+def _decode_chunk_extraction(row: dict[str, Any]) -> dict[str, Any]:
+    """Convert a LIGHTRAG_CHUNK_EXTRACTIONS row to a chunk extraction record"""
+    extraction = json.loads(row["extraction"]) if row.get("extraction") else {}
+    return {
+        "chunk_id": row["id"],
+        "prompt_version": row["prompt_version"],
+        "nodes": extraction.get("nodes", []),
+        "edges": extraction.get("edges", []),
+    }
+
+
+def _decode_llm_cache(row: dict[str, Any]) -> dict[str, Any]:
+    """Convert a LIGHTRAG_LLM_CACHE row to a cache entry, decoding the embedding shape"""
+    entry = dict(row)
+    if entry.get("embedding_shape"):
+        entry["embedding_shape"] = json.loads(entry["embedding_shape"])
+    return entry
+
+
+def _decode_text_chunk(row: dict[str, Any] | None) -> dict[str, Any] | None:
+    """Convert a LIGHTRAG_DOC_CHUNKS row to a text chunk record, None stays None"""
+    if not row:
+        return None
+    chunk = dict(row)
+    chunk["full_doc_ids"] = (
+        json.loads(row["full_doc_ids"])
+        if row.get("full_doc_ids")
+        else [row["full_doc_id"]]
+    )
+    chunk["file_paths"] = (
+        json.loads(row["file_paths"]) if row.get("file_paths") else [row["file_path"]]
+    )
+    # Chunks stored without their position in the document have no offsets
+    for key in ("start_offset", "end_offset"):
+        if chunk.get(key) is None:
+            chunk.pop(key, None)
+    return chunk
+
+
+def _decode_doc_status(row: dict[str, Any]) -> dict[str, Any]:
+    """Convert a LIGHTRAG_DOC_STATUS row to a document status record"""
+    return {
+        "content": row["content"],
+        "content_length": row["content_length"],
+        "content_summary": row["content_summary"],
+        "status": row["status"],
+        "chunks_count": row["chunks_count"],
+        "chunks_done": row.get("chunks_done"),
+        "chunks_list": json.loads(row["chunks_list"])
+        if row.get("chunks_list")
+        else None,
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "file_path": row["file_path"],
+        "metadata": json.loads(row["metadata"]) if row.get("metadata") else {},
+    }
+
+
 NAMESPACE_TABLE_MAP = {
     NameSpace.KV_STORE_FULL_DOCS: "LIGHTRAG_DOC_FULL",
     NameSpace.KV_STORE_TEXT_CHUNKS: "LIGHTRAG_DOC_CHUNKS",
@@ -2284,6 +2509,7 @@ NAMESPACE_TABLE_MAP = {
     NameSpace.VECTOR_STORE_RELATIONSHIPS: "LIGHTRAG_VDB_RELATION",
     NameSpace.DOC_STATUS: "LIGHTRAG_DOC_STATUS",
     NameSpace.KV_STORE_LLM_RESPONSE_CACHE: "LIGHTRAG_LLM_CACHE",
+    NameSpace.KV_STORE_CHUNK_EXTRACTIONS: "LIGHTRAG_CHUNK_EXTRACTIONS",
 }
 
 
@@ -2293,6 +2519,31 @@ def namespace_to_table_name(namespace: str) -> str:
             return v
 
 
+# Columns added after the first release of a table, added by check_tables when missing
+TABLE_ADDED_COLUMNS = {
+    "LIGHTRAG_DOC_STATUS": {
+        "chunks_done": "int4 NULL",
+        "chunks_list": "JSONB NULL",
+        "metadata": "JSONB NULL",
+    },
+    "LIGHTRAG_DOC_CHUNKS": {
+        "full_doc_ids": "JSONB NULL",
+        "file_paths": "JSONB NULL",
+        "start_offset": "INTEGER NULL",
+        "end_offset": "INTEGER NULL",
+    },
+    "LIGHTRAG_LLM_CACHE": {
+        "cache_type": "varchar(32) NULL",
+        "cache_scope": "varchar(255) NULL",
+        "created_at": "BIGINT NULL",
+        "embedding": "TEXT NULL",
+        "embedding_shape": "JSONB NULL",
+        "embedding_min": "float8 NULL",
+        "embedding_max": "float8 NULL",
+    },
+}
+
+
 TABLES = {
     "LIGHTRAG_DOC_FULL": {
         "ddl": """CREATE TABLE LIGHTRAG_DOC_FULL (
@@ -2316,6 +2567,10 @@ TABLES = {
                     content TEXT,
                     content_vector VECTOR,
                     file_path VARCHAR(256),
+                    full_doc_ids JSONB NULL,
+                    file_paths JSONB NULL,
+                    start_offset INTEGER NULL,
+                    end_offset INTEGER NULL,
                     create_time TIMESTAMP(0) WITH TIME ZONE,
                     update_time TIMESTAMP(0) WITH TIME ZONE,
 	                CONSTRAINT LIGHTRAG_DOC_CHUNKS_PK PRIMARY KEY (workspace, id)
@@ -2357,6 +2612,13 @@ TABLES = {
 	                mode varchar(32) NOT NULL,
                     original_prompt TEXT,
                     return_value TEXT,
+                    cache_type varchar(32) NULL,
+                    cache_scope varchar(255) NULL,
+                    created_at BIGINT NULL,
+                    embedding TEXT NULL,
+                    embedding_shape JSONB NULL,
+                    embedding_min float8 NULL,
+                    embedding_max float8 NULL,
                     create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     update_time TIMESTAMP,
 	                CONSTRAINT LIGHTRAG_LLM_CACHE_PK PRIMARY KEY (workspace, mode, id)
@@ -2370,13 +2632,27 @@ TABLES = {
 	               content_summary varchar(255) NULL,
 	               content_length int4 NULL,
 	               chunks_count int4 NULL,
+	               chunks_done int4 NULL,
+	               chunks_list JSONB NULL,
 	               status varchar(64) NULL,
 	               file_path TEXT NULL,
 	               created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP NULL,
 	               updated_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP NULL,
+	               metadata JSONB NULL,
 	               CONSTRAINT LIGHTRAG_DOC_STATUS_PK PRIMARY KEY (workspace, id)
 	              )"""
     },
+    "LIGHTRAG_CHUNK_EXTRACTIONS": {
+        "ddl": """CREATE TABLE LIGHTRAG_CHUNK_EXTRACTIONS (
+	                workspace varchar(255) NOT NULL,
+	                id varchar(255) NOT NULL,
+	                prompt_version varchar(255) NULL,
+	                extraction TEXT NULL,
+	                create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+	                update_time TIMESTAMP,
+	                CONSTRAINT LIGHTRAG_CHUNK_EXTRACTIONS_PK PRIMARY KEY (workspace, id)
+	                )"""
+    },
 }
 
 
@@ -2386,43 +2662,73 @@ SQL_TEMPLATES = {
                                 FROM LIGHTRAG_DOC_FULL WHERE workspace=$1 AND id=$2
                             """,
     "get_by_id_text_chunks": """SELECT id, tokens, COALESCE(content, '') as content,
-                                chunk_order_index, full_doc_id, file_path
+                                chunk_order_index, full_doc_id, file_path, full_doc_ids, file_paths,
+                                start_offset, end_offset
                                 FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id=$2
                             """,
-    "get_by_id_llm_response_cache": """SELECT id, original_prompt, COALESCE(return_value, '') as "return", mode
+    "get_by_mode_llm_response_cache": """SELECT id, original_prompt, COALESCE(return_value, '') as "return", mode,
+                                cache_type, cache_scope, created_at,
+                                embedding, embedding_shape, embedding_min, embedding_max
                                 FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND mode=$2
                                """,
-    "get_by_mode_id_llm_response_cache": """SELECT id, original_prompt, COALESCE(return_value, '') as "return", mode
+    "get_by_mode_id_llm_response_cache": """SELECT id, original_prompt, COALESCE(return_value, '') as "return", mode,
+                                cache_type, cache_scope, created_at,
+                                embedding, embedding_shape, embedding_min, embedding_max
                            FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND mode=$2 AND id=$3
                           """,
     "get_by_ids_full_docs": """SELECT id, COALESCE(content, '') as content
                                  FROM LIGHTRAG_DOC_FULL WHERE workspace=$1 AND id IN ({ids})
                             """,
     "get_by_ids_text_chunks": """SELECT id, tokens, COALESCE(content, '') as content,
-                                  chunk_order_index, full_doc_id, file_path
+                                  chunk_order_index, full_doc_id, file_path, full_doc_ids, file_paths,
+                                  start_offset, end_offset
                                    FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id IN ({ids})
                                 """,
-    "get_by_ids_llm_response_cache": """SELECT id, original_prompt, COALESCE(return_value, '') as "return", mode
-                                 FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND mode= IN ({ids})
+    "get_by_ids_llm_response_cache": """SELECT id, original_prompt, COALESCE(return_value, '') as "return", mode,
+                                cache_type, cache_scope, created_at,
+                                embedding, embedding_shape, embedding_min, embedding_max
+                                 FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND (mode, id) IN ({ids})
                                 """,
+    "get_by_id_chunk_extractions": """SELECT id, prompt_version, extraction
+                                FROM LIGHTRAG_CHUNK_EXTRACTIONS WHERE workspace=$1 AND id=$2
+                            """,
+    "get_by_ids_chunk_extractions": """SELECT id, prompt_version, extraction
+                                FROM LIGHTRAG_CHUNK_EXTRACTIONS WHERE workspace=$1 AND id IN ({ids})
+                            """,
     "filter_keys": "SELECT id FROM {table_name} WHERE workspace=$1 AND id IN ({ids})",
     "upsert_doc_full": """INSERT INTO LIGHTRAG_DOC_FULL (id, content, workspace)
                         VALUES ($1, $2, $3)
                         ON CONFLICT (workspace,id) DO UPDATE
                            SET content = $2, update_time = CURRENT_TIMESTAMP
                        """,
-    "upsert_llm_response_cache": """INSERT INTO LIGHTRAG_LLM_CACHE(workspace,id,original_prompt,return_value,mode)
-                                      VALUES ($1, $2, $3, $4, $5)
+    "upsert_chunk_extraction": """INSERT INTO LIGHTRAG_CHUNK_EXTRACTIONS(workspace,id,prompt_version,extraction)
+                                      VALUES ($1, $2, $3, $4)
+                                      ON CONFLICT (workspace,id) DO UPDATE
+                                      SET prompt_version = EXCLUDED.prompt_version,
+                                      extraction = EXCLUDED.extraction,
+                                      update_time = CURRENT_TIMESTAMP
+                                     """,
+    "upsert_llm_response_cache": """INSERT INTO LIGHTRAG_LLM_CACHE(workspace,id,original_prompt,return_value,mode,
+                                      cache_type,cache_scope,created_at,
+                                      embedding,embedding_shape,embedding_min,embedding_max)
+                                      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
                                       ON CONFLICT (workspace,mode,id) DO UPDATE
                                       SET original_prompt = EXCLUDED.original_prompt,
                                       return_value=EXCLUDED.return_value,
                                       mode=EXCLUDED.mode,
+                                      cache_type=EXCLUDED.cache_type,
+                                      cache_scope=EXCLUDED.cache_scope,
+                                      created_at=EXCLUDED.created_at,
+                                      embedding=EXCLUDED.embedding,
+                                      embedding_shape=EXCLUDED.embedding_shape,
+                                      embedding_min=EXCLUDED.embedding_min,
+                                      embedding_max=EXCLUDED.embedding_max,
                                       update_time = CURRENT_TIMESTAMP
                                      """,
     "upsert_chunk": """INSERT INTO LIGHTRAG_DOC_CHUNKS (workspace, id, tokens,
                       chunk_order_index, full_doc_id, content, content_vector, file_path,
-                      create_time, update_time)
-                      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                      full_doc_ids, file_paths, start_offset, end_offset, create_time, update_time)
+                      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
                       ON CONFLICT (workspace,id) DO UPDATE
                       SET tokens=EXCLUDED.tokens,
                       chunk_order_index=EXCLUDED.chunk_order_index,
@@ -2430,8 +2736,29 @@ SQL_TEMPLATES = {
                       content = EXCLUDED.content,
                       content_vector=EXCLUDED.content_vector,
                       file_path=EXCLUDED.file_path,
+                      full_doc_ids=EXCLUDED.full_doc_ids,
+                      file_paths=EXCLUDED.file_paths,
+                      start_offset=EXCLUDED.start_offset,
+                      end_offset=EXCLUDED.end_offset,
                       update_time = EXCLUDED.update_time
                      """,
+    # The chunk vector is written by the chunks vector storage sharing the table
+    "upsert_text_chunk": """INSERT INTO LIGHTRAG_DOC_CHUNKS (workspace, id, tokens,
+                      chunk_order_index, full_doc_id, content, file_path,
+                      full_doc_ids, file_paths, start_offset, end_offset, create_time, update_time)
+                      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                      ON CONFLICT (workspace,id) DO UPDATE
+                      SET tokens=EXCLUDED.tokens,
+                      chunk_order_index=EXCLUDED.chunk_order_index,
+                      full_doc_id=EXCLUDED.full_doc_id,
+                      content = EXCLUDED.content,
+                      file_path=EXCLUDED.file_path,
+                      full_doc_ids=EXCLUDED.full_doc_ids,
+                      file_paths=EXCLUDED.file_paths,
+                      start_offset=EXCLUDED.start_offset,
+                      end_offset=EXCLUDED.end_offset,
+                      update_time = CURRENT_TIMESTAMP
+                     """,
     # SQL for VectorStorage
     "upsert_entity": """INSERT INTO LIGHTRAG_VDB_ENTITY (workspace, id, entity_name, content,
                       content_vector, chunk_ids, file_path, create_time, update_time)
@@ -11,9 +11,10 @@ if not pm.is_installed("redis"):
 # aioredis is a depricated library, replaced with redis
 from redis.asyncio import Redis, ConnectionPool  # type: ignore
 from redis.exceptions import RedisError, ConnectionError  # type: ignore
-from lightrag.utils import logger
+from lightrag.utils import flatten_cache_data, logger, make_cache_key
 
 from lightrag.base import BaseKVStorage
+from lightrag.namespace import NameSpace, is_namespace
 import json
 
 
@@ -63,6 +64,37 @@ class RedisKVStorage(BaseKVStorage):
             )
             raise
 
+    async def initialize(self):
+        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            await self._migrate_llm_cache()
+
+    async def _migrate_llm_cache(self):
+        """Split LLM response cache records holding all entries of a mode into flat keys"""
+        prefix = f"{self.namespace}:"
+        async with self._get_redis_connection() as redis:
+            mode_keys = [
+                key
+                async for key in redis.scan_iter(match=f"{prefix}*")
+                if ":" not in key[len(prefix) :]
+            ]
+            for key in mode_keys:
+                data = await redis.get(key)
+                try:
+                    mode_data = {key[len(prefix) :]: json.loads(data)}
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                flat_data = flatten_cache_data(mode_data)
+                if flat_data is None:
+                    continue
+                pipe = redis.pipeline()
+                for flat_key, entry in flat_data.items():
+                    pipe.set(f"{prefix}{flat_key}", json.dumps(entry))
+                pipe.delete(key)
+                await pipe.execute()
+                logger.info(
+                    f"Migrated {len(flat_data)} {key} cache entries to flat mode:hash keys"
+                )
+
     async def close(self):
         """Close the Redis connection pool to prevent resource leaks."""
         if hasattr(self, "_redis") and self._redis:
@@ -87,6 +119,19 @@ class RedisKVStorage(BaseKVStorage):
                 logger.error(f"JSON decode error for id {id}: {e}")
                 return None
 
+    async def get_by_mode(self, mode: str) -> dict[str, dict[str, Any]]:
+        prefix = f"{self.namespace}:{make_cache_key(mode, '')}"
+        async with self._get_redis_connection() as redis:
+            keys = [key async for key in redis.scan_iter(match=f"{prefix}*")]
+            if not keys:
+                return {}
+            values = await redis.mget(keys)
+            return {
+                key[len(prefix) :]: json.loads(value)
+                for key, value in zip(keys, values)
+                if value
+            }
+
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         async with self._get_redis_connection() as redis:
             try:
@@ -148,7 +193,7 @@ class RedisKVStorage(BaseKVStorage):
             )
 
     async def drop_cache_by_modes(self, modes: list[str] | None = None) -> bool:
-        """Delete specific records from storage by by cache mode
+        """Delete the cache entries of the given modes, i.e. the keys with their prefix
 
         Importance notes for Redis storage:
         1. This will immediately delete the specified cache modes from Redis
@@ -164,7 +209,12 @@ class RedisKVStorage(BaseKVStorage):
             return False
 
         try:
-            await self.delete(modes)
+            async with self._get_redis_connection() as redis:
+                for mode in modes:
+                    prefix = f"{self.namespace}:{make_cache_key(mode, '')}"
+                    keys = [key async for key in redis.scan_iter(match=f"{prefix}*")]
+                    if keys:
+                        await redis.delete(*keys)
             return True
         except Exception:
             return False
@@ -1,9 +1,12 @@
 import os
 import sys
 import asyncio
+import zlib
 from multiprocessing.synchronize import Lock as ProcessLock
 from multiprocessing import Manager
-from typing import Any, Dict, Optional, Union, TypeVar, Generic
+from typing import Any, Dict, Iterable, List, Optional, Union, TypeVar, Generic
+
+from lightrag.constants import GRAPH_DB_LOCK_STRIPES
 
 
 # Define a direct print function for critical logs that must be visible in all processes
@@ -38,11 +41,15 @@ _update_flags: Optional[Dict[str, bool]] = None  # namespace -> updated
 _storage_lock: Optional[LockType] = None
 _internal_lock: Optional[LockType] = None
 _pipeline_status_lock: Optional[LockType] = None
-_graph_db_lock: Optional[LockType] = None
+_graph_db_locks: Optional[List[LockType]] = None  # graph database lock stripes
 _data_init_lock: Optional[LockType] = None
 
 # async locks for coroutine synchronization in multiprocess mode
 _async_locks: Optional[Dict[str, asyncio.Lock]] = None
+_async_graph_db_locks: Optional[List[asyncio.Lock]] = None
+
+# Seconds between attempts to acquire a cross-process graph lock stripe from a coroutine
+_PROCESS_LOCK_POLL_INTERVAL = 0.005
 
 
 class UnifiedLock(Generic[T]):
@@ -55,6 +62,7 @@ class UnifiedLock(Generic[T]):
         name: str = "unnamed",
         enable_logging: bool = True,
         async_lock: Optional[asyncio.Lock] = None,
+        poll: bool = False,
     ):
         self._lock = lock
         self._is_async = is_async
@@ -62,6 +70,7 @@ class UnifiedLock(Generic[T]):
         self._name = name  # for debug only
         self._enable_logging = enable_logging  # for debug only
         self._async_lock = async_lock  # auxiliary lock for coroutine synchronization
+        self._poll = poll  # acquire the process lock without blocking the event loop
 
     async def __aenter__(self) -> "UnifiedLock[T]":
         try:
@@ -85,6 +94,8 @@ class UnifiedLock(Generic[T]):
             # Then acquire the main lock
             if self._is_async:
                 await self._lock.acquire()
+            elif self._poll:
+                await self._poll_acquire()
             else:
                 self._lock.acquire()
 
@@ -109,6 +120,20 @@ class UnifiedLock(Generic[T]):
             )
             raise
 
+    async def _poll_acquire(self):
+        """Acquire the process lock with non-blocking attempts, yielding to the event loop in between
+
+        Graph lock stripes are held across awaits by several coroutines of a process, so the
+        current holder may wait for a lock held by a coroutine blocked on the same stripe.
+        """
+        try:
+            while not self._lock.acquire(False):
+                await asyncio.sleep(_PROCESS_LOCK_POLL_INTERVAL)
+        except asyncio.CancelledError:
+            if self._async_lock is not None and self._async_lock.locked():
+                self._async_lock.release()
+            raise
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         main_lock_released = False
         try:
@@ -247,15 +272,82 @@ def get_pipeline_status_lock(enable_logging: bool = False) -> UnifiedLock:
     )
 
 
-def get_graph_db_lock(enable_logging: bool = False) -> UnifiedLock:
-    """return unified graph database lock for ensuring atomic operations"""
-    async_lock = _async_locks.get("graph_db_lock") if _is_multiprocess else None
+class StripedUnifiedLock:
+    """Acquire a set of graph database lock stripes as a single lock
+
+    Stripes are acquired in ascending index order and released in reverse order,
+    so holders of overlapping stripe sets can never deadlock each other.
+    """
+
+    def __init__(self, locks: List[UnifiedLock]):
+        self._locks = locks
+        self._acquired: List[UnifiedLock] = []
+
+    async def __aenter__(self) -> "StripedUnifiedLock":
+        try:
+            for lock in self._locks:
+                await lock.__aenter__()
+                self._acquired.append(lock)
+        except BaseException:
+            await self._release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._release()
+
+    async def _release(self):
+        while self._acquired:
+            await self._acquired.pop().__aexit__(None, None, None)
+
+
+def get_graph_db_lock_stripe(key: str) -> int:
+    """Return the lock stripe index of an entity name
+
+    Entity names are normalized the same way the merge stage matches them (case-insensitive).
+    A stable hash is used so every worker process maps a name to the same stripe.
+    """
+    return zlib.crc32(key.strip().lower().encode("utf-8")) % GRAPH_DB_LOCK_STRIPES
+
+
+def _get_graph_db_stripe_lock(index: int, enable_logging: bool) -> UnifiedLock:
+    async_lock = _async_graph_db_locks[index] if _is_multiprocess else None
     return UnifiedLock(
-        lock=_graph_db_lock,
+        lock=_graph_db_locks[index],
         is_async=not _is_multiprocess,
-        name="graph_db_lock",
+        name=f"graph_db_lock_{index}",
         enable_logging=enable_logging,
         async_lock=async_lock,
+        poll=True,
+    )
+
+
+# TODO: deprecated, use get_graph_db_keyed_lock instead
+def get_graph_db_lock(enable_logging: bool = False) -> StripedUnifiedLock:
+    """return unified graph database lock for ensuring atomic operations on the whole graph
+
+    Deprecated, use get_graph_db_keyed_lock with the touched entity names instead.
+    All lock stripes are acquired in ascending order, which excludes every keyed graph operation.
+    """
+    return StripedUnifiedLock(
+        [
+            _get_graph_db_stripe_lock(index, enable_logging)
+            for index in range(GRAPH_DB_LOCK_STRIPES)
+        ]
+    )
+
+
+def get_graph_db_keyed_lock(
+    keys: Iterable[str], enable_logging: bool = False
+) -> StripedUnifiedLock:
+    """return unified graph database lock covering only the given entity names
+
+    Operations on relationships must pass both endpoint names. Operations whose
+    entity names do not share a lock stripe can run in parallel.
+    """
+    stripes = sorted({get_graph_db_lock_stripe(key) for key in keys})
+    return StripedUnifiedLock(
+        [_get_graph_db_stripe_lock(index, enable_logging) for index in stripes]
     )
 
 
@@ -296,13 +388,14 @@ def initialize_share_data(workers: int = 1):
         _storage_lock, \
         _internal_lock, \
         _pipeline_status_lock, \
-        _graph_db_lock, \
+        _graph_db_locks, \
         _data_init_lock, \
         _shared_dicts, \
         _init_flags, \
         _initialized, \
         _update_flags, \
-        _async_locks
+        _async_locks, \
+        _async_graph_db_locks
 
     # Check if already initialized
     if _initialized:
@@ -319,7 +412,7 @@ def initialize_share_data(workers: int = 1):
         _internal_lock = _manager.Lock()
         _storage_lock = _manager.Lock()
         _pipeline_status_lock = _manager.Lock()
-        _graph_db_lock = _manager.Lock()
+        _graph_db_locks = [_manager.Lock() for _ in range(GRAPH_DB_LOCK_STRIPES)]
         _data_init_lock = _manager.Lock()
         _shared_dicts = _manager.dict()
         _init_flags = _manager.dict()
@@ -330,9 +423,9 @@ def initialize_share_data(workers: int = 1):
             "internal_lock": asyncio.Lock(),
             "storage_lock": asyncio.Lock(),
             "pipeline_status_lock": asyncio.Lock(),
-            "graph_db_lock": asyncio.Lock(),
             "data_init_lock": asyncio.Lock(),
         }
+        _async_graph_db_locks = [asyncio.Lock() for _ in range(GRAPH_DB_LOCK_STRIPES)]
 
         direct_log(
             f"Process {os.getpid()} Shared-Data created for Multiple Process (workers={workers})"
@@ -342,12 +435,13 @@ def initialize_share_data(workers: int = 1):
         _internal_lock = asyncio.Lock()
         _storage_lock = asyncio.Lock()
         _pipeline_status_lock = asyncio.Lock()
-        _graph_db_lock = asyncio.Lock()
+        _graph_db_locks = [asyncio.Lock() for _ in range(GRAPH_DB_LOCK_STRIPES)]
         _data_init_lock = asyncio.Lock()
         _shared_dicts = {}
         _init_flags = {}
         _update_flags = {}
         _async_locks = None  # No need for async locks in single process mode
+        _async_graph_db_locks = None
         direct_log(f"Process {os.getpid()} Shared-Data created for Single Process")
 
     # Mark as initialized
@@ -377,6 +471,8 @@ async def initialize_pipeline_status():
                 "docs": 0,  # Total number of documents to be indexed
                 "batchs": 0,  # Number of batches for processing documents
                 "cur_batch": 0,  # Current processing batch
+                "queue_depths": {},  # Documents waiting in each insert pipeline stage
+                "gleaning": {},  # Yield statistics of the entity extraction gleaning rounds
                 "request_pending": False,  # Flag for pending request for processing
                 "latest_message": "",  # Latest message from pipeline processing
                 "history_messages": history_messages,  # 使用共享列表对象
@@ -529,13 +625,14 @@ def finalize_share_data():
         _storage_lock, \
         _internal_lock, \
         _pipeline_status_lock, \
-        _graph_db_lock, \
+        _graph_db_locks, \
         _data_init_lock, \
         _shared_dicts, \
         _init_flags, \
         _initialized, \
         _update_flags, \
-        _async_locks
+        _async_locks, \
+        _async_graph_db_locks
 
     # Check if already initialized
     if not _initialized:
@@ -597,9 +694,10 @@ def finalize_share_data():
     _storage_lock = None
     _internal_lock = None
     _pipeline_status_lock = None
-    _graph_db_lock = None
+    _graph_db_locks = None
     _data_init_lock = None
     _update_flags = None
     _async_locks = None
+    _async_graph_db_locks = None
 
     direct_log(f"Process {os.getpid()} storage data finalization complete")
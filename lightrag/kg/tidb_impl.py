@@ -435,8 +435,12 @@ class TiDBVectorDBStorage(BaseVectorStorage):
         embeddings = await self.embedding_func(
             [query], _priority=5
         )  # higher priority for query
-        embedding = embeddings[0]
+        return await self.query_by_vector(embeddings[0], top_k, ids)
 
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int, ids: list[str] | None = None
+    ) -> list[dict[str, Any]]:
+        """Search from tidb vector with a precomputed query embedding"""
         embedding_string = "[" + ", ".join(map(str, embedding.tolist())) + "]"
 
         params = {
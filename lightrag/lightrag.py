@@ -12,17 +12,28 @@ from typing import (
     Any,
     AsyncIterator,
     Callable,
+    Iterable,
     Iterator,
     cast,
     final,
     Literal,
     Optional,
-    List,
     Dict,
 )
 from lightrag.constants import (
     DEFAULT_MAX_TOKEN_SUMMARY,
     DEFAULT_FORCE_LLM_SUMMARY_ON_MERGE,
+    DEFAULT_NEAR_DUPLICATE_THRESHOLD,
+    DEFAULT_MINHASH_NUM_PERM,
+    DEFAULT_SHINGLE_SIZE,
+    EXTRACT_PACK_LINGER,
+    DEFAULT_GLEANING_YIELD_THRESHOLD,
+    GLEANING_YIELD_WINDOW,
+    GLEANING_PROBE_INTERVAL,
+    DEFAULT_EMBEDDING_VECTOR_CACHE_MAX_ENTRIES,
+    DEFAULT_QUERY_CACHE_MAX_ENTRIES,
+    DEFAULT_RETRIEVAL_CACHE_MAX_ENTRIES,
+    DEFAULT_RETRIEVAL_CACHE_TTL,
 )
 from lightrag.utils import get_env_value
 
@@ -34,6 +45,7 @@ from lightrag.kg import (
 from lightrag.kg.shared_storage import (
     get_namespace_data,
     get_pipeline_status_lock,
+    get_storage_lock,
 )
 
 from .base import (
@@ -48,13 +60,17 @@ from .base import (
     StoragesStatus,
 )
 from .namespace import NameSpace, make_namespace
+from .near_duplicate import NearDuplicateIndex
+from .embedding_cache import EmbeddingVectorCache
 from .operate import (
     chunking_by_token_size,
     extract_entities,
+    extraction_prompt_version,
     merge_nodes_and_edges,
     kg_query,
     naive_query,
     query_with_keywords,
+    run_chunking_func,
 )
 from .prompt import GRAPH_FIELD_SEP
 from .utils import (
@@ -65,11 +81,21 @@ from .utils import (
     compute_mdhash_id,
     convert_response_to_json,
     lazy_external_import,
+    load_json,
+    write_json,
     priority_limit_async_func_call,
+    micro_batch_async_func_call,
+    count_tokens,
     get_content_summary,
     clean_text,
     check_storage_env_vars,
     logger,
+    FairTaskScheduler,
+    CpuWorkerPool,
+    TokenBudgetBatcher,
+    GleaningYieldTracker,
+    RetrievalContextCache,
+    BatchedKVFetcher,
 )
 from .types import KnowledgeGraph
 from dotenv import load_dotenv
@@ -123,6 +149,18 @@ class LightRAG:
     entity_extract_max_gleaning: int = field(default=1)
     """Maximum number of entity extraction attempts for ambiguous content."""
 
+    entity_extract_pack_tokens: int = field(
+        default=get_env_value("ENTITY_EXTRACT_PACK_TOKENS", 0, int)
+    )
+    """Token budget of small chunks packed into one entity extraction prompt, 0 disables packing. Only chunks of at most half the budget are packed."""
+
+    gleaning_yield_threshold: float = field(
+        default=get_env_value(
+            "GLEANING_YIELD_THRESHOLD", DEFAULT_GLEANING_YIELD_THRESHOLD, float
+        )
+    )
+    """Minimum recent yield of new entities and relations per extra LLM call for a gleaning round to run, 0 always runs entity_extract_max_gleaning rounds."""
+
     summary_to_max_tokens: int = field(
         default=get_env_value("MAX_TOKEN_SUMMARY", DEFAULT_MAX_TOKEN_SUMMARY, int)
     )
@@ -163,7 +201,7 @@ class LightRAG:
             int,
             int,
         ],
-        List[Dict[str, Any]],
+        Iterable[Dict[str, Any]],
     ] = field(default_factory=lambda: chunking_by_token_size)
     """
     Custom chunking function for splitting text into chunks before processing.
@@ -177,11 +215,36 @@ class LightRAG:
         - `chunk_token_size`: The maximum number of tokens per chunk.
         - `chunk_overlap_token_size`: The number of overlapping tokens between consecutive chunks.
 
-    The function should return a list of dictionaries, where each dictionary contains the following keys:
+    The function should return a list (or an iterator) of dictionaries, where each dictionary contains the following keys:
         - `tokens`: The number of tokens in the chunk.
         - `content`: The text content of the chunk.
 
-    Defaults to `chunking_by_token_size` if not specified.
+    Defaults to `chunking_by_token_size` if not specified. `chunking_by_token_offsets` tokenizes each
+    document only once, slices the chunks from the original text and adds their `start_offset` and
+    `end_offset` character positions to the chunks.
+    """
+
+    # Near-duplicate detection
+    # ---
+
+    near_duplicate_config: dict[str, Any] = field(
+        default_factory=lambda: {
+            "enabled": get_env_value("ENABLE_NEAR_DUPLICATE_DETECTION", False, bool),
+            "threshold": get_env_value(
+                "NEAR_DUPLICATE_THRESHOLD", DEFAULT_NEAR_DUPLICATE_THRESHOLD, float
+            ),
+            "action": get_env_value("NEAR_DUPLICATE_ACTION", "flag", str),
+            "num_perm": DEFAULT_MINHASH_NUM_PERM,
+            "shingle_size": DEFAULT_SHINGLE_SIZE,
+        }
+    )
+    """Configuration for near-duplicate detection of enqueued documents.
+    - enabled: If True, new documents are compared to a persistent MinHash/LSH index in the working dir.
+    - threshold: Minimum estimated Jaccard similarity of the word shingles to count as a near duplicate.
+    - action: "flag" records the match in the document metadata and processes the document,
+      "skip" records the match and marks the document processed without extracting it.
+    - num_perm: Number of MinHash permutations per signature.
+    - shingle_size: Number of words per shingle.
     """
 
     # Embedding
@@ -198,6 +261,11 @@ class LightRAG:
     )
     """Maximum number of concurrent embedding function calls."""
 
+    embedding_micro_batch_ms: float = field(
+        default=get_env_value("EMBEDDING_MICRO_BATCH_MS", 0, float)
+    )
+    """Milliseconds concurrent small embedding calls (e.g. query embeddings) wait to be combined into one call of up to embedding_batch_num texts, 0 disables combining."""
+
     embedding_cache_config: dict[str, Any] = field(
         default_factory=lambda: {
             "enabled": False,
@@ -205,12 +273,29 @@ class LightRAG:
             "use_llm_check": False,
         }
     )
-    """Configuration for embedding cache.
+    """Configuration for embedding cache, which serves the cached answers of similar queries.
     - enabled: If True, enables caching to avoid redundant computations.
     - similarity_threshold: Minimum similarity score to use cached embeddings.
     - use_llm_check: If True, validates cached embeddings using an LLM.
     """
 
+    embedding_vector_cache_config: dict[str, Any] = field(
+        default_factory=lambda: {
+            "enabled": get_env_value("ENABLE_EMBEDDING_VECTOR_CACHE", False, bool),
+            "model_name": get_env_value("EMBEDDING_MODEL", ""),
+            "max_entries": get_env_value(
+                "EMBEDDING_VECTOR_CACHE_MAX_ENTRIES",
+                DEFAULT_EMBEDDING_VECTOR_CACHE_MAX_ENTRIES,
+                int,
+            ),
+        }
+    )
+    """Configuration for the persistent cache of embedding vectors shared by all vector storages.
+    - enabled: If True, the vectors of embedded texts are cached in the working dir and reused for identical texts.
+    - model_name: Name of the embedding model, the cache is kept per model and dimension. Defaults to the embedding function name.
+    - max_entries: Maximum number of cached vectors, the least recently used are evicted.
+    """
+
     # LLM Configuration
     # ---
 
@@ -245,11 +330,57 @@ class LightRAG:
     enable_llm_cache_for_entity_extract: bool = field(default=True)
     """If True, enables caching for entity extraction steps to reduce LLM costs."""
 
+    query_cache_ttl: int = field(default=get_env_value("QUERY_CACHE_TTL", 0, int))
+    """Seconds a cached query answer is served before it is regenerated, 0 for no expiry."""
+
+    query_cache_max_entries: int = field(
+        default=get_env_value(
+            "QUERY_CACHE_MAX_ENTRIES", DEFAULT_QUERY_CACHE_MAX_ENTRIES, int
+        )
+    )
+    """Maximum number of cached query answers per query mode, the oldest are evicted first."""
+
+    retrieval_cache_max_entries: int = field(
+        default=get_env_value(
+            "RETRIEVAL_CACHE_MAX_ENTRIES", DEFAULT_RETRIEVAL_CACHE_MAX_ENTRIES, int
+        )
+    )
+    """Maximum number of query contexts kept in memory for queries with the same keywords, 0 disables the cache."""
+
+    retrieval_cache_ttl: float = field(
+        default=get_env_value("RETRIEVAL_CACHE_TTL", DEFAULT_RETRIEVAL_CACHE_TTL, float)
+    )
+    """Seconds a cached query context is reused, 0 for no expiry."""
+
     # Extensions
     # ---
 
     max_parallel_insert: int = field(default=int(os.getenv("MAX_PARALLEL_INSERT", 2)))
-    """Maximum number of parallel insert operations."""
+    """Maximum number of parallel insert operations (documents in the extraction stage, at least llm_model_max_async)."""
+
+    max_parallel_chunking: int = field(
+        default=int(os.getenv("MAX_PARALLEL_CHUNKING", 2))
+    )
+    """Maximum number of documents in the chunking stage of the insert pipeline."""
+
+    max_parallel_merge: int = field(default=int(os.getenv("MAX_PARALLEL_MERGE", 2)))
+    """Maximum number of documents in the merge stage of the insert pipeline."""
+
+    max_parallel_vector_upsert: int = field(
+        default=int(os.getenv("MAX_PARALLEL_VECTOR_UPSERT", 2))
+    )
+    """Maximum number of documents in the chunk vector upsert stage of the insert pipeline."""
+
+    pipeline_queue_size: int = field(default=int(os.getenv("PIPELINE_QUEUE_SIZE", 4)))
+    """Maximum number of documents waiting between two stages of the insert pipeline."""
+
+    max_cpu_workers: int = field(default=int(os.getenv("MAX_CPU_WORKERS", 0)))
+    """Number of worker processes for CPU-bound ingestion work (chunking, extraction result and file parsing), 0 runs it on the event loop."""
+
+    cpu_worker_queue_size: int = field(
+        default=int(os.getenv("CPU_WORKER_QUEUE_SIZE", 16))
+    )
+    """Maximum number of CPU-bound calls waiting for a worker process."""
 
     addon_params: dict[str, Any] = field(
         default_factory=lambda: {
@@ -349,6 +480,23 @@ class LightRAG:
         self.embedding_func = priority_limit_async_func_call(
             self.embedding_func_max_async
         )(self.embedding_func)
+        if self.embedding_micro_batch_ms > 0:
+            self.embedding_func = micro_batch_async_func_call(
+                self.embedding_batch_num, self.embedding_micro_batch_ms / 1000
+            )(self.embedding_func)
+
+        self.embedding_vector_cache: EmbeddingVectorCache | None = None
+        if self.embedding_vector_cache_config.get("enabled"):
+            self.embedding_vector_cache = EmbeddingVectorCache(
+                self.working_dir,
+                self.embedding_vector_cache_config.get("model_name")
+                or getattr(self.embedding_func.func, "__name__", ""),
+                self.embedding_func.embedding_dim,
+                self.embedding_vector_cache_config.get(
+                    "max_entries", DEFAULT_EMBEDDING_VECTOR_CACHE_MAX_ENTRIES
+                ),
+            )
+            self.embedding_func = self.embedding_vector_cache.wrap(self.embedding_func)
 
         # Initialize all storages
         self.key_string_value_json_storage_cls: type[BaseKVStorage] = (
@@ -397,6 +545,13 @@ class LightRAG:
             ),
             embedding_func=self.embedding_func,
         )
+
+        self.chunk_extractions: BaseKVStorage = self.key_string_value_json_storage_cls(  # type: ignore
+            namespace=make_namespace(
+                self.namespace_prefix, NameSpace.KV_STORE_CHUNK_EXTRACTIONS
+            ),
+            embedding_func=self.embedding_func,
+        )
         self.chunk_entity_relation_graph: BaseGraphStorage = self.graph_storage_cls(  # type: ignore
             namespace=make_namespace(
                 self.namespace_prefix, NameSpace.GRAPH_STORE_CHUNK_ENTITY_RELATION
@@ -433,9 +588,52 @@ class LightRAG:
             embedding_func=None,
         )
 
+        self.near_duplicate_index: NearDuplicateIndex | None = None
+        if self.near_duplicate_config.get("enabled", False):
+            if self.near_duplicate_config.get("action", "flag") not in ("flag", "skip"):
+                raise ValueError(
+                    "near_duplicate_config action must be either 'flag' or 'skip'"
+                )
+            self.near_duplicate_index = NearDuplicateIndex(
+                file_name=os.path.join(
+                    self.working_dir,
+                    f"{make_namespace(self.namespace_prefix, NameSpace.NEAR_DUPLICATE_INDEX)}.json",
+                ),
+                threshold=self.near_duplicate_config.get(
+                    "threshold", DEFAULT_NEAR_DUPLICATE_THRESHOLD
+                ),
+                num_perm=self.near_duplicate_config.get(
+                    "num_perm", DEFAULT_MINHASH_NUM_PERM
+                ),
+                shingle_size=self.near_duplicate_config.get(
+                    "shingle_size", DEFAULT_SHINGLE_SIZE
+                ),
+            )
+
+        # Knowledge base version, part of the query cache keys so that cached answers
+        # are not served after documents or the graph changed
+        self._kb_version_file = os.path.join(
+            self.working_dir,
+            f"{make_namespace(self.namespace_prefix, NameSpace.KB_VERSION)}.json",
+        )
+        self._kb_version = 0
+        self._kb_version_mtime: float | None = None
+        self.retrieval_context_cache: RetrievalContextCache | None = None
+        if self.retrieval_cache_max_entries > 0:
+            self.retrieval_context_cache = RetrievalContextCache(
+                self.retrieval_cache_max_entries, self.retrieval_cache_ttl
+            )
+
         # Directly use llm_response_cache, don't create a new object
         hashing_kv = self.llm_response_cache
 
+        self.cpu_pool = CpuWorkerPool(self.max_cpu_workers, self.cpu_worker_queue_size)
+        self.gleaning_tracker = GleaningYieldTracker(
+            self.gleaning_yield_threshold,
+            GLEANING_YIELD_WINDOW,
+            GLEANING_PROBE_INTERVAL,
+        )
+
         self.llm_model_func = priority_limit_async_func_call(self.llm_model_max_async)(
             partial(
                 self.llm_model_func,  # type: ignore
@@ -480,6 +678,7 @@ class LightRAG:
             for storage in (
                 self.full_docs,
                 self.text_chunks,
+                self.chunk_extractions,
                 self.entities_vdb,
                 self.relationships_vdb,
                 self.chunks_vdb,
@@ -503,6 +702,7 @@ class LightRAG:
             for storage in (
                 self.full_docs,
                 self.text_chunks,
+                self.chunk_extractions,
                 self.entities_vdb,
                 self.relationships_vdb,
                 self.chunks_vdb,
@@ -515,6 +715,10 @@ class LightRAG:
 
             await asyncio.gather(*tasks)
 
+            if self.embedding_vector_cache is not None:
+                await self.embedding_vector_cache.flush()
+            self.cpu_pool.shutdown()
+
             self._storages_status = StoragesStatus.FINALIZED
             logger.debug("Finalized Storages")
 
@@ -571,7 +775,12 @@ class LightRAG:
         loop = always_get_an_event_loop()
         loop.run_until_complete(
             self.ainsert(
-                input, split_by_character, split_by_character_only, ids, file_paths, doc_metadata
+                input,
+                split_by_character,
+                split_by_character_only,
+                ids,
+                file_paths,
+                doc_metadata,
             )
         )
 
@@ -686,7 +895,8 @@ class LightRAG:
         2. Remove duplicate contents
         3. Generate document initial status
         4. Filter out already processed documents
-        5. Enqueue document in status
+        5. Flag or skip near duplicates if near-duplicate detection is enabled
+        6. Enqueue document in status
 
         Args:
             input: Single document string or list of document strings
@@ -720,7 +930,9 @@ class LightRAG:
             if isinstance(doc_metadata, dict):
                 doc_metadata = [doc_metadata]
             if len(doc_metadata) != len(input):
-                raise ValueError("Number of doc_metadata must match the number of documents")
+                raise ValueError(
+                    "Number of doc_metadata must match the number of documents"
+                )
         else:
             doc_metadata = [dict() for _ in range(len(input))]
 
@@ -737,12 +949,15 @@ class LightRAG:
             # Generate contents dict of IDs provided by user and documents
             contents = {
                 id_: {"content": doc, "file_path": path, "metadata": metadata}
-                for id_, doc, path, metadata in zip(ids, input, file_paths, doc_metadata)
+                for id_, doc, path, metadata in zip(
+                    ids, input, file_paths, doc_metadata
+                )
             }
         else:
             # Clean input text and remove duplicates
             cleaned_input = [
-                (clean_text(doc), path, metadata) for doc, path, metadata in zip(input, file_paths, doc_metadata)
+                (clean_text(doc), path, metadata)
+                for doc, path, metadata in zip(input, file_paths, doc_metadata)
             ]
             unique_content_with_paths = {}
 
@@ -756,7 +971,7 @@ class LightRAG:
                 compute_mdhash_id(content, prefix="doc-"): {
                     "content": content,
                     "file_path": path,
-                    "metadata": metadata
+                    "metadata": metadata,
                 }
                 for content, (path, metadata) in unique_content_with_paths.items()
             }
@@ -784,8 +999,10 @@ class LightRAG:
                 "content_length": len(content_data["content"]),
                 "created_at": datetime.now(timezone.utc).isoformat(),
                 "updated_at": datetime.now(timezone.utc).isoformat(),
-                "file_path": content_data["file_path"],  # Store file path in document status
-                "metadata": content_data["metadata"]
+                "file_path": content_data[
+                    "file_path"
+                ],  # Store file path in document status
+                "metadata": content_data["metadata"],
             }
             for id_, content_data in contents.items()
         }
@@ -819,10 +1036,105 @@ class LightRAG:
             logger.info("No new unique documents were found.")
             return
 
-        # 5. Store status document
+        # 5. Flag or skip near duplicates of indexed documents
+        if self.near_duplicate_index is not None:
+            await self._detect_near_duplicates(new_docs)
+
+        # 6. Store status document
         await self.doc_status.upsert(new_docs)
         logger.info(f"Stored {len(new_docs)} new unique documents")
 
+    async def _detect_near_duplicates(self, new_docs: dict[str, Any]) -> None:
+        """Match new documents against the near-duplicate index
+
+        Documents whose estimated Jaccard similarity to an indexed document reaches the
+        threshold get the decision and the matched document id recorded under
+        metadata["near_duplicate"]. Skipped documents are marked processed without chunks
+        and stay out of the index, all other documents are added to it, so documents of
+        the same batch are matched against each other too.
+
+        Args:
+            new_docs: Initial status records of the new documents, updated in place
+        """
+        index = self.near_duplicate_index
+        action = self.near_duplicate_config.get("action", "flag")
+        signatures = await asyncio.to_thread(
+            lambda: {
+                doc_id: index.signature(doc["content"])
+                for doc_id, doc in new_docs.items()
+            }
+        )
+
+        # The index file is shared by all workers
+        async with get_storage_lock():
+            index.load()
+            for doc_id, doc in new_docs.items():
+                match = index.query(signatures[doc_id])
+                if match is None:
+                    index.add(doc_id, signatures[doc_id])
+                    continue
+
+                matched_doc_id, similarity = match
+                doc["metadata"] = {
+                    **(doc.get("metadata") or {}),
+                    "near_duplicate": {
+                        "action": "skipped" if action == "skip" else "flagged",
+                        "matched_doc_id": matched_doc_id,
+                        "similarity": round(similarity, 4),
+                    },
+                }
+                if action == "skip":
+                    doc.update(
+                        {
+                            "status": DocStatus.PROCESSED,
+                            "chunks_count": 0,
+                            "chunks_list": [],
+                        }
+                    )
+                else:
+                    index.add(doc_id, signatures[doc_id])
+                logger.info(
+                    f"Document {doc_id} is a near duplicate of {matched_doc_id} "
+                    f"(similarity {similarity:.2f}), {doc['metadata']['near_duplicate']['action']}"
+                )
+            index.save()
+
+    async def _reindex_near_duplicate(self, doc_id: str, content: str) -> None:
+        if self.near_duplicate_index is None:
+            return
+        signature = await asyncio.to_thread(
+            self.near_duplicate_index.signature, content
+        )
+        async with get_storage_lock():
+            self.near_duplicate_index.load()
+            self.near_duplicate_index.add(doc_id, signature)
+            self.near_duplicate_index.save()
+
+    async def _remove_from_near_duplicate_index(self, doc_ids: list[str]) -> None:
+        if self.near_duplicate_index is None:
+            return
+        async with get_storage_lock():
+            self.near_duplicate_index.load()
+            if self.near_duplicate_index.remove(doc_ids):
+                self.near_duplicate_index.save()
+
+    def _get_kb_version(self) -> int:
+        """Current knowledge base version, reloaded when another process bumped it"""
+        if os.path.exists(self._kb_version_file):
+            mtime = os.path.getmtime(self._kb_version_file)
+            if mtime != self._kb_version_mtime:
+                data = load_json(self._kb_version_file) or {}
+                self._kb_version = data.get("kb_version", 0)
+                self._kb_version_mtime = mtime
+        return self._kb_version
+
+    async def _bump_kb_version(self) -> None:
+        """Invalidate the cached query answers after the knowledge base changed"""
+        async with get_storage_lock():
+            self._kb_version = self._get_kb_version() + 1
+            write_json({"kb_version": self._kb_version}, self._kb_version_file)
+            self._kb_version_mtime = os.path.getmtime(self._kb_version_file)
+
     async def apipeline_process_enqueue_documents(
         self,
         split_by_character: str | None = None,
@@ -834,9 +1146,9 @@ class LightRAG:
         document status.
 
         1. Get all pending, failed, and abnormally terminated processing documents.
-        2. Split document content into chunks
-        3. Process each chunk for entity and relation extraction
-        4. Update the document status
+        2. Run the documents through the staged pipeline (see _run_pipeline_stages):
+           chunking, entity and relation extraction, merge, chunk vector upsert, persist
+        3. Update the document status
         """
 
         # Get pipeline status shared data and lock
@@ -914,273 +1226,13 @@ class LightRAG:
                 job_name = f"{path_prefix}[{total_files} files]"
                 pipeline_status["job_name"] = job_name
 
-                # Create a counter to track the number of processed files
-                processed_count = 0
-                # Create a semaphore to limit the number of concurrent file processing
-                semaphore = asyncio.Semaphore(self.max_parallel_insert)
-
-                async def process_document(
-                    doc_id: str,
-                    status_doc: DocProcessingStatus,
-                    split_by_character: str | None,
-                    split_by_character_only: bool,
-                    pipeline_status: dict,
-                    pipeline_status_lock: asyncio.Lock,
-                    semaphore: asyncio.Semaphore,
-                ) -> None:
-                    """Process single document"""
-                    file_extraction_stage_ok = False
-                    async with semaphore:
-                        nonlocal processed_count
-                        current_file_number = 0
-                        try:
-                            # Get file path from status document
-                            file_path = getattr(
-                                status_doc, "file_path", "unknown_source"
-                            )
-                            metadata = getattr(status_doc, "metadata", {})
-
-                            async with pipeline_status_lock:
-                                # Update processed file count and save current file number
-                                processed_count += 1
-                                current_file_number = (
-                                    processed_count  # Save the current file number
-                                )
-                                pipeline_status["cur_batch"] = processed_count
-
-                                log_message = f"Extracting stage {current_file_number}/{total_files}: {file_path}"
-                                logger.info(log_message)
-                                pipeline_status["history_messages"].append(log_message)
-                                log_message = f"Processing d-id: {doc_id}"
-                                logger.info(log_message)
-                                pipeline_status["latest_message"] = log_message
-                                pipeline_status["history_messages"].append(log_message)
-
-                            # Generate chunks from document
-                            chunks: dict[str, Any] = {
-                                compute_mdhash_id(dp["content"], prefix="chunk-"): {
-                                    **dp,
-                                    "full_doc_id": doc_id,
-                                    "file_path": file_path,  # Add file path to each chunk
-                                    "metadata": metadata # Add document metadata to each chunk
-                                }
-                                for dp in self.chunking_func(
-                                    self.tokenizer,
-                                    status_doc.content,
-                                    split_by_character,
-                                    split_by_character_only,
-                                    self.chunk_overlap_token_size,
-                                    self.chunk_token_size,
-                                )
-                            }
-
-                            # Store document and chunks in Neo4j
-                            doc_data = {
-                                "content": status_doc.content,
-                                "content_summary": status_doc.content_summary,
-                                "content_length": status_doc.content_length,
-                                "created_at": status_doc.created_at,
-                                "updated_at": datetime.now(timezone.utc).isoformat(),
-                                "file_path": file_path,
-                                "chunks": [
-                                    {
-                                        "id": chunk_id,
-                                        "content": chunk_data["content"],
-                                        "tokens": chunk_data["tokens"],
-                                        "chunk_order_index": chunk_data.get("chunk_order_index", 0),
-                                        "file_path": file_path
-                                    }
-                                    for chunk_id, chunk_data in chunks.items()
-                                ]
-                            }
-                            await self.chunk_entity_relation_graph.upsert_document(doc_id, doc_data)
-
-                            # Process document (text chunks and full docs) in parallel
-                            # Create tasks with references for potential cancellation
-                            doc_status_task = asyncio.create_task(
-                                self.doc_status.upsert(
-                                    {
-                                        doc_id: {
-                                            "status": DocStatus.PROCESSING,
-                                            "chunks_count": len(chunks),
-                                            "content": status_doc.content,
-                                            "content_summary": status_doc.content_summary,
-                                            "content_length": status_doc.content_length,
-                                            "created_at": status_doc.created_at,
-                                            "updated_at": datetime.now(
-                                                timezone.utc
-                                            ).isoformat(),
-                                            "file_path": file_path,
-                                            **status_doc.metadata
-                                        }
-                                    }
-                                )
-                            )
-                            chunks_vdb_task = asyncio.create_task(
-                                self.chunks_vdb.upsert(chunks)
-                            )
-                            entity_relation_task = asyncio.create_task(
-                                self._process_entity_relation_graph(
-                                    chunks, pipeline_status, pipeline_status_lock
-                                )
-                            )
-                            full_docs_task = asyncio.create_task(
-                                self.full_docs.upsert(
-                                    {doc_id: {"content": status_doc.content}}
-                                )
-                            )
-                            text_chunks_task = asyncio.create_task(
-                                self.text_chunks.upsert(chunks)
-                            )
-                            tasks = [
-                                doc_status_task,
-                                chunks_vdb_task,
-                                entity_relation_task,
-                                full_docs_task,
-                                text_chunks_task,
-                            ]
-                            await asyncio.gather(*tasks)
-                            file_extraction_stage_ok = True
-
-                        except Exception as e:
-                            # Log error and update pipeline status
-                            logger.error(traceback.format_exc())
-                            error_msg = f"Failed to extrat document {current_file_number}/{total_files}: {file_path}"
-                            logger.error(error_msg)
-                            async with pipeline_status_lock:
-                                pipeline_status["latest_message"] = error_msg
-                                pipeline_status["history_messages"].append(
-                                    traceback.format_exc()
-                                )
-                                pipeline_status["history_messages"].append(error_msg)
-
-                                # Cancel other tasks as they are no longer meaningful
-                                for task in [
-                                    chunks_vdb_task,
-                                    entity_relation_task,
-                                    full_docs_task,
-                                    text_chunks_task,
-                                ]:
-                                    if not task.done():
-                                        task.cancel()
-
-                            # Persistent llm cache
-                            if self.llm_response_cache:
-                                await self.llm_response_cache.index_done_callback()
-
-                            # Update document status to failed
-                            await self.doc_status.upsert(
-                                {
-                                    doc_id: {
-                                        "status": DocStatus.FAILED,
-                                        "error": str(e),
-                                        "content": status_doc.content,
-                                        "content_summary": status_doc.content_summary,
-                                        "content_length": status_doc.content_length,
-                                        "created_at": status_doc.created_at,
-                                        "updated_at": datetime.now(
-                                            timezone.utc
-                                        ).isoformat(),
-                                        "file_path": file_path,
-                                    }
-                                }
-                            )
-
-                    # Semphore released, concurrency controlled by graph_db_lock in merge_nodes_and_edges instead
-
-                    if file_extraction_stage_ok:
-                        try:
-                            # Get chunk_results from entity_relation_task
-                            chunk_results = await entity_relation_task
-                            await merge_nodes_and_edges(
-                                chunk_results=chunk_results,  # result collected from entity_relation_task
-                                knowledge_graph_inst=self.chunk_entity_relation_graph,
-                                entity_vdb=self.entities_vdb,
-                                relationships_vdb=self.relationships_vdb,
-                                global_config=asdict(self),
-                                pipeline_status=pipeline_status,
-                                pipeline_status_lock=pipeline_status_lock,
-                                llm_response_cache=self.llm_response_cache,
-                                current_file_number=current_file_number,
-                                total_files=total_files,
-                                file_path=file_path,
-                            )
-
-                            await self.doc_status.upsert(
-                                {
-                                    doc_id: {
-                                        "status": DocStatus.PROCESSED,
-                                        "chunks_count": len(chunks),
-                                        "content": status_doc.content,
-                                        "content_summary": status_doc.content_summary,
-                                        "content_length": status_doc.content_length,
-                                        "created_at": status_doc.created_at,
-                                        "updated_at": datetime.now(
-                                            timezone.utc
-                                        ).isoformat(),
-                                        "file_path": file_path,
-                                    }
-                                }
-                            )
-
-                            # Call _insert_done after processing each file
-                            await self._insert_done()
-
-                            async with pipeline_status_lock:
-                                log_message = f"Completed processing file {current_file_number}/{total_files}: {file_path}"
-                                logger.info(log_message)
-                                pipeline_status["latest_message"] = log_message
-                                pipeline_status["history_messages"].append(log_message)
-
-                        except Exception as e:
-                            # Log error and update pipeline status
-                            logger.error(traceback.format_exc())
-                            error_msg = f"Merging stage failed in document {current_file_number}/{total_files}: {file_path}"
-                            logger.error(error_msg)
-                            async with pipeline_status_lock:
-                                pipeline_status["latest_message"] = error_msg
-                                pipeline_status["history_messages"].append(
-                                    traceback.format_exc()
-                                )
-                                pipeline_status["history_messages"].append(error_msg)
-
-                            # Persistent llm cache
-                            if self.llm_response_cache:
-                                await self.llm_response_cache.index_done_callback()
-
-                            # Update document status to failed
-                            await self.doc_status.upsert(
-                                {
-                                    doc_id: {
-                                        "status": DocStatus.FAILED,
-                                        "error": str(e),
-                                        "content": status_doc.content,
-                                        "content_summary": status_doc.content_summary,
-                                        "content_length": status_doc.content_length,
-                                        "created_at": status_doc.created_at,
-                                        "updated_at": datetime.now().isoformat(),
-                                        "file_path": file_path,
-                                    }
-                                }
-                            )
-
-                # Create processing tasks for all documents
-                doc_tasks = []
-                for doc_id, status_doc in to_process_docs.items():
-                    doc_tasks.append(
-                        process_document(
-                            doc_id,
-                            status_doc,
-                            split_by_character,
-                            split_by_character_only,
-                            pipeline_status,
-                            pipeline_status_lock,
-                            semaphore,
-                        )
-                    )
-
-                # Wait for all document processing to complete
-                await asyncio.gather(*doc_tasks)
+                await self._run_pipeline_stages(
+                    to_process_docs,
+                    split_by_character,
+                    split_by_character_only,
+                    pipeline_status,
+                    pipeline_status_lock,
+                )
 
                 # Check if there's a pending request to process more documents (with lock)
                 has_pending_request = False
@@ -1219,8 +1271,607 @@ class LightRAG:
                 pipeline_status["latest_message"] = log_message
                 pipeline_status["history_messages"].append(log_message)
 
+    async def _run_pipeline_stages(
+        self,
+        to_process_docs: dict[str, DocProcessingStatus],
+        split_by_character: str | None,
+        split_by_character_only: bool,
+        pipeline_status: dict,
+        pipeline_status_lock: asyncio.Lock,
+    ) -> None:
+        """
+        Process documents through a staged pipeline connected by bounded queues.
+
+        Stages: chunking -> extraction -> merge -> vector upsert -> persist.
+        Every stage runs its own pool of workers, so the LLM-bound extraction of
+        one document overlaps with the lock-bound merge of another. The current
+        depth of every stage queue is published in pipeline_status["queue_depths"].
+        A document failing in any stage is marked FAILED and leaves the pipeline.
+
+        The chunks of all documents in the extraction stage share one scheduler with
+        llm_model_max_async workers and a fair share per document, so the LLM stays
+        saturated no matter how chunks are distributed over the documents. A document
+        moves on to the merge stage as soon as its last chunk is extracted.
+        """
+        total_files = len(to_process_docs)
+        processed_count = 0
+        chunk_scheduler = FairTaskScheduler(self.llm_model_max_async)
+        # Small chunks of all documents are packed into shared extraction prompts
+        chunk_packer = (
+            TokenBudgetBatcher(self.entity_extract_pack_tokens, EXTRACT_PACK_LINGER)
+            if self.entity_extract_pack_tokens > 0
+            else None
+        )
+
+        stage_workers = {
+            "chunking": self.max_parallel_chunking,
+            # Admit enough documents to keep every scheduler worker busy
+            "extraction": max(self.max_parallel_insert, self.llm_model_max_async),
+            "merge": self.max_parallel_merge,
+            "vector_upsert": self.max_parallel_vector_upsert,
+            "persist": 1,
+        }
+        queues: dict[str, asyncio.Queue] = {
+            stage: asyncio.Queue(maxsize=self.pipeline_queue_size)
+            for stage in stage_workers
+        }
+
+        async def update_queue_depths() -> None:
+            # Replace the whole dict so the update is visible across processes
+            async with pipeline_status_lock:
+                pipeline_status["queue_depths"] = {
+                    stage: queue.qsize() for stage, queue in queues.items()
+                }
+
+        # Only chunk extractions of the current prompts are reused by extract_entities
+        prompt_version = extraction_prompt_version(asdict(self))
+
+        async def count_chunks_done(chunks: dict[str, Any]) -> int:
+            if not chunks:
+                return 0
+            return sum(
+                1
+                for stored in await self.chunk_extractions.get_by_ids(
+                    list(chunks.keys())
+                )
+                if stored and stored.get("prompt_version") == prompt_version
+            )
+
+        async def fail_document(job: dict[str, Any], stage: str, e: Exception):
+            # Log error and update pipeline status
+            logger.error(traceback.format_exc())
+            error_msg = f"Failed in {stage} stage for document {job['current_file_number']}/{total_files}: {job['file_path']}"
+            logger.error(error_msg)
+            async with pipeline_status_lock:
+                pipeline_status["latest_message"] = error_msg
+                pipeline_status["history_messages"].append(traceback.format_exc())
+                pipeline_status["history_messages"].append(error_msg)
+
+            # Persistent llm cache and extraction checkpoints of completed chunks
+            if self.llm_response_cache:
+                await self.llm_response_cache.index_done_callback()
+            await self.chunk_extractions.index_done_callback()
+
+            # Update document status to failed
+            status_doc = job["status_doc"]
+            chunks = job.get("chunks", {})
+            await self.doc_status.upsert(
+                {
+                    job["doc_id"]: {
+                        "status": DocStatus.FAILED,
+                        "error": str(e),
+                        "chunks_count": len(chunks) if chunks else None,
+                        "chunks_done": await count_chunks_done(chunks),
+                        "content": status_doc.content,
+                        "content_summary": status_doc.content_summary,
+                        "content_length": status_doc.content_length,
+                        "created_at": status_doc.created_at,
+                        "updated_at": datetime.now(timezone.utc).isoformat(),
+                        "file_path": job["file_path"],
+                        "metadata": status_doc.metadata,
+                    }
+                }
+            )
+
+        async def chunking_stage(job: dict[str, Any]) -> None:
+            nonlocal processed_count
+            doc_id, status_doc, file_path = (
+                job["doc_id"],
+                job["status_doc"],
+                job["file_path"],
+            )
+            metadata = getattr(status_doc, "metadata", {})
+
+            async with pipeline_status_lock:
+                # Update processed file count and save current file number
+                processed_count += 1
+                job["current_file_number"] = processed_count
+                pipeline_status["cur_batch"] = processed_count
+
+                log_message = f"Processing d-id: {doc_id}"
+                logger.info(log_message)
+                pipeline_status["latest_message"] = log_message
+                pipeline_status["history_messages"].append(log_message)
+
+            # Generate chunks from document
+            chunks = await self._chunk_document(
+                doc_id,
+                status_doc.content,
+                file_path,
+                metadata,
+                split_by_character,
+                split_by_character_only,
+            )
+            job["chunks"] = chunks
+
+            # Chunks already stored for other documents reuse their extraction and vectors,
+            # only the provenance of this document is appended
+            job["shared_chunk_ids"] = await self._append_chunk_provenance(
+                doc_id, chunks
+            )
+            if job["shared_chunk_ids"]:
+                async with pipeline_status_lock:
+                    log_message = f"Reusing {len(job['shared_chunk_ids'])} of {len(chunks)} chunks shared with other documents"
+                    logger.info(log_message)
+                    pipeline_status["latest_message"] = log_message
+                    pipeline_status["history_messages"].append(log_message)
+
+            chunks_done = await count_chunks_done(chunks)
+            if chunks_done:
+                async with pipeline_status_lock:
+                    log_message = f"Resuming d-id: {doc_id}, {chunks_done} of {len(chunks)} chunks already extracted"
+                    logger.info(log_message)
+                    pipeline_status["latest_message"] = log_message
+                    pipeline_status["history_messages"].append(log_message)
+
+            # Store document and chunks in Neo4j
+            doc_data = self._build_document_data(status_doc, file_path, chunks)
+            await asyncio.gather(
+                self.chunk_entity_relation_graph.upsert_document(doc_id, doc_data),
+                self.doc_status.upsert(
+                    {
+                        doc_id: {
+                            "status": DocStatus.PROCESSING,
+                            "chunks_count": len(chunks),
+                            "chunks_done": chunks_done,
+                            "chunks_list": list(chunks.keys()),
+                            "content": status_doc.content,
+                            "content_summary": status_doc.content_summary,
+                            "content_length": status_doc.content_length,
+                            "created_at": status_doc.created_at,
+                            "updated_at": datetime.now(timezone.utc).isoformat(),
+                            "file_path": file_path,
+                            "metadata": status_doc.metadata,
+                        }
+                    }
+                ),
+                self.full_docs.upsert({doc_id: {"content": status_doc.content}}),
+                self.text_chunks.upsert(chunks),
+            )
+
+        async def extraction_stage(job: dict[str, Any]) -> None:
+            async with pipeline_status_lock:
+                log_message = f"Extracting stage {job['current_file_number']}/{total_files}: {job['file_path']}"
+                logger.info(log_message)
+                pipeline_status["latest_message"] = log_message
+                pipeline_status["history_messages"].append(log_message)
+
+            # Shared chunks already extracted for other documents are not merged again,
+            # which would add their relation weights and descriptions a second time
+            job["provenance_chunk_ids"] = await self._merged_shared_chunks(
+                job["shared_chunk_ids"]
+            )
+            job["chunk_results"] = await self._process_entity_relation_graph(
+                {
+                    chunk_id: chunk_data
+                    for chunk_id, chunk_data in job["chunks"].items()
+                    if chunk_id not in job["provenance_chunk_ids"]
+                },
+                pipeline_status,
+                pipeline_status_lock,
+                chunk_scheduler,
+                chunk_packer,
+            )
+
+        async def merge_stage(job: dict[str, Any]) -> None:
+            await merge_nodes_and_edges(
+                chunk_results=job.pop("chunk_results"),
+                knowledge_graph_inst=self.chunk_entity_relation_graph,
+                entity_vdb=self.entities_vdb,
+                relationships_vdb=self.relationships_vdb,
+                global_config=asdict(self),
+                pipeline_status=pipeline_status,
+                pipeline_status_lock=pipeline_status_lock,
+                llm_response_cache=self.llm_response_cache,
+                current_file_number=job["current_file_number"],
+                total_files=total_files,
+                file_path=job["file_path"],
+            )
+            await self._append_graph_provenance(
+                job["provenance_chunk_ids"], job["file_path"]
+            )
+
+        async def vector_upsert_stage(job: dict[str, Any]) -> None:
+            new_chunks = {
+                chunk_id: chunk_data
+                for chunk_id, chunk_data in job["chunks"].items()
+                if chunk_id not in job["shared_chunk_ids"]
+            }
+            await self.chunks_vdb.upsert(new_chunks)
+
+        async def persist_stage(job: dict[str, Any]) -> None:
+            status_doc = job["status_doc"]
+            await self.doc_status.upsert(
+                {
+                    job["doc_id"]: {
+                        "status": DocStatus.PROCESSED,
+                        "chunks_count": len(job["chunks"]),
+                        "chunks_done": len(job["chunks"]),
+                        "chunks_list": list(job["chunks"].keys()),
+                        "content": status_doc.content,
+                        "content_summary": status_doc.content_summary,
+                        "content_length": status_doc.content_length,
+                        "created_at": status_doc.created_at,
+                        "updated_at": datetime.now(timezone.utc).isoformat(),
+                        "file_path": job["file_path"],
+                        "metadata": status_doc.metadata,
+                    }
+                }
+            )
+
+            # Call _insert_done after processing each file
+            await self._insert_done()
+
+            async with pipeline_status_lock:
+                log_message = f"Completed processing file {job['current_file_number']}/{total_files}: {job['file_path']}"
+                logger.info(log_message)
+                pipeline_status["latest_message"] = log_message
+                pipeline_status["history_messages"].append(log_message)
+
+        stage_handlers = {
+            "chunking": chunking_stage,
+            "extraction": extraction_stage,
+            "merge": merge_stage,
+            "vector_upsert": vector_upsert_stage,
+            "persist": persist_stage,
+        }
+        stages = list(stage_handlers)
+
+        async def run_stage(index: int) -> None:
+            stage = stages[index]
+            queue = queues[stage]
+            next_stage = stages[index + 1] if index + 1 < len(stages) else None
+
+            async def worker() -> None:
+                while True:
+                    job = await queue.get()
+                    await update_queue_depths()
+                    if job is None:
+                        break
+                    try:
+                        await stage_handlers[stage](job)
+                    except Exception as e:
+                        await fail_document(job, stage, e)
+                        continue
+                    if next_stage is not None:
+                        await queues[next_stage].put(job)
+                        await update_queue_depths()
+
+            await asyncio.gather(*[worker() for _ in range(stage_workers[stage])])
+
+            # Stop the workers of the next stage once this stage is drained
+            if next_stage is not None:
+                for _ in range(stage_workers[next_stage]):
+                    await queues[next_stage].put(None)
+
+        async def feed_documents() -> None:
+            for doc_id, status_doc in to_process_docs.items():
+                await queues[stages[0]].put(
+                    {
+                        "doc_id": doc_id,
+                        "status_doc": status_doc,
+                        # Get file path from status document
+                        "file_path": getattr(status_doc, "file_path", "unknown_source"),
+                        "current_file_number": 0,
+                    }
+                )
+                await update_queue_depths()
+            for _ in range(stage_workers[stages[0]]):
+                await queues[stages[0]].put(None)
+
+        try:
+            await asyncio.gather(
+                feed_documents(), *[run_stage(index) for index in range(len(stages))]
+            )
+        finally:
+            await chunk_scheduler.shutdown()
+
+    async def _chunk_document(
+        self,
+        doc_id: str,
+        content: str,
+        file_path: str,
+        metadata: dict[str, Any],
+        split_by_character: str | None = None,
+        split_by_character_only: bool = False,
+    ) -> dict[str, Any]:
+        """Split a document into chunks keyed by their content hash ids
+
+        The chunking function runs in the CPU worker pool.
+        """
+        chunk_list = await self.cpu_pool.run(
+            run_chunking_func,
+            self.chunking_func,
+            self.tokenizer,
+            content,
+            split_by_character,
+            split_by_character_only,
+            self.chunk_overlap_token_size,
+            self.chunk_token_size,
+        )
+        return {
+            compute_mdhash_id(dp["content"], prefix="chunk-"): {
+                **dp,
+                "full_doc_id": doc_id,
+                "file_path": file_path,  # Add file path to each chunk
+                "metadata": metadata,  # Add document metadata to each chunk
+            }
+            for dp in chunk_list
+        }
+
+    async def _append_chunk_provenance(
+        self, doc_id: str, chunks: dict[str, Any]
+    ) -> set[str]:
+        """Add the provenance of already stored chunks to the chunks of a document
+
+        Every chunk keeps the ids of all documents containing it in full_doc_ids,
+        with the matching file paths in file_paths. full_doc_id and file_path stay
+        those of the first document.
+
+        Returns:
+            set: ids of the chunks already stored for other documents
+        """
+        existing_ids = set(chunks.keys()) - await self.text_chunks.filter_keys(
+            set(chunks.keys())
+        )
+        stored_chunks = (
+            await BatchedKVFetcher(self.text_chunks).fetch(list(existing_ids))
+            if existing_ids
+            else {}
+        )
+        shared_chunk_ids = set()
+        for chunk_id, chunk_data in chunks.items():
+            stored = stored_chunks.get(chunk_id)
+            if not stored:
+                chunk_data["full_doc_ids"] = [doc_id]
+                chunk_data["file_paths"] = [chunk_data["file_path"]]
+                continue
+
+            doc_ids = stored.get("full_doc_ids") or [stored["full_doc_id"]]
+            file_paths = stored.get("file_paths") or [
+                stored.get("file_path", "unknown_source")
+            ]
+            if doc_id not in doc_ids:
+                doc_ids = doc_ids + [doc_id]
+                file_paths = file_paths + [chunk_data["file_path"]]
+            if doc_ids[0] != doc_id:
+                shared_chunk_ids.add(chunk_id)
+            chunk_data.update(
+                {
+                    "full_doc_id": doc_ids[0],
+                    "full_doc_ids": doc_ids,
+                    "file_paths": file_paths,
+                }
+            )
+        return shared_chunk_ids
+
+    async def _merged_shared_chunks(self, shared_chunk_ids: set[str]) -> set[str]:
+        """Ids of the shared chunks whose extraction was stored, i.e. merged into the graph"""
+        if not shared_chunk_ids:
+            return set()
+        return shared_chunk_ids - await self.chunk_extractions.filter_keys(
+            shared_chunk_ids
+        )
+
+    async def _extracted_graph_elements(
+        self, records: list[dict[str, Any]]
+    ) -> tuple[set[str], set[tuple[str, str]]]:
+        """Names of the graph nodes and edges extracted from chunks
+
+        Returns:
+            tuple: (entity names, edge pairs) found in the graph for the extraction records
+        """
+        extracted_names = {
+            dp["entity_name"] for record in records for dp in record["nodes"]
+        }
+        extracted_edges = {
+            (dp["src_id"], dp["tgt_id"]) for record in records for dp in record["edges"]
+        }
+        # Extracted names may differ in letter case from the names in the graph
+        resolved = (
+            await self.chunk_entity_relation_graph.get_nodes_batch_case_insensitive(
+                list(
+                    extracted_names
+                    | {node_id for edge in extracted_edges for node_id in edge}
+                )
+            )
+        )
+        resolved_names = {name: node["entity_id"] for name, node in resolved.items()}
+        entity_names = {
+            resolved_names[name] for name in extracted_names if name in resolved_names
+        }
+        edge_pairs = {
+            (resolved_names[src], resolved_names[tgt])
+            for src, tgt in extracted_edges
+            if src in resolved_names and tgt in resolved_names
+        }
+        return entity_names, edge_pairs
+
+    async def _append_graph_provenance(
+        self, chunk_ids: set[str], file_path: str
+    ) -> None:
+        """Add a file path to the entities and relations sourced from already merged chunks
+
+        Only the file_path of the nodes and edges and of their vector records changes,
+        their source_id already contains the chunks, and descriptions and weights are
+        left as they are.
+        """
+        if not chunk_ids:
+            return
+        from .kg.shared_storage import get_graph_db_keyed_lock
+
+        graph = self.chunk_entity_relation_graph
+        records = [
+            record
+            for record in await self.chunk_extractions.get_by_ids(list(chunk_ids))
+            if record
+        ]
+        entity_names, edge_pairs = await self._extracted_graph_elements(records)
+
+        def with_file_path(data: dict[str, Any]) -> dict[str, Any] | None:
+            if not chunk_ids & set(data.get("source_id", "").split(GRAPH_FIELD_SEP)):
+                return None
+            file_paths = [
+                p for p in data.get("file_path", "").split(GRAPH_FIELD_SEP) if p
+            ]
+            if file_path in file_paths:
+                return None
+            return {**data, "file_path": GRAPH_FIELD_SEP.join(file_paths + [file_path])}
+
+        async with get_graph_db_keyed_lock(
+            entity_names | {node_id for edge in edge_pairs for node_id in edge}
+        ):
+            nodes = await graph.get_nodes_batch(list(entity_names))
+            edges = await graph.get_edges_batch(
+                [{"src": src, "tgt": tgt} for src, tgt in edge_pairs]
+            )
+            nodes_to_update = []
+            for entity_name, node_data in nodes.items():
+                node_data = with_file_path(node_data)
+                if node_data is not None:
+                    nodes_to_update.append((entity_name, node_data))
+            edges_to_update = []
+            for (src, tgt), edge_data in edges.items():
+                edge_data = with_file_path(edge_data)
+                if edge_data is not None:
+                    edges_to_update.append((src, tgt, edge_data))
+            await graph.upsert_nodes_batch(nodes_to_update)
+            await graph.upsert_edges_batch(edges_to_update)
+            await self._upsert_graph_vdb_records(nodes_to_update, edges_to_update)
+
+    async def _upsert_graph_vdb_records(
+        self,
+        nodes: list[tuple[str, dict[str, Any]]],
+        edges: list[tuple[str, str, dict[str, Any]]],
+    ) -> None:
+        """Rewrite the entity and relation vector records of changed graph nodes and edges
+
+        The records are built the same way as by the merge stage, so their source_id,
+        file_path and content follow the graph.
+        """
+        if nodes:
+            await self.entities_vdb.upsert(
+                {
+                    compute_mdhash_id(entity_name, prefix="ent-"): {
+                        "entity_name": entity_name,
+                        "entity_type": node_data.get("entity_type", "UNKNOWN"),
+                        "content": f"{entity_name}\n{node_data.get('description', '')}",
+                        "source_id": node_data["source_id"],
+                        "file_path": node_data.get("file_path", "unknown_source"),
+                    }
+                    for entity_name, node_data in nodes
+                }
+            )
+        if edges:
+            data_for_vdb = {}
+            for src, tgt, edge_data in edges:
+                # The merge stage stores relations with sorted endpoints
+                src, tgt = sorted((src, tgt))
+                data_for_vdb[compute_mdhash_id(src + tgt, prefix="rel-")] = {
+                    "src_id": src,
+                    "tgt_id": tgt,
+                    "keywords": edge_data.get("keywords", ""),
+                    "content": f"{src}\t{tgt}\n{edge_data.get('keywords', '')}\n{edge_data.get('description', '')}",
+                    "source_id": edge_data["source_id"],
+                    "file_path": edge_data.get("file_path", "unknown_source"),
+                }
+            await self.relationships_vdb.upsert(data_for_vdb)
+
+    async def _release_document_chunks(
+        self, doc_id: str, chunk_ids: set[str]
+    ) -> set[str]:
+        """Remove a document from the provenance of its chunks
+
+        Chunks still contained in other documents are kept with the remaining provenance.
+
+        Returns:
+            set: ids of the chunks no other document contains, which can be deleted
+        """
+        unreferenced_ids = set()
+        updated_chunks = {}
+        for chunk_id in chunk_ids:
+            stored = await self.text_chunks.get_by_id(chunk_id)
+            if not stored:
+                unreferenced_ids.add(chunk_id)
+                continue
+            doc_ids = stored.get("full_doc_ids") or [stored.get("full_doc_id")]
+            file_paths = stored.get("file_paths") or [stored.get("file_path")]
+            remaining = [
+                (other_doc_id, path)
+                for other_doc_id, path in zip(doc_ids, file_paths)
+                if other_doc_id != doc_id
+            ]
+            if not remaining:
+                unreferenced_ids.add(chunk_id)
+                continue
+            updated_chunks[chunk_id] = {
+                **stored,
+                "full_doc_id": remaining[0][0],
+                "file_path": remaining[0][1],
+                "full_doc_ids": [other_doc_id for other_doc_id, _ in remaining],
+                "file_paths": [path for _, path in remaining],
+            }
+        await self.text_chunks.upsert(updated_chunks)
+        return unreferenced_ids
+
+    def _build_document_data(
+        self,
+        status_doc: DocProcessingStatus,
+        file_path: str,
+        chunks: dict[str, Any],
+    ) -> dict[str, Any]:
+        """Build the document data stored in the graph by upsert_document"""
+        return {
+            "content": status_doc.content,
+            "content_summary": status_doc.content_summary,
+            "content_length": status_doc.content_length,
+            "created_at": status_doc.created_at,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "file_path": file_path,
+            "chunks": [
+                {
+                    "id": chunk_id,
+                    "content": chunk_data["content"],
+                    "tokens": chunk_data["tokens"],
+                    "chunk_order_index": chunk_data.get("chunk_order_index", 0),
+                    "file_path": file_path,
+                    **{
+                        key: chunk_data[key]
+                        for key in ("start_offset", "end_offset")
+                        if key in chunk_data
+                    },
+                }
+                for chunk_id, chunk_data in chunks.items()
+            ],
+        }
+
     async def _process_entity_relation_graph(
-        self, chunk: dict[str, Any], pipeline_status=None, pipeline_status_lock=None
+        self,
+        chunk: dict[str, Any],
+        pipeline_status=None,
+        pipeline_status_lock=None,
+        chunk_scheduler: FairTaskScheduler | None = None,
+        chunk_packer: TokenBudgetBatcher | None = None,
     ) -> list:
         try:
             chunk_results = await extract_entities(
@@ -1229,6 +1880,11 @@ class LightRAG:
                 pipeline_status=pipeline_status,
                 pipeline_status_lock=pipeline_status_lock,
                 llm_response_cache=self.llm_response_cache,
+                chunk_scheduler=chunk_scheduler,
+                chunk_extractions=self.chunk_extractions,
+                cpu_pool=self.cpu_pool,
+                chunk_packer=chunk_packer,
+                gleaning_tracker=self.gleaning_tracker,
             )
             return chunk_results
         except Exception as e:
@@ -1247,6 +1903,7 @@ class LightRAG:
             for storage_inst in [  # type: ignore
                 self.full_docs,
                 self.text_chunks,
+                self.chunk_extractions,
                 self.llm_response_cache,
                 self.entities_vdb,
                 self.relationships_vdb,
@@ -1255,7 +1912,10 @@ class LightRAG:
             ]
             if storage_inst is not None
         ]
+        if self.embedding_vector_cache is not None:
+            tasks.append(self.embedding_vector_cache.flush())
         await asyncio.gather(*tasks)
+        await self._bump_kb_version()
 
         log_message = "In memory DB persist to disk"
         logger.info(log_message)
@@ -1334,6 +1994,7 @@ class LightRAG:
                     "entity_id": entity_name,
                     "entity_type": entity_type,
                     "description": description,
+                    "description_tokens": count_tokens(description, self.tokenizer),
                     "source_id": source_id,
                 }
                 # Insert node data into the knowledge graph
@@ -1383,6 +2044,7 @@ class LightRAG:
                     edge_data={
                         "weight": weight,
                         "description": description,
+                        "description_tokens": count_tokens(description, self.tokenizer),
                         "keywords": keywords,
                         "source_id": source_id,
                     },
@@ -1476,6 +2138,8 @@ class LightRAG:
         """
         # If a custom model is provided in param, temporarily update global config
         global_config = asdict(self)
+        global_config["kb_version"] = self._get_kb_version()
+        global_config["retrieval_context_cache"] = self.retrieval_context_cache
         # Save original query for vector search
         param.original_query = query
 
@@ -1556,6 +2220,9 @@ class LightRAG:
         Returns:
             Query response or async iterator
         """
+        global_config = asdict(self)
+        global_config["kb_version"] = self._get_kb_version()
+        global_config["retrieval_context_cache"] = self.retrieval_context_cache
         response = await query_with_keywords(
             query=query,
             prompt=prompt,
@@ -1565,7 +2232,7 @@ class LightRAG:
             relationships_vdb=self.relationships_vdb,
             chunks_vdb=self.chunks_vdb,
             text_chunks_db=self.text_chunks,
-            global_config=asdict(self),
+            global_config=global_config,
             hashing_kv=self.llm_response_cache,
         )
 
@@ -1702,6 +2369,347 @@ class LightRAG:
         # Return the dictionary containing statuses only for the found document IDs
         return found_statuses
 
+    async def _retract_chunk_sources(self, chunk_ids: set[str]) -> tuple[int, int]:
+        """Remove chunks from the source_id of the entities and relations extracted from them
+
+        The affected entities and relations are looked up in the stored chunk extractions.
+        If a chunk has no stored extraction, the whole graph is scanned instead.
+        Entities and relations left without any source are deleted, the vector records
+        of the remaining ones are rewritten with their new source_id.
+
+        Returns:
+            tuple: (number of deleted entities, number of deleted relations)
+        """
+        from .kg.shared_storage import get_graph_db_keyed_lock
+
+        graph = self.chunk_entity_relation_graph
+        stored = [
+            record
+            for record in await self.chunk_extractions.get_by_ids(list(chunk_ids))
+            if record
+        ]
+        if {record["chunk_id"] for record in stored} >= chunk_ids:
+            entity_names, edge_pairs = await self._extracted_graph_elements(stored)
+        else:
+            entity_names = set(await graph.get_all_labels())
+            edge_pairs = {
+                edge
+                for edges in (
+                    await graph.get_nodes_edges_batch(list(entity_names))
+                ).values()
+                for edge in edges
+            }
+
+        def retract(source_id: str) -> str:
+            sources = source_id.split(GRAPH_FIELD_SEP)
+            return GRAPH_FIELD_SEP.join([s for s in sources if s not in chunk_ids])
+
+        async with get_graph_db_keyed_lock(
+            entity_names | {node_id for edge in edge_pairs for node_id in edge}
+        ):
+            nodes = await graph.get_nodes_batch(list(entity_names))
+            edges = await graph.get_edges_batch(
+                [{"src": src, "tgt": tgt} for src, tgt in edge_pairs]
+            )
+
+            nodes_to_update, nodes_to_delete = [], []
+            for entity_name, node_data in nodes.items():
+                source_id = node_data.get("source_id", "")
+                if not chunk_ids & set(source_id.split(GRAPH_FIELD_SEP)):
+                    continue
+                new_source_id = retract(source_id)
+                if new_source_id:
+                    nodes_to_update.append(
+                        (entity_name, {**node_data, "source_id": new_source_id})
+                    )
+                else:
+                    nodes_to_delete.append(entity_name)
+
+            edges_to_update, edges_to_delete = [], []
+            for (src, tgt), edge_data in edges.items():
+                source_id = edge_data.get("source_id", "")
+                if not chunk_ids & set(source_id.split(GRAPH_FIELD_SEP)):
+                    continue
+                new_source_id = retract(source_id)
+                if new_source_id:
+                    edges_to_update.append(
+                        (src, tgt, {**edge_data, "source_id": new_source_id})
+                    )
+                else:
+                    edges_to_delete.append((src, tgt))
+
+            await graph.upsert_nodes_batch(nodes_to_update)
+            await graph.upsert_edges_batch(edges_to_update)
+            await self._upsert_graph_vdb_records(nodes_to_update, edges_to_update)
+            if edges_to_delete:
+                await self.relationships_vdb.delete(
+                    [
+                        compute_mdhash_id(a + b, prefix="rel-")
+                        for src, tgt in edges_to_delete
+                        for a, b in ((src, tgt), (tgt, src))
+                    ]
+                )
+                await graph.remove_edges(edges_to_delete)
+            if nodes_to_delete:
+                for entity_name in nodes_to_delete:
+                    await self.entities_vdb.delete_entity(entity_name)
+                    await self.relationships_vdb.delete_entity_relation(entity_name)
+                await graph.remove_nodes(nodes_to_delete)
+
+        return len(nodes_to_delete), len(edges_to_delete)
+
+    async def aupdate_document(
+        self,
+        doc_id: str,
+        new_content: str,
+        file_path: str | None = None,
+        split_by_character: str | None = None,
+        split_by_character_only: bool = False,
+    ) -> None:
+        """Update the content of a processed document in place
+
+        The new content is chunked with chunking_func and the chunk ids are diffed
+        against the stored chunks of the document. Only new chunks are extracted and
+        merged; removed chunks are retracted from the source_id of the entities and
+        relations extracted from them. A small edit of a long document therefore only
+        costs the LLM calls of a few chunks.
+
+        Args:
+            doc_id: Document ID to update
+            new_content: New content of the document
+            file_path: New file path of the document, keeps the current one if None
+            split_by_character: if split_by_character is not None, split the string by character
+            split_by_character_only: if split_by_character_only is True, split the string by character only
+
+        The update takes the busy flag of the document processing pipeline, so it never
+        runs alongside apipeline_process_enqueue_documents. Documents enqueued meanwhile
+        are processed once the update is done.
+
+        Raises:
+            ValueError: If the document does not exist
+            RuntimeError: If the pipeline is busy processing documents
+        """
+        status_doc = await self.doc_status.get_by_id(doc_id)
+        if not status_doc:
+            raise ValueError(f"Document {doc_id} does not exist")
+
+        pipeline_status = await get_namespace_data("pipeline_status")
+        pipeline_status_lock = get_pipeline_status_lock()
+        async with pipeline_status_lock:
+            if pipeline_status.get("busy", False):
+                raise RuntimeError(
+                    f"Cannot update document {doc_id} while the pipeline is busy"
+                )
+            pipeline_status.update(
+                {
+                    "busy": True,
+                    "job_name": f"Updating document {doc_id}",
+                    "job_start": datetime.now(timezone.utc).isoformat(),
+                    "docs": 1,
+                    "batchs": 1,
+                    "cur_batch": 0,
+                    "request_pending": False,
+                    "latest_message": "",
+                }
+            )
+            # Cleaning history_messages without breaking it as a shared list object
+            del pipeline_status["history_messages"][:]
+
+        try:
+            await self._update_document(
+                doc_id,
+                status_doc,
+                new_content,
+                file_path,
+                split_by_character,
+                split_by_character_only,
+            )
+        finally:
+            async with pipeline_status_lock:
+                pipeline_status["busy"] = False
+                request_pending = pipeline_status.get("request_pending", False)
+                log_message = f"Document update completed: {doc_id}"
+                logger.info(log_message)
+                pipeline_status["latest_message"] = log_message
+                pipeline_status["history_messages"].append(log_message)
+
+        if request_pending:
+            await self.apipeline_process_enqueue_documents()
+
+    async def _update_document(
+        self,
+        doc_id: str,
+        status_doc: dict[str, Any],
+        new_content: str,
+        file_path: str | None,
+        split_by_character: str | None,
+        split_by_character_only: bool,
+    ) -> None:
+        """Update a document while holding the pipeline busy flag, see aupdate_document"""
+        new_content = clean_text(new_content)
+        file_path = file_path or status_doc.get("file_path", "unknown_source")
+        metadata = status_doc.get("metadata", {})
+
+        # Stored chunk list of the document, scan all chunks for documents without one
+        old_chunk_ids = set(status_doc.get("chunks_list") or [])
+        if not old_chunk_ids:
+            all_chunks = await self.text_chunks.get_all()
+            old_chunk_ids = {
+                chunk_id
+                for chunk_id, chunk_data in all_chunks.items()
+                if isinstance(chunk_data, dict)
+                and (
+                    chunk_data.get("full_doc_id") == doc_id
+                    or doc_id in chunk_data.get("full_doc_ids", [])
+                )
+            }
+
+        chunks = await self._chunk_document(
+            doc_id,
+            new_content,
+            file_path,
+            metadata,
+            split_by_character,
+            split_by_character_only,
+        )
+        added_chunks = {
+            chunk_id: chunk_data
+            for chunk_id, chunk_data in chunks.items()
+            if chunk_id not in old_chunk_ids
+        }
+        removed_chunk_ids = old_chunk_ids - chunks.keys()
+        shared_chunk_ids = await self._append_chunk_provenance(doc_id, chunks)
+        logger.info(
+            f"Updating document {doc_id}: {len(added_chunks)} new chunks, "
+            f"{len(removed_chunk_ids)} removed chunks, "
+            f"{len(chunks) - len(added_chunks)} unchanged chunks"
+        )
+
+        # Retract the removed chunks before merging the new ones,
+        # chunks still contained in other documents are kept
+        removed_chunk_ids = await self._release_document_chunks(
+            doc_id, removed_chunk_ids
+        )
+        if removed_chunk_ids:
+            deleted_entities, deleted_relations = await self._retract_chunk_sources(
+                removed_chunk_ids
+            )
+            await asyncio.gather(
+                self.chunks_vdb.delete(list(removed_chunk_ids)),
+                self.text_chunks.delete(list(removed_chunk_ids)),
+                self.chunk_extractions.delete(list(removed_chunk_ids)),
+            )
+            logger.info(
+                f"Retracted {len(removed_chunk_ids)} chunks of document {doc_id}, "
+                f"deleted {deleted_entities} entities and {deleted_relations} relations"
+            )
+
+        # Added chunks already merged for other documents only get this provenance
+        provenance_chunk_ids = await self._merged_shared_chunks(
+            shared_chunk_ids & added_chunks.keys()
+        )
+        chunks_to_extract = {
+            chunk_id: chunk_data
+            for chunk_id, chunk_data in added_chunks.items()
+            if chunk_id not in provenance_chunk_ids
+        }
+        await self._append_graph_provenance(provenance_chunk_ids, file_path)
+        if chunks_to_extract:
+            pipeline_status = await get_namespace_data("pipeline_status")
+            pipeline_status_lock = get_pipeline_status_lock()
+            chunk_results = await extract_entities(
+                chunks_to_extract,
+                global_config=asdict(self),
+                pipeline_status=pipeline_status,
+                pipeline_status_lock=pipeline_status_lock,
+                llm_response_cache=self.llm_response_cache,
+                chunk_extractions=self.chunk_extractions,
+                cpu_pool=self.cpu_pool,
+                gleaning_tracker=self.gleaning_tracker,
+            )
+            await merge_nodes_and_edges(
+                chunk_results=chunk_results,
+                knowledge_graph_inst=self.chunk_entity_relation_graph,
+                entity_vdb=self.entities_vdb,
+                relationships_vdb=self.relationships_vdb,
+                global_config=asdict(self),
+                pipeline_status=pipeline_status,
+                pipeline_status_lock=pipeline_status_lock,
+                llm_response_cache=self.llm_response_cache,
+                current_file_number=1,
+                total_files=1,
+                file_path=file_path,
+            )
+            await self.chunks_vdb.upsert(
+                {
+                    chunk_id: chunk_data
+                    for chunk_id, chunk_data in added_chunks.items()
+                    if chunk_id not in shared_chunk_ids
+                }
+            )
+
+        updated_doc = DocProcessingStatus(
+            content=new_content,
+            content_summary=get_content_summary(new_content),
+            content_length=len(new_content),
+            file_path=file_path,
+            status=DocStatus.PROCESSED,
+            created_at=status_doc.get("created_at"),
+            updated_at=datetime.now(timezone.utc).isoformat(),
+        )
+        await asyncio.gather(
+            self.chunk_entity_relation_graph.upsert_document(
+                doc_id, self._build_document_data(updated_doc, file_path, chunks)
+            ),
+            # Unchanged chunks are rewritten too, their order in the document may have changed
+            self.text_chunks.upsert(chunks),
+            self.full_docs.upsert({doc_id: {"content": new_content}}),
+        )
+        await self.doc_status.upsert(
+            {
+                doc_id: {
+                    "status": DocStatus.PROCESSED,
+                    "chunks_count": len(chunks),
+                    "chunks_done": len(chunks),
+                    "chunks_list": list(chunks.keys()),
+                    "content": updated_doc.content,
+                    "content_summary": updated_doc.content_summary,
+                    "content_length": updated_doc.content_length,
+                    "created_at": updated_doc.created_at,
+                    "updated_at": updated_doc.updated_at,
+                    "file_path": file_path,
+                    # A near-duplicate match of the previous content no longer applies
+                    "metadata": {
+                        key: value
+                        for key, value in metadata.items()
+                        if key != "near_duplicate"
+                    },
+                }
+            }
+        )
+        await self._reindex_near_duplicate(doc_id, new_content)
+
+        await self._insert_done()
+
+    def update_document(
+        self,
+        doc_id: str,
+        new_content: str,
+        file_path: str | None = None,
+        split_by_character: str | None = None,
+        split_by_character_only: bool = False,
+    ) -> None:
+        loop = always_get_an_event_loop()
+        loop.run_until_complete(
+            self.aupdate_document(
+                doc_id,
+                new_content,
+                file_path,
+                split_by_character,
+                split_by_character_only,
+            )
+        )
+
     # TODO: Deprecated (Deleting documents can cause hallucinations in RAG.)
     # Document delete is not working properly for most of the storage implementations.
     async def adelete_by_doc_id(self, doc_id: str) -> None:
@@ -1712,28 +2720,44 @@ class LightRAG:
         """
         try:
             # 1. Get the document status and related data
-            if not await self.doc_status.get_by_id(doc_id):
+            status_doc = await self.doc_status.get_by_id(doc_id)
+            if not status_doc:
                 logger.warning(f"Document {doc_id} not found")
                 return
 
             logger.debug(f"Starting deletion for document {doc_id}")
 
-            # 2. Get all chunks related to this document
-            # Find all chunks where full_doc_id equals the current doc_id
-            all_chunks = await self.text_chunks.get_all()
-            related_chunks = {
-                chunk_id: chunk_data
-                for chunk_id, chunk_data in all_chunks.items()
-                if isinstance(chunk_data, dict)
-                and chunk_data.get("full_doc_id") == doc_id
-            }
+            # 2. Get all chunks related to this document from its stored chunk list,
+            # scan all chunks for documents without one
+            chunks_list = set(status_doc.get("chunks_list") or [])
+            if chunks_list:
+                related_chunk_ids = chunks_list - await self.text_chunks.filter_keys(
+                    chunks_list
+                )
+            else:
+                all_chunks = await self.text_chunks.get_all()
+                related_chunk_ids = {
+                    chunk_id
+                    for chunk_id, chunk_data in all_chunks.items()
+                    if isinstance(chunk_data, dict)
+                    and (
+                        chunk_data.get("full_doc_id") == doc_id
+                        or doc_id in chunk_data.get("full_doc_ids", [])
+                    )
+                }
 
-            if not related_chunks:
+            await self._remove_from_near_duplicate_index([doc_id])
+
+            if not related_chunk_ids:
                 logger.warning(f"No chunks found for document {doc_id}")
+                # Documents without chunks, e.g. skipped near duplicates, only have a status
+                await self.full_docs.delete([doc_id])
+                await self.doc_status.delete([doc_id])
+                await self._insert_done()
                 return
 
-            # Get all related chunk IDs
-            chunk_ids = set(related_chunks.keys())
+            # Get all related chunk IDs, chunks still contained in other documents are kept
+            chunk_ids = await self._release_document_chunks(doc_id, related_chunk_ids)
             logger.debug(f"Found {len(chunk_ids)} chunks to delete")
 
             # TODO: self.entities_vdb.client_storage only works for local storage, need to fix this
@@ -1764,6 +2788,7 @@ class LightRAG:
             if chunk_ids:
                 await self.chunks_vdb.delete(chunk_ids)
                 await self.text_chunks.delete(chunk_ids)
+                await self.chunk_extractions.delete(list(chunk_ids))
 
             # 5. Find and process entities and relationships that have these chunks as source
             # Get all nodes and edges from the graph storage using storage-agnostic methods
@@ -1968,12 +2993,14 @@ class LightRAG:
         """
         from .utils_graph import adelete_by_entity
 
-        return await adelete_by_entity(
+        result = await adelete_by_entity(
             self.chunk_entity_relation_graph,
             self.entities_vdb,
             self.relationships_vdb,
             entity_name,
         )
+        await self._bump_kb_version()
+        return result
 
     def delete_by_entity(self, entity_name: str) -> None:
         loop = always_get_an_event_loop()
@@ -1988,12 +3015,14 @@ class LightRAG:
         """
         from .utils_graph import adelete_by_relation
 
-        return await adelete_by_relation(
+        result = await adelete_by_relation(
             self.chunk_entity_relation_graph,
             self.relationships_vdb,
             source_entity,
             target_entity,
         )
+        await self._bump_kb_version()
+        return result
 
     def delete_by_relation(self, source_entity: str, target_entity: str) -> None:
         loop = always_get_an_event_loop()
@@ -2053,14 +3082,17 @@ class LightRAG:
         """
         from .utils_graph import aedit_entity
 
-        return await aedit_entity(
+        result = await aedit_entity(
             self.chunk_entity_relation_graph,
             self.entities_vdb,
             self.relationships_vdb,
             entity_name,
             updated_data,
             allow_rename,
+            tokenizer=self.tokenizer,
         )
+        await self._bump_kb_version()
+        return result
 
     def edit_entity(
         self, entity_name: str, updated_data: dict[str, str], allow_rename: bool = True
@@ -2087,14 +3119,17 @@ class LightRAG:
         """
         from .utils_graph import aedit_relation
 
-        return await aedit_relation(
+        result = await aedit_relation(
             self.chunk_entity_relation_graph,
             self.entities_vdb,
             self.relationships_vdb,
             source_entity,
             target_entity,
             updated_data,
+            tokenizer=self.tokenizer,
         )
+        await self._bump_kb_version()
+        return result
 
     def edit_relation(
         self, source_entity: str, target_entity: str, updated_data: dict[str, Any]
@@ -2120,13 +3155,16 @@ class LightRAG:
         """
         from .utils_graph import acreate_entity
 
-        return await acreate_entity(
+        result = await acreate_entity(
             self.chunk_entity_relation_graph,
             self.entities_vdb,
             self.relationships_vdb,
             entity_name,
             entity_data,
+            tokenizer=self.tokenizer,
         )
+        await self._bump_kb_version()
+        return result
 
     def create_entity(
         self, entity_name: str, entity_data: dict[str, Any]
@@ -2151,14 +3189,17 @@ class LightRAG:
         """
         from .utils_graph import acreate_relation
 
-        return await acreate_relation(
+        result = await acreate_relation(
             self.chunk_entity_relation_graph,
             self.entities_vdb,
             self.relationships_vdb,
             source_entity,
             target_entity,
             relation_data,
+            tokenizer=self.tokenizer,
         )
+        await self._bump_kb_version()
+        return result
 
     def create_relation(
         self, source_entity: str, target_entity: str, relation_data: dict[str, Any]
@@ -2197,7 +3238,7 @@ class LightRAG:
         """
         from .utils_graph import amerge_entities
 
-        return await amerge_entities(
+        result = await amerge_entities(
             self.chunk_entity_relation_graph,
             self.entities_vdb,
             self.relationships_vdb,
@@ -2205,7 +3246,10 @@ class LightRAG:
             target_entity,
             merge_strategy,
             target_entity_data,
+            tokenizer=self.tokenizer,
         )
+        await self._bump_kb_version()
+        return result
 
     def merge_entities(
         self,
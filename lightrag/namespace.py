@@ -7,6 +7,7 @@ class NameSpace:
     KV_STORE_FULL_DOCS = "full_docs"
     KV_STORE_TEXT_CHUNKS = "text_chunks"
     KV_STORE_LLM_RESPONSE_CACHE = "llm_response_cache"
+    KV_STORE_CHUNK_EXTRACTIONS = "chunk_extractions"
 
     VECTOR_STORE_ENTITIES = "entities"
     VECTOR_STORE_RELATIONSHIPS = "relationships"
@@ -16,6 +17,10 @@ class NameSpace:
 
     DOC_STATUS = "doc_status"
 
+    NEAR_DUPLICATE_INDEX = "near_duplicate_index"
+
+    KB_VERSION = "kb_version"
+
 
 def make_namespace(prefix: str, base_namespace: str):
     return prefix + base_namespace
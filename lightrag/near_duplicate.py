@@ -0,0 +1,201 @@
+"""
+Near-duplicate document detection with MinHash signatures and locality-sensitive hashing.
+
+Documents are shingled into overlapping word n-grams, each document is reduced to a
+MinHash signature whose agreement rate estimates the Jaccard similarity of the shingle
+sets, and the signatures are banded into an LSH index so that only documents sharing
+at least one band are compared. Signatures are persisted as JSON in the working dir,
+the band buckets are rebuilt when the file is loaded.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import zlib
+
+import numpy as np
+
+from lightrag.utils import load_json, logger, write_json
+
+# Mersenne prime 2^61 - 1, the universal hash (a * x + b) mod p never overflows
+# uint64 for 32 bit shingle hashes and 32 bit coefficients
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 61) - 1)
+
+# CJK characters are shingled one by one, other text by words
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK_RANGES}]|[^\W{_CJK_RANGES}]+")
+
+# Number of shingles hashed by one vectorized permutation step
+_SHINGLE_BATCH_SIZE = 8192
+
+
+def _optimal_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """Choose (bands, rows) with bands * rows == num_perm for the LSH index
+
+    The LSH candidate probability rises steeply around (1 / bands) ** (1 / rows), the
+    band layout whose turning point is closest to and not above the threshold is chosen
+    so that near duplicates close to the threshold are still found as candidates.
+    """
+    best = (num_perm, 1)
+    best_distance = float("inf")
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        turning_point = (1 / bands) ** (1 / rows)
+        if turning_point > threshold:
+            continue
+        distance = threshold - turning_point
+        if distance < best_distance:
+            best, best_distance = (bands, rows), distance
+    return best
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash/LSH index over the shingled text of documents
+
+    The index is not process safe by itself, callers running in several workers must
+    hold a shared lock around load(), the queries and save().
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        threshold: float,
+        num_perm: int,
+        shingle_size: int,
+        seed: int = 1,
+    ):
+        self.file_name = file_name
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = _optimal_bands(num_perm, threshold)
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._signatures: dict[str, np.ndarray] = {}
+        self._buckets: list[dict[bytes, set[str]]] = [{} for _ in range(self.bands)]
+        self._loaded_mtime: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _shingles(self, text: str) -> set[str]:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) <= self.shingle_size:
+            return {" ".join(tokens)}
+        return {
+            " ".join(tokens[i : i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a document text"""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in self._shingles(text)),
+            dtype=np.uint64,
+        )
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), _SHINGLE_BATCH_SIZE):
+            batch = hashes[start : start + _SHINGLE_BATCH_SIZE]
+            permuted = (
+                np.outer(self._a, batch) % _MERSENNE_PRIME + self._b[:, None]
+            ) % _MERSENNE_PRIME
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def query(self, signature: np.ndarray) -> tuple[str, float] | None:
+        """Find the most similar indexed document above the threshold
+
+        Returns:
+            (doc_id, estimated Jaccard similarity) of the best match, or None
+        """
+        candidates: set[str] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_match = None
+        for doc_id in candidates:
+            similarity = float(np.mean(self._signatures[doc_id] == signature))
+            if similarity >= self.threshold and (
+                best_match is None or similarity > best_match[1]
+            ):
+                best_match = (doc_id, similarity)
+        return best_match
+
+    def add(self, doc_id: str, signature: np.ndarray) -> None:
+        """Add or replace the signature of a document"""
+        self.remove([doc_id])
+        self._signatures[doc_id] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_ids: list[str]) -> bool:
+        """Remove documents from the index, returns True if any was indexed"""
+        removed = False
+        for doc_id in doc_ids:
+            signature = self._signatures.pop(doc_id, None)
+            if signature is None:
+                continue
+            removed = True
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(doc_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+        return removed
+
+    def load(self) -> None:
+        """(Re)load the index file if it changed since it was last loaded or saved"""
+        if not os.path.exists(self.file_name):
+            return
+        mtime = os.path.getmtime(self.file_name)
+        if mtime == self._loaded_mtime:
+            return
+
+        data = load_json(self.file_name) or {}
+        self._signatures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        self._loaded_mtime = mtime
+        if (
+            data.get("num_perm") != self.num_perm
+            or data.get("shingle_size") != self.shingle_size
+            or data.get("seed") != self.seed
+        ):
+            logger.warning(
+                f"Near-duplicate index {self.file_name} was built with different "
+                "MinHash parameters, starting a new index"
+            )
+            return
+
+        for doc_id, values in data.get("signatures", {}).items():
+            self.add(doc_id, np.array(values, dtype=np.uint64))
+        logger.debug(f"Loaded near-duplicate index with {len(self)} documents")
+
+    def save(self) -> None:
+        write_json(
+            {
+                "num_perm": self.num_perm,
+                "shingle_size": self.shingle_size,
+                "seed": self.seed,
+                "signatures": {
+                    doc_id: signature.tolist()
+                    for doc_id, signature in self._signatures.items()
+                },
+            },
+            self.file_name,
+        )
+        self._loaded_mtime = os.path.getmtime(self.file_name)
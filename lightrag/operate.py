@@ -5,9 +5,11 @@ import asyncio
 import json
 import re
 import os
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator
 from collections import Counter, defaultdict
 
+import numpy as np
+
 from .utils import (
     logger,
     clean_str,
@@ -18,6 +20,7 @@ from .utils import (
     pack_user_ass_to_openai_messages,
     split_string_by_multi_markers,
     truncate_list_by_token_size,
+    count_tokens,
     process_combine_contexts,
     compute_args_hash,
     handle_cache,
@@ -25,6 +28,12 @@ from .utils import (
     CacheData,
     get_conversation_turns,
     use_llm_func_with_cache,
+    FairTaskScheduler,
+    CpuWorkerPool,
+    TokenBudgetBatcher,
+    GleaningYieldTracker,
+    BatchedKVFetcher,
+    RetrievalContextCache,
 )
 from .base import (
     BaseGraphStorage,
@@ -34,6 +43,11 @@ from .base import (
     QueryParam,
 )
 from .prompt import GRAPH_FIELD_SEP, PROMPTS
+from .constants import (
+    EXTRACT_PACK_LINGER,
+    GRAPH_DB_LOCK_GROUP_SIZE,
+    MAX_MERGE_ATTEMPTS,
+)
 import time
 from dotenv import load_dotenv
 
@@ -98,6 +112,92 @@ def chunking_by_token_size(
     return results
 
 
+def chunking_by_token_offsets(
+    tokenizer: Tokenizer,
+    content: str,
+    split_by_character: str | None = None,
+    split_by_character_only: bool = False,
+    overlap_token_size: int = 128,
+    max_token_size: int = 1024,
+) -> Iterator[dict[str, Any]]:
+    """Split content into token windows, tokenizing the content once
+
+    Drop-in alternative to chunking_by_token_size: the chunk text is sliced from the
+    content at the character offsets of the window tokens instead of decoding the
+    tokens, and the chunks are yielded one by one. Pieces split by split_by_character
+    are counted on the tokens of the whole content, a token spanning a separator counts
+    for the piece it starts in. Empty pieces are skipped.
+
+    Each chunk additionally carries start_offset and end_offset, the character span
+    of the chunk content in content.
+    """
+    tokens, token_offsets = tokenizer.encode_with_offsets(content)
+
+    def char_offset(token_index: int) -> int:
+        if token_index < len(tokens):
+            return int(token_offsets[token_index])
+        return len(content)
+
+    def token_windows(start: int, end: int):
+        # Token ranges of the windows covering the tokens [start, end)
+        if split_by_character_only or end - start <= max_token_size:
+            yield start, end
+            return
+        for window_start in range(start, end, max_token_size - overlap_token_size):
+            yield window_start, min(window_start + max_token_size, end)
+
+    if split_by_character:
+        spans = []
+        position = 0
+        while position <= len(content):
+            separator = content.find(split_by_character, position)
+            if separator == -1:
+                separator = len(content)
+            spans.append((position, separator))
+            position = separator + len(split_by_character)
+        # First token starting in each piece and after it
+        token_bounds = np.searchsorted(token_offsets, spans, side="left")
+        spans = [
+            (int(token_start), int(token_end), span_start, span_end)
+            for (token_start, token_end), (span_start, span_end) in zip(
+                token_bounds, spans
+            )
+        ]
+    else:
+        spans = [(0, len(tokens), 0, len(content))]
+
+    index = 0
+    for token_start, token_end, span_start, span_end in spans:
+        for window_start, window_end in token_windows(token_start, token_end):
+            # Whole pieces keep their exact span, windows are cut at token starts
+            start_offset = (
+                span_start if window_start == token_start else char_offset(window_start)
+            )
+            end_offset = (
+                span_end if window_end == token_end else char_offset(window_end)
+            )
+            chunk = content[start_offset:end_offset]
+            stripped = chunk.strip()
+            if not stripped:
+                continue
+            start_offset += len(chunk) - len(chunk.lstrip())
+            yield {
+                "tokens": window_end - window_start,
+                "content": stripped,
+                "chunk_order_index": index,
+                "start_offset": start_offset,
+                "end_offset": start_offset + len(stripped),
+            }
+            index += 1
+
+
+def run_chunking_func(
+    chunking_func: Callable[..., Iterable[dict[str, Any]]], *args: Any
+) -> list[dict[str, Any]]:
+    """Call a chunking function and collect its chunks, used to run it in a CPU worker process"""
+    return list(chunking_func(*args))
+
+
 async def _handle_entity_relation_summary(
     entity_or_relation_name: str,
     description: str,
@@ -149,11 +249,11 @@ async def _handle_entity_relation_summary(
     return summary
 
 
-async def _handle_single_entity_extraction(
+def _handle_single_entity_extraction(
     record_attributes: list[str],
     chunk_key: str,
     file_path: str = "unknown_source",
-    source_project: str | None = None
+    source_project: str | None = None,
 ):
     if len(record_attributes) < 4 or '"entity"' not in record_attributes[0]:
         return None
@@ -191,11 +291,11 @@ async def _handle_single_entity_extraction(
     )
 
 
-async def _handle_single_relationship_extraction(
+def _handle_single_relationship_extraction(
     record_attributes: list[str],
     chunk_key: str,
     file_path: str = "unknown_source",
-    source_project: str | None = None
+    source_project: str | None = None,
 ):
     if len(record_attributes) < 5 or '"relationship"' not in record_attributes[0]:
         return None
@@ -238,24 +338,104 @@ async def _handle_single_relationship_extraction(
     )
 
 
-async def _merge_nodes_then_upsert(
+def _process_extraction_result(
+    result: str,
+    chunk_key: str,
+    file_path: str = "unknown_source",
+    source_project: str | None = None,
+    tuple_delimiter: str = PROMPTS["DEFAULT_TUPLE_DELIMITER"],
+    record_delimiter: str = PROMPTS["DEFAULT_RECORD_DELIMITER"],
+    completion_delimiter: str = PROMPTS["DEFAULT_COMPLETION_DELIMITER"],
+):
+    """Process a single extraction result (either initial or gleaning)
+
+    Module level and synchronous so that it can run in a CPU worker process.
+    Args:
+        result (str): The extraction result to process
+        chunk_key (str): The chunk key for source tracking
+        file_path (str): The file path for citation
+        source_project (str | None): The project name for subgraph creation & project tracking
+    Returns:
+        tuple: (nodes_dict, edges_dict) containing the extracted entities and relationships
+    """
+    maybe_nodes = defaultdict(list)
+    maybe_edges = defaultdict(list)
+
+    records = split_string_by_multi_markers(
+        result,
+        [record_delimiter, completion_delimiter],
+    )
+
+    for record in records:
+        record = re.search(r"\((.*)\)", record)
+        if record is None:
+            continue
+        record = record.group(1)
+        record_attributes = split_string_by_multi_markers(record, [tuple_delimiter])
+
+        if_entities = _handle_single_entity_extraction(
+            record_attributes, chunk_key, file_path, source_project
+        )
+        if if_entities is not None:
+            maybe_nodes[if_entities["entity_name"]].append(if_entities)
+            continue
+
+        if_relation = _handle_single_relationship_extraction(
+            record_attributes, chunk_key, file_path, source_project
+        )
+        if if_relation is not None:
+            maybe_edges[(if_relation["src_id"], if_relation["tgt_id"])].append(
+                if_relation
+            )
+
+    return maybe_nodes, maybe_edges
+
+
+def _split_packed_result(
+    result: str, chunk_count: int, chunk_delimiter: str
+) -> dict[int, str]:
+    """Split the result of a packed extraction prompt into the results of its chunks
+
+    Returns:
+        dict: 0-based chunk index -> result text of the chunk, for every chunk marker in
+        the result. Text before the first marker and markers of unknown chunks are dropped.
+    """
+    parts = re.split(re.escape(chunk_delimiter) + r"\s*(\d+)", result)
+    if parts[0].strip(" \n#"):
+        logger.debug("Dropped packed extraction output before the first chunk marker")
+
+    sections: dict[int, str] = {}
+    for number, text in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        if 0 <= index < chunk_count:
+            sections[index] = sections.get(index, "") + text
+    return sections
+
+
+async def _merge_nodes(
     entity_name: str,
     nodes_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_node: dict | None,
     global_config: dict,
+    summaries: dict[tuple[str, str], str],
+    pending_summaries: set[tuple[str, str]],
     pipeline_status: dict = None,
     pipeline_status_lock=None,
-    llm_response_cache: BaseKVStorage | None = None,
-):
-    """Get existing nodes from knowledge graph use name,if exists, merge data, else create, then upsert."""
+) -> dict:
+    """Merge extracted node data with the already existing node (prefetched by the caller), if any.
+    The merged node data is returned for a batched upsert by the caller.
+
+    LLM summaries of merged descriptions are taken from `summaries`, keyed by (name, merged description).
+    A missing summary is added to `pending_summaries` and the merged description is kept as is."""
     already_entity_types = []
     already_source_ids = []
     already_description = []
     already_file_paths = []
     already_source_projects = []
-    already_node = await knowledge_graph_inst.get_node(entity_name, case_insensitive=True)
     if already_node is not None:
-        entity_name = already_node["entity_id"] # id (name) of already existing node; needed for correct upsert
+        entity_name = already_node[
+            "entity_id"
+        ]  # id (name) of already existing node; needed for correct upsert
         already_entity_types.append(already_node["entity_type"])
         already_source_ids.extend(
             split_string_by_multi_markers(already_node["source_id"], [GRAPH_FIELD_SEP])
@@ -264,7 +444,9 @@ async def _merge_nodes_then_upsert(
             split_string_by_multi_markers(already_node["file_path"], [GRAPH_FIELD_SEP])
         )
         already_source_projects.extend(
-            split_string_by_multi_markers(already_node["source_project"], [GRAPH_FIELD_SEP])
+            split_string_by_multi_markers(
+                already_node["source_project"], [GRAPH_FIELD_SEP]
+            )
         )
         if len(already_node["description"].strip()) > 0:
             already_description.append(already_node["description"])
@@ -277,7 +459,16 @@ async def _merge_nodes_then_upsert(
         reverse=True,
     )[0][0]
     description = GRAPH_FIELD_SEP.join(
-        sorted(set([dp["description"] for dp in nodes_data if len(dp["description"].strip()) > 0] + already_description))
+        sorted(
+            set(
+                [
+                    dp["description"]
+                    for dp in nodes_data
+                    if len(dp["description"].strip()) > 0
+                ]
+                + already_description
+            )
+        )
     )
     source_id = GRAPH_FIELD_SEP.join(
         set([dp["source_id"] for dp in nodes_data] + already_source_ids)
@@ -302,14 +493,11 @@ async def _merge_nodes_then_upsert(
                 async with pipeline_status_lock:
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
-            description = await _handle_entity_relation_summary(
-                entity_name,
-                description,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
+            summary_key = (entity_name, description)
+            if summary_key in summaries:
+                description = summaries[summary_key]
+            else:
+                pending_summaries.add(summary_key)
         else:
             status_message = f"Merge N: {entity_name} | {num_new_fragment}+{num_fragment-num_new_fragment}"
             logger.info(status_message)
@@ -322,29 +510,30 @@ async def _merge_nodes_then_upsert(
         entity_id=entity_name,
         entity_type=entity_type,
         description=description,
+        description_tokens=count_tokens(description, global_config["tokenizer"]),
         source_id=source_id,
         file_path=file_path,
         source_project=source_project,
         created_at=int(time.time()),
     )
-    await knowledge_graph_inst.upsert_node(
-        entity_name,
-        node_data=node_data,
-    )
-    node_data["entity_name"] = entity_name
     return node_data
 
 
-async def _merge_edges_then_upsert(
+async def _merge_edges(
     src_id: str,
     tgt_id: str,
     edges_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_edge: dict | None,
     global_config: dict,
+    summaries: dict[tuple[str, str], str],
+    pending_summaries: set[tuple[str, str]],
     pipeline_status: dict = None,
     pipeline_status_lock=None,
-    llm_response_cache: BaseKVStorage | None = None,
-):
+) -> dict | None:
+    """Merge extracted edge data with the already existing edge (prefetched by the caller), if any.
+    The merged edge data is returned for a batched upsert by the caller.
+
+    LLM summaries are handled the same way as in `_merge_nodes`."""
     if src_id == tgt_id:
         return None
 
@@ -356,40 +545,38 @@ async def _merge_edges_then_upsert(
 
     source_project = edges_data[0].get("source_project", "generic")
 
-    if await knowledge_graph_inst.has_edge(src_id, tgt_id, source_project=source_project):
-        already_edge = await knowledge_graph_inst.get_edge(src_id, tgt_id, source_project=source_project)
-        # Handle the case where get_edge returns None or missing fields
-        if already_edge:
-            # Get weight with default 0.0 if missing
-            already_weights.append(already_edge.get("weight", 0.0))
-
-            # Get source_id with empty string default if missing or None
-            if already_edge.get("source_id") is not None:
-                already_source_ids.extend(
-                    split_string_by_multi_markers(
-                        already_edge["source_id"], [GRAPH_FIELD_SEP]
-                    )
+    # Handle the case where the existing edge is missing fields
+    if already_edge:
+        # Get weight with default 0.0 if missing
+        already_weights.append(already_edge.get("weight", 0.0))
+
+        # Get source_id with empty string default if missing or None
+        if already_edge.get("source_id") is not None:
+            already_source_ids.extend(
+                split_string_by_multi_markers(
+                    already_edge["source_id"], [GRAPH_FIELD_SEP]
                 )
+            )
 
-            # Get file_path with empty string default if missing or None
-            if already_edge.get("file_path") is not None:
-                already_file_paths.extend(
-                    split_string_by_multi_markers(
-                        already_edge["file_path"], [GRAPH_FIELD_SEP]
-                    )
+        # Get file_path with empty string default if missing or None
+        if already_edge.get("file_path") is not None:
+            already_file_paths.extend(
+                split_string_by_multi_markers(
+                    already_edge["file_path"], [GRAPH_FIELD_SEP]
                 )
+            )
 
-            # Get description with empty string default if missing or None
-            if already_edge.get("description") is not None:
-                already_description.append(already_edge["description"])
+        # Get description with empty string default if missing or None
+        if already_edge.get("description") is not None:
+            already_description.append(already_edge["description"])
 
-            # Get keywords with empty string default if missing or None
-            if already_edge.get("keywords") is not None:
-                already_keywords.extend(
-                    split_string_by_multi_markers(
-                        already_edge["keywords"], [GRAPH_FIELD_SEP]
-                    )
+        # Get keywords with empty string default if missing or None
+        if already_edge.get("keywords") is not None:
+            already_keywords.extend(
+                split_string_by_multi_markers(
+                    already_edge["keywords"], [GRAPH_FIELD_SEP]
                 )
+            )
 
     # Process edges_data with None checks
     weight = sum([dp["weight"] for dp in edges_data] + already_weights)
@@ -430,31 +617,6 @@ async def _merge_edges_then_upsert(
         )
     )
 
-    for need_insert_id in [src_id, tgt_id]:
-        if not (await knowledge_graph_inst.has_node(need_insert_id)):
-            # # Discard this edge if the node does not exist
-            # if need_insert_id == src_id:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Source node missing"
-            #     )
-            # else:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Target node missing"
-            #     )
-            # return None
-            await knowledge_graph_inst.upsert_node(
-                need_insert_id,
-                node_data={
-                    "entity_id": need_insert_id,
-                    "source_id": source_id,
-                    "description": description,
-                    "entity_type": "UNKNOWN",
-                    "file_path": file_path,
-                    "source_project": source_project,
-                    "created_at": int(time.time()),
-                },
-            )
-
     force_llm_summary_on_merge = global_config["force_llm_summary_on_merge"]
 
     num_fragment = description.count(GRAPH_FIELD_SEP) + 1
@@ -470,14 +632,11 @@ async def _merge_edges_then_upsert(
                 async with pipeline_status_lock:
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
-            description = await _handle_entity_relation_summary(
-                f"({src_id}, {tgt_id})",
-                description,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
+            summary_key = (f"({src_id}, {tgt_id})", description)
+            if summary_key in summaries:
+                description = summaries[summary_key]
+            else:
+                pending_summaries.add(summary_key)
         else:
             status_message = f"Merge E: {src_id} - {tgt_id} | {num_new_fragment}+{num_fragment-num_new_fragment}"
             logger.info(status_message)
@@ -486,33 +645,380 @@ async def _merge_edges_then_upsert(
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
 
-    await knowledge_graph_inst.upsert_edge(
-        src_id,
-        tgt_id,
-        edge_data=dict(
-            weight=weight,
-            description=description,
-            keywords=keywords,
-            source_id=source_id,
-            file_path=file_path,
-            source_project=source_project,
-            created_at=int(time.time()),
-        ),
-    )
-
     edge_data = dict(
-        src_id=src_id,
-        tgt_id=tgt_id,
+        weight=weight,
         description=description,
+        description_tokens=count_tokens(description, global_config["tokenizer"]),
         keywords=keywords,
         source_id=source_id,
         file_path=file_path,
         source_project=source_project,
+        created_at=int(time.time()),
     )
 
     return edge_data
 
 
+async def _prefetch_merge_targets(
+    all_nodes: dict[str, list[dict]],
+    all_edges: dict[tuple[str, str], list[dict]],
+    knowledge_graph_inst: BaseGraphStorage,
+) -> tuple[dict, dict, dict, dict]:
+    """Resolve the existing nodes and edges the extracted entities and relationships are merged into
+
+    Returns:
+        tuple: (grouped_nodes, already_nodes, resolved_edges, already_edges)
+    """
+    # Entities differing only by letter case share a node
+    grouped_nodes: dict[str, tuple[str, list[dict]]] = {}
+    for entity_name, entities in all_nodes.items():
+        key = entity_name.lower()
+        if key in grouped_nodes:
+            grouped_nodes[key][1].extend(entities)
+        else:
+            grouped_nodes[key] = (entity_name, list(entities))
+
+    # Resolve all already existing nodes with a single batch lookup
+    already_nodes = await knowledge_graph_inst.get_nodes_batch_case_insensitive(
+        [entity_name for entity_name, _ in grouped_nodes.values()]
+    )
+
+    # Relationship endpoints are kept as extracted and matched exactly
+    resolved_edges = defaultdict(list)
+    for (src_id, tgt_id), edges in all_edges.items():
+        resolved_edges[tuple(sorted((src_id, tgt_id)))].extend(edges)
+
+    # Resolve all already existing edges with a single batch lookup
+    already_edges = await knowledge_graph_inst.get_edges_batch(
+        [
+            {
+                "src": edge_key[0],
+                "tgt": edge_key[1],
+                "source_project": edges[0].get("source_project", "generic"),
+            }
+            for edge_key, edges in resolved_edges.items()
+            if edge_key[0] != edge_key[1]
+        ]
+    )
+
+    return grouped_nodes, already_nodes, resolved_edges, already_edges
+
+
+async def _merge_graph_data(
+    merge_targets: tuple[dict, dict, dict, dict],
+    global_config: dict,
+    summaries: dict[tuple[str, str], str],
+    pending_summaries: set[tuple[str, str]],
+    pipeline_status: dict = None,
+    pipeline_status_lock=None,
+) -> tuple[list[dict], list[dict]]:
+    """Merge all extracted entities and relationships with their prefetched counterparts in memory"""
+    grouped_nodes, already_nodes, resolved_edges, already_edges = merge_targets
+
+    entities_data = []
+    for entity_name, entities in grouped_nodes.values():
+        entity_data = await _merge_nodes(
+            entity_name,
+            entities,
+            already_nodes.get(entity_name),
+            global_config,
+            summaries,
+            pending_summaries,
+            pipeline_status,
+            pipeline_status_lock,
+        )
+        entities_data.append(entity_data)
+
+    relationships_data = []
+    for edge_key, edges in resolved_edges.items():
+        edge_data = await _merge_edges(
+            edge_key[0],
+            edge_key[1],
+            edges,
+            already_edges.get(edge_key),
+            global_config,
+            summaries,
+            pending_summaries,
+            pipeline_status,
+            pipeline_status_lock,
+        )
+        if edge_data is not None:
+            relationships_data.append(
+                {"src_id": edge_key[0], "tgt_id": edge_key[1], **edge_data}
+            )
+
+    return entities_data, relationships_data
+
+
+async def _summarize_descriptions(
+    pending_summaries: set[tuple[str, str]],
+    summaries: dict[tuple[str, str], str],
+    global_config: dict,
+    pipeline_status: dict = None,
+    pipeline_status_lock=None,
+    llm_response_cache: BaseKVStorage | None = None,
+) -> None:
+    """Summarize merged descriptions concurrently and store the results in `summaries`
+
+    Concurrency is bounded by the priority queue of the LLM function.
+    """
+    pending = list(pending_summaries)
+    results = await asyncio.gather(
+        *[
+            _handle_entity_relation_summary(
+                name,
+                description,
+                global_config,
+                pipeline_status,
+                pipeline_status_lock,
+                llm_response_cache,
+            )
+            for name, description in pending
+        ]
+    )
+    summaries.update(zip(pending, results))
+
+
+async def _commit_graph_data(
+    entities_data: list[dict],
+    relationships_data: list[dict],
+    knowledge_graph_inst: BaseGraphStorage,
+    entity_vdb: BaseVectorStorage,
+    relationships_vdb: BaseVectorStorage,
+    pipeline_status: dict = None,
+    pipeline_status_lock=None,
+    current_file_number: int = 0,
+    total_files: int = 0,
+    file_path: str = "unknown_source",
+) -> None:
+    """Write merged nodes and edges to the graph and vector storages"""
+    # Create placeholder nodes for relationship endpoints missing in the graph
+    merged_entity_ids = {dp["entity_id"] for dp in entities_data}
+    endpoint_ids = {
+        node_id
+        for dp in relationships_data
+        for node_id in (dp["src_id"], dp["tgt_id"])
+        if node_id not in merged_entity_ids
+    }
+    existing_endpoints = (
+        await knowledge_graph_inst.get_nodes_batch(list(endpoint_ids))
+        if endpoint_ids
+        else {}
+    )
+    placeholder_nodes = {}
+    for dp in relationships_data:
+        for node_id in (dp["src_id"], dp["tgt_id"]):
+            if (
+                node_id in merged_entity_ids
+                or node_id in existing_endpoints
+                or node_id in placeholder_nodes
+            ):
+                continue
+            placeholder_nodes[node_id] = {
+                "entity_id": node_id,
+                "source_id": dp["source_id"],
+                "description": dp["description"],
+                "entity_type": "UNKNOWN",
+                "file_path": dp["file_path"],
+                "source_project": dp["source_project"],
+                "created_at": int(time.time()),
+            }
+
+    # Write all merged nodes and edges in batches
+    await knowledge_graph_inst.upsert_nodes_batch(
+        [(dp["entity_id"], dp) for dp in entities_data]
+        + list(placeholder_nodes.items())
+    )
+    await knowledge_graph_inst.upsert_edges_batch(
+        [
+            (
+                dp["src_id"],
+                dp["tgt_id"],
+                {k: v for k, v in dp.items() if k not in ("src_id", "tgt_id")},
+            )
+            for dp in relationships_data
+        ]
+    )
+    entities_data = [{**dp, "entity_name": dp["entity_id"]} for dp in entities_data]
+
+    # Update total counts
+    total_entities_count = len(entities_data)
+    total_relations_count = len(relationships_data)
+
+    # Entity and relationship lock groups are committed separately
+    if entities_data:
+        log_message = f"Updating {total_entities_count} entities  {current_file_number}/{total_files}: {file_path}"
+        logger.info(log_message)
+        if pipeline_status is not None:
+            async with pipeline_status_lock:
+                pipeline_status["latest_message"] = log_message
+                pipeline_status["history_messages"].append(log_message)
+
+    # Update vector databases with all collected data
+    if entity_vdb is not None and entities_data:
+        data_for_vdb = {
+            compute_mdhash_id(dp["entity_name"], prefix="ent-"): {
+                "entity_name": dp["entity_name"],
+                "entity_type": dp["entity_type"],
+                "content": f"{dp['entity_name']}\n{dp['description']}",
+                "source_id": dp["source_id"],
+                "file_path": dp.get("file_path", "unknown_source"),
+            }
+            for dp in entities_data
+        }
+        await entity_vdb.upsert(data_for_vdb)
+
+    if relationships_data:
+        log_message = f"Updating {total_relations_count} relations {current_file_number}/{total_files}: {file_path}"
+        logger.info(log_message)
+        if pipeline_status is not None:
+            async with pipeline_status_lock:
+                pipeline_status["latest_message"] = log_message
+                pipeline_status["history_messages"].append(log_message)
+
+    if relationships_vdb is not None and relationships_data:
+        data_for_vdb = {
+            compute_mdhash_id(dp["src_id"] + dp["tgt_id"], prefix="rel-"): {
+                "src_id": dp["src_id"],
+                "tgt_id": dp["tgt_id"],
+                "keywords": dp["keywords"],
+                "content": f"{dp['src_id']}\t{dp['tgt_id']}\n{dp['keywords']}\n{dp['description']}",
+                "source_id": dp["source_id"],
+                "file_path": dp.get("file_path", "unknown_source"),
+            }
+            for dp in relationships_data
+        }
+        await relationships_vdb.upsert(data_for_vdb)
+
+
+def _lock_groups(
+    all_nodes: dict[str, list[dict]],
+    all_edges: dict[tuple[str, str], list[dict]],
+) -> tuple[list[dict], list[dict]]:
+    """Split the extracted entities and relationships into groups of at most
+    GRAPH_DB_LOCK_GROUP_SIZE entity names, each merged under its own graph lock
+
+    Entities differing only by letter case are kept in the same group. A relationship
+    group covers the names of all endpoints of its relationships.
+
+    Returns:
+        tuple: (node_groups, edge_groups)
+    """
+    by_name: dict[str, dict[str, list[dict]]] = defaultdict(dict)
+    for entity_name, entities in all_nodes.items():
+        by_name[entity_name.lower()][entity_name] = entities
+    name_groups = list(by_name.values())
+    node_groups = []
+    for index in range(0, len(name_groups), GRAPH_DB_LOCK_GROUP_SIZE):
+        group = {}
+        for names in name_groups[index : index + GRAPH_DB_LOCK_GROUP_SIZE]:
+            group.update(names)
+        node_groups.append(group)
+
+    edge_groups = []
+    group, group_names = {}, set()
+    for edge_key, edges in all_edges.items():
+        edge_names = {node_id.lower() for node_id in edge_key}
+        if group and len(group_names | edge_names) > GRAPH_DB_LOCK_GROUP_SIZE:
+            edge_groups.append(group)
+            group, group_names = {}, set()
+        group[edge_key] = edges
+        group_names |= edge_names
+    if group:
+        edge_groups.append(group)
+
+    return node_groups, edge_groups
+
+
+async def _merge_lock_group(
+    all_nodes: dict[str, list[dict]],
+    all_edges: dict[tuple[str, str], list[dict]],
+    summaries: dict[tuple[str, str], str],
+    knowledge_graph_inst: BaseGraphStorage,
+    entity_vdb: BaseVectorStorage,
+    relationships_vdb: BaseVectorStorage,
+    global_config: dict[str, str],
+    pipeline_status: dict = None,
+    pipeline_status_lock=None,
+    llm_response_cache: BaseKVStorage | None = None,
+    current_file_number: int = 0,
+    total_files: int = 0,
+    file_path: str = "unknown_source",
+) -> None:
+    """Merge and commit one lock group of entities and relationships, see merge_nodes_and_edges"""
+    from .kg.shared_storage import get_graph_db_keyed_lock
+
+    # Relationships are covered by the stripes of both endpoints
+    graph_db_lock = get_graph_db_keyed_lock(
+        list(all_nodes.keys())
+        + [node_id for edge_key in all_edges for node_id in edge_key],
+        enable_logging=False,
+    )
+    for attempt in range(1, MAX_MERGE_ATTEMPTS + 1):
+        async with graph_db_lock:
+            merge_targets = await _prefetch_merge_targets(
+                all_nodes, all_edges, knowledge_graph_inst
+            )
+            pending_summaries: set[tuple[str, str]] = set()
+            # Merge status messages are only reported on the first attempt
+            entities_data, relationships_data = await _merge_graph_data(
+                merge_targets,
+                global_config,
+                summaries,
+                pending_summaries,
+                pipeline_status if attempt == 1 else None,
+                pipeline_status_lock,
+            )
+
+            if pending_summaries and attempt == MAX_MERGE_ATTEMPTS:
+                # Too many conflicts, summarize while holding the lock to guarantee progress
+                await _summarize_descriptions(
+                    pending_summaries,
+                    summaries,
+                    global_config,
+                    pipeline_status,
+                    pipeline_status_lock,
+                    llm_response_cache,
+                )
+                pending_summaries = set()
+                entities_data, relationships_data = await _merge_graph_data(
+                    merge_targets, global_config, summaries, pending_summaries
+                )
+
+            if not pending_summaries:
+                await _commit_graph_data(
+                    entities_data,
+                    relationships_data,
+                    knowledge_graph_inst,
+                    entity_vdb,
+                    relationships_vdb,
+                    pipeline_status,
+                    pipeline_status_lock,
+                    current_file_number,
+                    total_files,
+                    file_path,
+                )
+                return
+
+        if attempt > 1:
+            log_message = f"Merge conflict, re-summarizing {len(pending_summaries)} descriptions {current_file_number}/{total_files}: {file_path}"
+            logger.info(log_message)
+            if pipeline_status is not None:
+                async with pipeline_status_lock:
+                    pipeline_status["latest_message"] = log_message
+                    pipeline_status["history_messages"].append(log_message)
+
+        # Summarize outside of the graph lock
+        await _summarize_descriptions(
+            pending_summaries,
+            summaries,
+            global_config,
+            pipeline_status,
+            pipeline_status_lock,
+            llm_response_cache,
+        )
+
+
 async def merge_nodes_and_edges(
     chunk_results: list,
     knowledge_graph_inst: BaseGraphStorage,
@@ -528,6 +1034,18 @@ async def merge_nodes_and_edges(
 ) -> None:
     """Merge nodes and edges from extraction results
 
+    The entities are merged in groups of at most GRAPH_DB_LOCK_GROUP_SIZE names, each locking
+    only the graph lock stripes of its own names, so documents sharing a few entities block
+    each other only on those groups. The relationships are merged in groups the same way once
+    all entity groups are committed.
+
+    Every group is merged in three phases so that LLM summarization never happens while holding the graph lock:
+    1. Under the graph lock, read the existing nodes and edges and merge them in memory
+    2. Without the lock, summarize all merged descriptions that need it concurrently
+    3. Under the graph lock, re-read and re-merge, then commit if every summary is still valid.
+       If another document changed a merged node or edge in the meantime (version conflict),
+       the affected descriptions are summarized again and the commit is retried.
+
     Args:
         chunk_results: List of tuples (maybe_nodes, maybe_edges) containing extracted entities and relationships
         knowledge_graph_inst: Knowledge graph storage
@@ -538,9 +1056,6 @@ async def merge_nodes_and_edges(
         pipeline_status_lock: Lock for pipeline status
         llm_response_cache: LLM response cache
     """
-    # Get lock manager from shared storage
-    from .kg.shared_storage import get_graph_db_lock
-
     # Collect all nodes and edges from all chunks
     all_nodes = defaultdict(list)
     all_edges = defaultdict(list)
@@ -555,108 +1070,45 @@ async def merge_nodes_and_edges(
             sorted_edge_key = tuple(sorted(edge_key))
             all_edges[sorted_edge_key].extend(edges)
 
-    # Centralized processing of all nodes and edges
-    entities_data = []
-    relationships_data = []
-
-    # Merge nodes and edges
-    # Use graph database lock to ensure atomic merges and updates
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    async with graph_db_lock:
-        async with pipeline_status_lock:
-            log_message = (
-                f"Merging stage {current_file_number}/{total_files}: {file_path}"
-            )
-            logger.info(log_message)
-            pipeline_status["latest_message"] = log_message
-            pipeline_status["history_messages"].append(log_message)
-
-        # Process and update all entities at once
-        for entity_name, entities in all_nodes.items():
-            entity_data = await _merge_nodes_then_upsert(
-                entity_name,
-                entities,
-                knowledge_graph_inst,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
-            entities_data.append(entity_data)
-
-        # Process and update all relationships at once
-        for edge_key, edges in all_edges.items():
-            edge_data = await _merge_edges_then_upsert(
-                edge_key[0],
-                edge_key[1],
-                edges,
-                knowledge_graph_inst,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
-            if edge_data is not None:
-                relationships_data.append(edge_data)
-
-        # Update total counts
-        total_entities_count = len(entities_data)
-        total_relations_count = len(relationships_data)
-
-        log_message = f"Updating {total_entities_count} entities  {current_file_number}/{total_files}: {file_path}"
+    async with pipeline_status_lock:
+        log_message = f"Merging stage {current_file_number}/{total_files}: {file_path}"
         logger.info(log_message)
-        if pipeline_status is not None:
-            async with pipeline_status_lock:
-                pipeline_status["latest_message"] = log_message
-                pipeline_status["history_messages"].append(log_message)
+        pipeline_status["latest_message"] = log_message
+        pipeline_status["history_messages"].append(log_message)
 
-        # Update vector databases with all collected data
-        if entity_vdb is not None and entities_data:
-            data_for_vdb = {
-                compute_mdhash_id(dp["entity_name"], prefix="ent-"): {
-                    "entity_name": dp["entity_name"],
-                    "entity_type": dp["entity_type"],
-                    "content": f"{dp['entity_name']}\n{dp['description']}",
-                    "source_id": dp["source_id"],
-                    "file_path": dp.get("file_path", "unknown_source"),
-                }
-                for dp in entities_data
-            }
-            await entity_vdb.upsert(data_for_vdb)
-
-        log_message = f"Updating {total_relations_count} relations {current_file_number}/{total_files}: {file_path}"
-        logger.info(log_message)
-        if pipeline_status is not None:
-            async with pipeline_status_lock:
-                pipeline_status["latest_message"] = log_message
-                pipeline_status["history_messages"].append(log_message)
-
-        if relationships_vdb is not None and relationships_data:
-            data_for_vdb = {
-                compute_mdhash_id(dp["src_id"] + dp["tgt_id"], prefix="rel-"): {
-                    "src_id": dp["src_id"],
-                    "tgt_id": dp["tgt_id"],
-                    "keywords": dp["keywords"],
-                    "content": f"{dp['src_id']}\t{dp['tgt_id']}\n{dp['keywords']}\n{dp['description']}",
-                    "source_id": dp["source_id"],
-                    "file_path": dp.get("file_path", "unknown_source"),
-                }
-                for dp in relationships_data
-            }
-            await relationships_vdb.upsert(data_for_vdb)
+    # LLM summaries of merged descriptions, keyed by (name, merged description)
+    summaries: dict[tuple[str, str], str] = {}
 
+    node_groups, edge_groups = _lock_groups(all_nodes, all_edges)
+    # Entities are committed first, so relationship groups find their endpoints in the graph
+    for groups in (
+        [(group, {}) for group in node_groups],
+        [({}, group) for group in edge_groups],
+    ):
+        await asyncio.gather(
+            *[
+                _merge_lock_group(
+                    group_nodes,
+                    group_edges,
+                    summaries,
+                    knowledge_graph_inst,
+                    entity_vdb,
+                    relationships_vdb,
+                    global_config,
+                    pipeline_status,
+                    pipeline_status_lock,
+                    llm_response_cache,
+                    current_file_number,
+                    total_files,
+                    file_path,
+                )
+                for group_nodes, group_edges in groups
+            ]
+        )
 
-async def extract_entities(
-    chunks: dict[str, TextChunkSchema],
-    global_config: dict[str, str],
-    pipeline_status: dict = None,
-    pipeline_status_lock=None,
-    llm_response_cache: BaseKVStorage | None = None,
-) -> list:
-    use_llm_func: callable = global_config["llm_model_func"]
-    entity_extract_max_gleaning = global_config["entity_extract_max_gleaning"]
 
-    ordered_chunks = list(chunks.items())
+def _extraction_prompt_context(global_config: dict) -> dict[str, str]:
+    """Variables of the entity extraction prompts: delimiters, entity types, language and examples"""
     # add language and example number params to prompt
     language = global_config["addon_params"].get(
         "language", PROMPTS["DEFAULT_LANGUAGE"]
@@ -682,8 +1134,7 @@ async def extract_entities(
     # add example's format
     examples = examples.format(**example_context_base)
 
-    entity_extract_prompt = PROMPTS["entity_extraction"]
-    context_base = dict(
+    return dict(
         tuple_delimiter=PROMPTS["DEFAULT_TUPLE_DELIMITER"],
         record_delimiter=PROMPTS["DEFAULT_RECORD_DELIMITER"],
         completion_delimiter=PROMPTS["DEFAULT_COMPLETION_DELIMITER"],
@@ -692,77 +1143,150 @@ async def extract_entities(
         language=language,
     )
 
+
+def extraction_prompt_version(global_config: dict) -> str:
+    """Version of the entity extraction prompts and model, stored with every chunk extraction
+
+    A stored chunk extraction of another version is extracted again.
+    """
+    context_base = _extraction_prompt_context(global_config)
+    return compute_args_hash(
+        PROMPTS["entity_extraction"].format(**{**context_base, "input_text": ""}),
+        PROMPTS["entity_continue_extraction"].format(**context_base),
+        PROMPTS["entity_if_loop_extraction"],
+        global_config["entity_extract_max_gleaning"],
+        global_config.get("llm_model_name"),
+        cache_type="extract",
+    )
+
+
+async def extract_entities(
+    chunks: dict[str, TextChunkSchema],
+    global_config: dict[str, str],
+    pipeline_status: dict = None,
+    pipeline_status_lock=None,
+    llm_response_cache: BaseKVStorage | None = None,
+    chunk_scheduler: FairTaskScheduler | None = None,
+    chunk_extractions: BaseKVStorage | None = None,
+    cpu_pool: CpuWorkerPool | None = None,
+    chunk_packer: TokenBudgetBatcher | None = None,
+    gleaning_tracker: GleaningYieldTracker | None = None,
+) -> list:
+    """Extract entities and relationships from all chunks of a document
+
+    If a chunk_scheduler is given, the chunks are extracted on the workers shared by all
+    documents of the insert pipeline, otherwise up to llm_model_max_async chunks of this
+    document are extracted concurrently.
+
+    If chunk_extractions is given, the result of every extracted chunk is stored there
+    keyed by chunk id, together with the version of the extraction prompt. Chunks with a
+    stored result of the current prompt version are not sent to the LLM again, so a failed
+    or interrupted document only re-extracts the chunks that never completed.
+
+    If a cpu_pool is given, the LLM results are parsed in its worker processes.
+
+    With entity_extract_pack_tokens set, chunks of at most half that many tokens are packed
+    into one extraction prompt, separated by chunk markers that the LLM repeats in its
+    output to attribute every record to its chunk. A chunk_packer shared by several
+    documents packs small chunks across documents; without one, only the chunks of this
+    document are packed together.
+
+    If a gleaning_tracker is given, gleaning rounds are limited to those whose recent yield
+    of new entities and relations per LLM call is above the gleaning_yield_threshold, and
+    the gleaning statistics are published in pipeline_status["gleaning"].
+    """
+    use_llm_func: callable = global_config["llm_model_func"]
+    entity_extract_max_gleaning = global_config["entity_extract_max_gleaning"]
+
+    ordered_chunks = list(chunks.items())
+    entity_extract_prompt = PROMPTS["entity_extraction"]
+    context_base = _extraction_prompt_context(global_config)
+
     continue_prompt = PROMPTS["entity_continue_extraction"].format(**context_base)
     if_loop_prompt = PROMPTS["entity_if_loop_extraction"]
 
     processed_chunks = 0
     total_chunks = len(ordered_chunks)
 
-    async def _process_extraction_result(
-        result: str, chunk_key: str, file_path: str = "unknown_source", source_project: str | None = None
-    ):
-        """Process a single extraction result (either initial or gleaning)
-        Args:
-            result (str): The extraction result to process
-            chunk_key (str): The chunk key for source tracking
-            file_path (str): The file path for citation
-            source_project (str | None): The project name for subgraph creation & project tracking
-        Returns:
-            tuple: (nodes_dict, edges_dict) containing the extracted entities and relationships
-        """
-        maybe_nodes = defaultdict(list)
-        maybe_edges = defaultdict(list)
+    # Small chunks are packed into shared extraction prompts up to this token budget
+    pack_tokens = global_config.get("entity_extract_pack_tokens", 0)
+    if chunk_packer is None and pack_tokens > 0:
+        chunk_packer = TokenBudgetBatcher(pack_tokens, EXTRACT_PACK_LINGER)
 
-        records = split_string_by_multi_markers(
+    # Stored chunk extractions are only reused if produced by the same prompts and model
+    prompt_version = extraction_prompt_version(global_config)
+
+    async def _parse_extraction_result(
+        result: str, chunk_key: str, file_path: str, source_project: str | None
+    ):
+        args = (
             result,
-            [context_base["record_delimiter"], context_base["completion_delimiter"]],
+            chunk_key,
+            file_path,
+            source_project,
+            context_base["tuple_delimiter"],
+            context_base["record_delimiter"],
+            context_base["completion_delimiter"],
         )
-
-        for record in records:
-            record = re.search(r"\((.*)\)", record)
-            if record is None:
-                continue
-            record = record.group(1)
-            record_attributes = split_string_by_multi_markers(
-                record, [context_base["tuple_delimiter"]]
-            )
-
-            if_entities = await _handle_single_entity_extraction(
-                record_attributes, chunk_key, file_path, source_project
+        if cpu_pool is not None:
+            return await cpu_pool.run(_process_extraction_result, *args)
+        return _process_extraction_result(*args)
+
+    async def _parse_group_result(
+        result: str, group: list[tuple[str, TextChunkSchema]]
+    ) -> dict[str, tuple[dict, dict]]:
+        """Parse the result of a chunk group, packed results are split at the chunk markers"""
+        if len(group) == 1:
+            sections = {0: result}
+        else:
+            sections = _split_packed_result(
+                result, len(group), PROMPTS["DEFAULT_CHUNK_DELIMITER"]
             )
-            if if_entities is not None:
-                maybe_nodes[if_entities["entity_name"]].append(if_entities)
-                continue
 
-            if_relation = await _handle_single_relationship_extraction(
-                record_attributes, chunk_key, file_path, source_project
+        parsed = {}
+        for index, section in sections.items():
+            chunk_key, chunk_dp = group[index]
+            parsed[chunk_key] = await _parse_extraction_result(
+                section,
+                chunk_key,
+                chunk_dp.get("file_path", "unknown_source"),
+                chunk_dp.get("metadata", {}).get("project", "generic"),
             )
-            if if_relation is not None:
-                maybe_edges[(if_relation["src_id"], if_relation["tgt_id"])].append(
-                    if_relation
-                )
+        return parsed
 
-        return maybe_nodes, maybe_edges
-
-    async def _process_single_content(chunk_key_dp: tuple[str, TextChunkSchema]):
-        """Process a single chunk
+    async def _extract_group(
+        group: list[tuple[str, TextChunkSchema]],
+    ) -> list[tuple[dict, dict] | None]:
+        """Extract a group of chunks with one prompt, packing them if there are several
         Args:
-            chunk_key_dp (tuple[str, TextChunkSchema]):
-                ("chunk-xxxxxx", {"tokens": int, "content": str, "full_doc_id": str, "chunk_order_index": int})
+            group (list[tuple[str, TextChunkSchema]]): chunks, possibly of several documents
         Returns:
-            tuple: (maybe_nodes, maybe_edges) containing extracted entities and relationships
+            list: (maybe_nodes, maybe_edges) per chunk, None for a chunk missing from a packed result
         """
-        nonlocal processed_chunks
-        chunk_key = chunk_key_dp[0]
-        chunk_dp = chunk_key_dp[1]
-        content = chunk_dp["content"]
-        # Get file path from chunk data or use default
-        file_path = chunk_dp.get("file_path", "unknown_source")
-        source_project: str | None = chunk_dp.get("metadata", {}).get("project", "generic") # TO DO: configurable
+        if len(group) == 1:
+            input_text = group[0][1]["content"]
+            glean_prompt = continue_prompt
+        else:
+            chunk_delimiter = PROMPTS["DEFAULT_CHUNK_DELIMITER"]
+            input_text = PROMPTS["entity_extraction_packed_input"].format(
+                chunk_count=len(group),
+                chunk_delimiter=chunk_delimiter,
+                record_delimiter=context_base["record_delimiter"],
+                sections="\n\n".join(
+                    f"{chunk_delimiter}{index}\n{chunk_dp['content']}"
+                    for index, (_, chunk_dp) in enumerate(group, start=1)
+                ),
+            )
+            glean_prompt = continue_prompt + PROMPTS[
+                "entity_extraction_packed_reminder"
+            ].format(
+                chunk_delimiter=chunk_delimiter,
+                record_delimiter=context_base["record_delimiter"],
+            )
 
         # Get initial extraction
         hint_prompt = entity_extract_prompt.format(
-            **{**context_base, "input_text": content}
+            **{**context_base, "input_text": input_text}
         )
 
         final_result = await use_llm_func_with_cache(
@@ -774,41 +1298,52 @@ async def extract_entities(
         history = pack_user_ass_to_openai_messages(hint_prompt, final_result)
 
         # Process initial extraction with file path
-        maybe_nodes, maybe_edges = await _process_extraction_result(
-            final_result, chunk_key, file_path, source_project
-        )
+        results = await _parse_group_result(final_result, group)
 
-        # Process additional gleaning results
-        for now_glean_index in range(entity_extract_max_gleaning):
+        # Process additional gleaning results, as many rounds as still pay off
+        glean_rounds = (
+            gleaning_tracker.allowed_rounds(entity_extract_max_gleaning)
+            if gleaning_tracker is not None
+            else entity_extract_max_gleaning
+        )
+        for now_glean_index in range(glean_rounds):
             glean_result = await use_llm_func_with_cache(
-                continue_prompt,
+                glean_prompt,
                 use_llm_func,
                 llm_response_cache=llm_response_cache,
                 history_messages=history,
                 cache_type="extract",
             )
 
-            history += pack_user_ass_to_openai_messages(continue_prompt, glean_result)
+            history += pack_user_ass_to_openai_messages(glean_prompt, glean_result)
 
             # Process gleaning result separately with file path
-            glean_nodes, glean_edges = await _process_extraction_result(
-                glean_result, chunk_key, file_path, source_project
-            )
-
-            # Merge results - only add entities and edges with new names
-            for entity_name, entities in glean_nodes.items():
-                if (
-                    entity_name not in maybe_nodes
-                ):  # Only accetp entities with new name in gleaning stage
-                    maybe_nodes[entity_name].extend(entities)
-            for edge_key, edges in glean_edges.items():
-                if (
-                    edge_key not in maybe_edges
-                ):  # Only accetp edges with new name in gleaning stage
-                    maybe_edges[edge_key].extend(edges)
-
-            if now_glean_index == entity_extract_max_gleaning - 1:
+            glean_results = await _parse_group_result(glean_result, group)
+
+            new_items = 0
+            for chunk_key, (glean_nodes, glean_edges) in glean_results.items():
+                if chunk_key not in results:
+                    continue
+                maybe_nodes, maybe_edges = results[chunk_key]
+                # Merge results - only add entities and edges with new names
+                for entity_name, entities in glean_nodes.items():
+                    if (
+                        entity_name not in maybe_nodes
+                    ):  # Only accetp entities with new name in gleaning stage
+                        maybe_nodes[entity_name].extend(entities)
+                        new_items += 1
+                for edge_key, edges in glean_edges.items():
+                    if (
+                        edge_key not in maybe_edges
+                    ):  # Only accetp edges with new name in gleaning stage
+                        maybe_edges[edge_key].extend(edges)
+                        new_items += 1
+
+            if now_glean_index == glean_rounds - 1:
+                await _record_gleaning(now_glean_index, new_items, 1)
                 break
+            # The round costs the continuation and the following loop check
+            await _record_gleaning(now_glean_index, new_items, 2)
 
             if_loop_result: str = await use_llm_func_with_cache(
                 if_loop_prompt,
@@ -821,6 +1356,56 @@ async def extract_entities(
             if if_loop_result != "yes":
                 break
 
+        return [results.get(chunk_key) for chunk_key, _ in group]
+
+    async def _record_gleaning(round_index: int, new_items: int, llm_calls: int):
+        if gleaning_tracker is None:
+            return
+        gleaning_tracker.record(round_index, new_items, llm_calls)
+        if pipeline_status is not None:
+            async with pipeline_status_lock:
+                pipeline_status["gleaning"] = gleaning_tracker.stats(
+                    entity_extract_max_gleaning
+                )
+
+    def _is_packable(chunk_dp: TextChunkSchema) -> bool:
+        return pack_tokens > 0 and chunk_dp.get("tokens", 0) <= pack_tokens // 2
+
+    async def _process_single_content(chunk_key_dp: tuple[str, TextChunkSchema]):
+        """Process a single chunk
+        Args:
+            chunk_key_dp (tuple[str, TextChunkSchema]):
+                ("chunk-xxxxxx", {"tokens": int, "content": str, "full_doc_id": str, "chunk_order_index": int})
+        Returns:
+            tuple: (maybe_nodes, maybe_edges) containing extracted entities and relationships
+        """
+        nonlocal processed_chunks
+        chunk_key = chunk_key_dp[0]
+        chunk_dp = chunk_key_dp[1]
+
+        result = None
+        if _is_packable(chunk_dp):
+            result = await chunk_packer.submit(
+                chunk_key_dp, chunk_dp.get("tokens", 0), _extract_group
+            )
+        if result is None:
+            # Chunk too large to pack, or missing from the packed result
+            (result,) = await _extract_group([chunk_key_dp])
+        maybe_nodes, maybe_edges = result
+
+        # Checkpoint the chunk so a retry of the document does not extract it again
+        if chunk_extractions is not None:
+            await chunk_extractions.upsert(
+                {
+                    chunk_key: {
+                        "chunk_id": chunk_key,
+                        "prompt_version": prompt_version,
+                        "nodes": [dp for dps in maybe_nodes.values() for dp in dps],
+                        "edges": [dp for dps in maybe_edges.values() for dp in dps],
+                    }
+                }
+            )
+
         processed_chunks += 1
         entities_count = len(maybe_nodes)
         relations_count = len(maybe_edges)
@@ -834,13 +1419,74 @@ async def extract_entities(
         # Return the extracted nodes and edges for centralized processing
         return maybe_nodes, maybe_edges
 
+    # Restore the results of chunks extracted by a previous run
+    restored_results = {}
+    if chunk_extractions is not None:
+        for stored in await chunk_extractions.get_by_ids(
+            [chunk_key for chunk_key, _ in ordered_chunks]
+        ):
+            if stored and stored.get("prompt_version") == prompt_version:
+                restored_results[stored["chunk_id"]] = _restore_chunk_extraction(
+                    stored, chunks[stored["chunk_id"]]
+                )
+        if restored_results:
+            log_message = f"Restored {len(restored_results)} of {total_chunks} chunks from previous extraction"
+            logger.info(log_message)
+            if pipeline_status is not None:
+                async with pipeline_status_lock:
+                    pipeline_status["latest_message"] = log_message
+                    pipeline_status["history_messages"].append(log_message)
+            processed_chunks += len(restored_results)
+
+    pending_chunks = [c for c in ordered_chunks if c[0] not in restored_results]
+    packed_chunks = [c for c in pending_chunks if _is_packable(c[1])]
+    unpacked_chunks = [c for c in pending_chunks if not _is_packable(c[1])]
+    # Small chunks wait for their packed batch outside of the chunk scheduler,
+    # so that a batch is not limited to the number of scheduler workers
+    packed_results, unpacked_results = await asyncio.gather(
+        asyncio.gather(*[_process_single_content(c) for c in packed_chunks]),
+        _run_chunk_extractions(
+            unpacked_chunks, _process_single_content, global_config, chunk_scheduler
+        ),
+    )
+    extracted_results = dict(
+        zip(
+            [chunk_key for chunk_key, _ in packed_chunks + unpacked_chunks],
+            list(packed_results) + list(unpacked_results),
+        )
+    )
+
+    # Return the chunk_results for later processing in merge_nodes_and_edges
+    return [
+        restored_results[chunk_key]
+        if chunk_key in restored_results
+        else extracted_results[chunk_key]
+        for chunk_key, _ in ordered_chunks
+    ]
+
+
+async def _run_chunk_extractions(
+    ordered_chunks: list[tuple[str, TextChunkSchema]],
+    process_single_content: Callable[[tuple[str, TextChunkSchema]], Any],
+    global_config: dict[str, str],
+    chunk_scheduler: FairTaskScheduler | None = None,
+) -> list:
+    """Extract the given chunks and return their results in order"""
+    if not ordered_chunks:
+        return []
+
+    if chunk_scheduler is not None:
+        return await chunk_scheduler.run(
+            [partial(process_single_content, c) for c in ordered_chunks]
+        )
+
     # Get max async tasks limit from global_config
     llm_model_max_async = global_config.get("llm_model_max_async", 4)
     semaphore = asyncio.Semaphore(llm_model_max_async)
 
     async def _process_with_semaphore(chunk):
         async with semaphore:
-            return await _process_single_content(chunk)
+            return await process_single_content(chunk)
 
     tasks = []
     for c in ordered_chunks:
@@ -867,10 +1513,72 @@ async def extract_entities(
             raise task.exception()
 
     # If all tasks completed successfully, collect results
-    chunk_results = [task.result() for task in tasks]
+    return [task.result() for task in tasks]
 
-    # Return the chunk_results for later processing in merge_nodes_and_edges
-    return chunk_results
+
+def _restore_chunk_extraction(
+    stored: dict[str, Any], chunk_dp: TextChunkSchema
+) -> tuple[dict, dict]:
+    """Rebuild (maybe_nodes, maybe_edges) of a chunk from its stored extraction
+
+    File path and project follow the current chunk, since identical chunks may be
+    shared by several documents.
+    """
+    file_path = chunk_dp.get("file_path", "unknown_source")
+    source_project = chunk_dp.get("metadata", {}).get("project", "generic")
+
+    maybe_nodes = defaultdict(list)
+    maybe_edges = defaultdict(list)
+    for dp in stored.get("nodes", []):
+        maybe_nodes[dp["entity_name"]].append(
+            {**dp, "file_path": file_path, "source_project": source_project}
+        )
+    for dp in stored.get("edges", []):
+        maybe_edges[(dp["src_id"], dp["tgt_id"])].append(
+            {**dp, "file_path": file_path, "source_project": source_project}
+        )
+    return maybe_nodes, maybe_edges
+
+
+def compute_query_cache_hash(
+    query: str,
+    query_param: QueryParam,
+    global_config: dict[str, Any],
+    system_prompt: str | None = None,
+) -> str:
+    """Hash of a query and everything its answer depends on, the key of its response cache entry
+
+    Covers every answer-affecting QueryParam field, the custom system prompt and the
+    knowledge base version in global_config["kb_version"], so answers cached before
+    documents were inserted, deleted or edited are not served again.
+    """
+    model_func = query_param.model_func
+    key_data = {
+        "query": query,
+        "mode": query_param.mode,
+        "only_need_context": query_param.only_need_context,
+        "only_need_prompt": query_param.only_need_prompt,
+        "response_type": query_param.response_type,
+        "top_k": query_param.top_k,
+        "max_token_for_text_unit": query_param.max_token_for_text_unit,
+        "max_token_for_global_context": query_param.max_token_for_global_context,
+        "max_token_for_local_context": query_param.max_token_for_local_context,
+        "hl_keywords": query_param.hl_keywords,
+        "ll_keywords": query_param.ll_keywords,
+        "conversation_history": query_param.conversation_history,
+        "history_turns": query_param.history_turns,
+        "ids": query_param.ids,
+        "user_prompt": query_param.user_prompt,
+        "model_func": getattr(model_func, "__qualname__", repr(model_func))
+        if model_func is not None
+        else None,
+        "system_prompt": system_prompt,
+        "kb_version": global_config.get("kb_version", 0),
+    }
+    return compute_args_hash(
+        json.dumps(key_data, sort_keys=True, ensure_ascii=False, default=str),
+        cache_type="query",
+    )
 
 
 async def kg_query(
@@ -893,9 +1601,20 @@ async def kg_query(
         use_model_func = partial(use_model_func, _priority=5)
 
     # Handle cache
-    args_hash = compute_args_hash(query_param.mode, query, cache_type="query")
+    args_hash = compute_query_cache_hash(
+        query, query_param, global_config, system_prompt
+    )
+    # Similar queries only share answers if everything else about them is the same
+    cache_scope = compute_query_cache_hash(
+        "", query_param, global_config, system_prompt
+    )
     cached_response, quantized, min_val, max_val = await handle_cache(
-        hashing_kv, args_hash, query, query_param.mode, cache_type="query"
+        hashing_kv,
+        args_hash,
+        query,
+        query_param.mode,
+        cache_type="query",
+        cache_scope=cache_scope,
     )
     if cached_response is not None:
         return cached_response
@@ -937,6 +1656,8 @@ async def kg_query(
         text_chunks_db,
         query_param,
         chunks_vdb,
+        context_cache=global_config.get("retrieval_context_cache"),
+        kb_version=global_config.get("kb_version", 0),
     )
 
     if query_param.only_need_context:
@@ -1001,6 +1722,7 @@ async def kg_query(
                 max_val=max_val,
                 mode=query_param.mode,
                 cache_type="query",
+                cache_scope=cache_scope,
             ),
         )
 
@@ -1148,6 +1870,7 @@ async def _get_vector_context(
     chunks_vdb: BaseVectorStorage,
     query_param: QueryParam,
     tokenizer: Tokenizer,
+    query_embedding: np.ndarray | None = None,
 ) -> tuple[list, list, list] | None:
     """
     Retrieve vector context from the vector database.
@@ -1160,15 +1883,14 @@ async def _get_vector_context(
         chunks_vdb: Vector database containing document chunks
         query_param: Query parameters including top_k and ids
         tokenizer: Tokenizer for counting tokens
+        query_embedding: Precomputed embedding of the query, embedded by chunks_vdb if None
 
     Returns:
         Tuple (empty_entities, empty_relations, text_units) for combine_contexts,
         compatible with _get_edge_data and _get_node_data format
     """
     try:
-        results = await chunks_vdb.query(
-            query, top_k=query_param.top_k, ids=query_param.ids
-        )
+        results = await _search_vdb(chunks_vdb, query, query_embedding, query_param)
         if not results:
             return [], [], []
 
@@ -1224,6 +1946,127 @@ async def _get_vector_context(
         return [], [], []
 
 
+async def _search_vdb(
+    vdb: BaseVectorStorage,
+    query: str,
+    query_embedding: np.ndarray | None,
+    query_param: QueryParam,
+) -> list[dict[str, Any]]:
+    """Search a vector storage with the precomputed query embedding if there is one"""
+    if query_embedding is not None:
+        try:
+            return await vdb.query_by_vector(
+                query_embedding, top_k=query_param.top_k, ids=query_param.ids
+            )
+        except NotImplementedError:
+            pass
+    return await vdb.query(query, top_k=query_param.top_k, ids=query_param.ids)
+
+
+async def _embed_query_texts(
+    queries: list[tuple[BaseVectorStorage, str]],
+) -> dict[tuple[str, str], np.ndarray]:
+    """Embed the query texts of one query with the embedding_func of their storage
+
+    Texts are keyed by (storage namespace, text). Storages sharing an embedding_func get
+    all their texts embedded in a single call.
+    """
+    texts_by_func: dict[int, tuple[Callable[..., Any], dict[str, list[str]]]] = {}
+    for vdb, text in queries:
+        if not text:
+            continue
+        _, namespaces_by_text = texts_by_func.setdefault(
+            id(vdb.embedding_func), (vdb.embedding_func, {})
+        )
+        namespaces = namespaces_by_text.setdefault(text, [])
+        if vdb.namespace not in namespaces:
+            namespaces.append(vdb.namespace)
+
+    async def embed(
+        embedding_func: Callable[..., Any], namespaces_by_text: dict[str, list[str]]
+    ) -> dict[tuple[str, str], np.ndarray]:
+        texts = list(namespaces_by_text)
+        embeddings = await embedding_func(texts, _priority=5)
+        return {
+            (namespace, text): embedding
+            for text, embedding in zip(texts, embeddings)
+            for namespace in namespaces_by_text[text]
+        }
+
+    query_embeddings = {}
+    for embedded in await asyncio.gather(
+        *(embed(func, by_text) for func, by_text in texts_by_func.values())
+    ):
+        query_embeddings.update(embedded)
+    return query_embeddings
+
+
+async def _gather_retrieval_branches(
+    branches: dict[str, Awaitable[Any]], timeout: float
+) -> dict[str, Any]:
+    """Run retrieval branches concurrently and return the results of those that succeed
+
+    A branch that fails or takes longer than timeout seconds (0 for no limit) is dropped
+    with a warning, so the query is answered from the other branches. If every branch
+    fails, the first error is raised.
+    """
+
+    async def run_branch(coro: Awaitable[Any]) -> Any:
+        if timeout and timeout > 0:
+            return await asyncio.wait_for(coro, timeout)
+        return await coro
+
+    names = list(branches)
+    outcomes = await asyncio.gather(
+        *(run_branch(branches[name]) for name in names), return_exceptions=True
+    )
+
+    results = {}
+    errors = []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.warning(f"Dropped {name} retrieval, it took longer than {timeout}s")
+        elif isinstance(outcome, BaseException):
+            logger.warning(f"Dropped {name} retrieval, it failed: {outcome!r}")
+            errors.append(outcome)
+        else:
+            results[name] = outcome
+    if errors and len(errors) == len(names):
+        raise errors[0]
+    return results
+
+
+def _normalize_keywords(keywords: str) -> list[str]:
+    return sorted({k.strip().lower() for k in keywords.split(",") if k.strip()})
+
+
+def _retrieval_cache_key(
+    ll_keywords: str, hl_keywords: str, query_param: QueryParam, kb_version: int
+) -> str:
+    """Key of the retrieval context of a query in the retrieval context cache
+
+    Made of the mode, the normalized keywords, the retrieval parameters and the knowledge
+    base version, plus the original query in mix mode, whose vector branch searches it.
+    """
+    key_data = {
+        "mode": query_param.mode,
+        "ll_keywords": _normalize_keywords(ll_keywords),
+        "hl_keywords": _normalize_keywords(hl_keywords),
+        "top_k": query_param.top_k,
+        "max_token_for_text_unit": query_param.max_token_for_text_unit,
+        "max_token_for_global_context": query_param.max_token_for_global_context,
+        "max_token_for_local_context": query_param.max_token_for_local_context,
+        "ids": query_param.ids,
+        "original_query": getattr(query_param, "original_query", None)
+        if query_param.mode == "mix"
+        else None,
+        "kb_version": kb_version,
+    }
+    return compute_args_hash(
+        json.dumps(key_data, sort_keys=True, ensure_ascii=False, default=str)
+    )
+
+
 async def _build_query_context(
     ll_keywords: str,
     hl_keywords: str,
@@ -1233,9 +2076,36 @@ async def _build_query_context(
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
     chunks_vdb: BaseVectorStorage = None,  # Add chunks_vdb parameter for mix mode
+    context_cache: RetrievalContextCache | None = None,
+    kb_version: int = 0,
 ):
+    # Queries whose keywords and retrieval parameters are the same share their context
+    cache_key = None
+    if context_cache is not None:
+        cache_key = _retrieval_cache_key(
+            ll_keywords, hl_keywords, query_param, kb_version
+        )
+        context = context_cache.get(cache_key)
+        if context is not None:
+            logger.info(f"Retrieval context cache hit (mode: {query_param.mode})")
+            return context
+
     logger.info(f"Process {os.getpid()} building query context...")
 
+    # Embed the keywords (and the original query in mix mode) of all retrieval branches
+    # up front, the branches search their storages with the precomputed vectors
+    vdb_queries = []
+    if query_param.mode != "global":
+        vdb_queries.append((entities_vdb, ll_keywords))
+    if query_param.mode != "local":
+        vdb_queries.append((relationships_vdb, hl_keywords))
+    if query_param.mode == "mix" and hasattr(query_param, "original_query"):
+        vdb_queries.append((chunks_vdb, query_param.original_query))
+    query_embeddings = await _embed_query_texts(vdb_queries)
+    # Text chunks fetched by one retrieval branch are reused by the others
+    chunk_fetcher = BatchedKVFetcher(text_chunks_db)
+
+    degraded = False
     # Handle local and global modes as before
     if query_param.mode == "local":
         entities_context, relations_context, text_units_context = await _get_node_data(
@@ -1244,6 +2114,8 @@ async def _build_query_context(
             entities_vdb,
             text_chunks_db,
             query_param,
+            query_embeddings.get((entities_vdb.namespace, ll_keywords)),
+            chunk_fetcher,
         )
     elif query_param.mode == "global":
         entities_context, relations_context, text_units_context = await _get_edge_data(
@@ -1252,62 +2124,68 @@ async def _build_query_context(
             relationships_vdb,
             text_chunks_db,
             query_param,
+            query_embeddings.get((relationships_vdb.namespace, hl_keywords)),
+            chunk_fetcher,
         )
     else:  # hybrid or mix mode
-        ll_data = await _get_node_data(
-            ll_keywords,
-            knowledge_graph_inst,
-            entities_vdb,
-            text_chunks_db,
-            query_param,
-        )
-        hl_data = await _get_edge_data(
-            hl_keywords,
-            knowledge_graph_inst,
-            relationships_vdb,
-            text_chunks_db,
-            query_param,
-        )
-
-        (
-            ll_entities_context,
-            ll_relations_context,
-            ll_text_units_context,
-        ) = ll_data
-
-        (
-            hl_entities_context,
-            hl_relations_context,
-            hl_text_units_context,
-        ) = hl_data
-
-        # Initialize vector data with empty lists
-        vector_entities_context, vector_relations_context, vector_text_units_context = (
-            [],
-            [],
-            [],
-        )
-
+        # The retrieval branches are independent, run them concurrently
+        branches = {
+            "local": _get_node_data(
+                ll_keywords,
+                knowledge_graph_inst,
+                entities_vdb,
+                text_chunks_db,
+                query_param,
+                query_embeddings.get((entities_vdb.namespace, ll_keywords)),
+                chunk_fetcher,
+            ),
+            "global": _get_edge_data(
+                hl_keywords,
+                knowledge_graph_inst,
+                relationships_vdb,
+                text_chunks_db,
+                query_param,
+                query_embeddings.get((relationships_vdb.namespace, hl_keywords)),
+                chunk_fetcher,
+            ),
+        }
         # Only get vector data if in mix mode
         if query_param.mode == "mix" and hasattr(query_param, "original_query"):
             # Get tokenizer from text_chunks_db
             tokenizer = text_chunks_db.global_config.get("tokenizer")
 
             # Get vector context in triple format
-            vector_data = await _get_vector_context(
+            branches["vector"] = _get_vector_context(
                 query_param.original_query,  # We need to pass the original query
                 chunks_vdb,
                 query_param,
                 tokenizer,
+                query_embeddings.get(
+                    (chunks_vdb.namespace, query_param.original_query)
+                ),
             )
+        branch_results = await _gather_retrieval_branches(
+            branches, query_param.retrieval_timeout
+        )
+        degraded = len(branch_results) < len(branches)
 
-            # If vector_data is not None, unpack it
-            if vector_data is not None:
-                (
-                    vector_entities_context,
-                    vector_relations_context,
-                    vector_text_units_context,
-                ) = vector_data
+        (
+            ll_entities_context,
+            ll_relations_context,
+            ll_text_units_context,
+        ) = branch_results.get("local") or ([], [], [])
+
+        (
+            hl_entities_context,
+            hl_relations_context,
+            hl_text_units_context,
+        ) = branch_results.get("global") or ([], [], [])
+
+        (
+            vector_entities_context,
+            vector_relations_context,
+            vector_text_units_context,
+        ) = branch_results.get("vector") or ([], [], [])
 
         # Combine and deduplicate the entities, relationships, and sources
         entities_context = process_combine_contexts(
@@ -1353,6 +2231,9 @@ async def _build_query_context(
 ```
 
 """
+    # Contexts missing a failed or timed out retrieval branch are not cached
+    if cache_key is not None and not degraded:
+        context_cache.put(cache_key, result)
     return result
 
 
@@ -1362,15 +2243,15 @@ async def _get_node_data(
     entities_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
+    query_embedding: np.ndarray | None = None,
+    chunk_fetcher: BatchedKVFetcher | None = None,
 ):
     # get similar entities
     logger.info(
         f"Query nodes: {query}, top_k: {query_param.top_k}, cosine: {entities_vdb.cosine_better_than_threshold}"
     )
 
-    results = await entities_vdb.query(
-        query, top_k=query_param.top_k, ids=query_param.ids
-    )
+    results = await _search_vdb(entities_vdb, query, query_embedding, query_param)
     logger.info(f"Vector search found {len(results)} entities")
 
     if not len(results):
@@ -1408,6 +2289,7 @@ async def _get_node_data(
         query_param,
         text_chunks_db,
         knowledge_graph_inst,
+        chunk_fetcher,
     )
     use_relations = await _find_most_related_edges_from_entities(
         node_datas,
@@ -1420,6 +2302,7 @@ async def _get_node_data(
     node_datas = truncate_list_by_token_size(
         node_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
     )
@@ -1428,8 +2311,8 @@ async def _get_node_data(
     )
 
     logger.info(
-        f"Node search: Local query uses {len(node_datas)} entites, {len(use_relations)} relations, {len(use_text_units)} chunks\n" \
-        f"Matched entities: {[x['entity_id'] for x in node_datas]}\n" \
+        f"Node search: Local query uses {len(node_datas)} entites, {len(use_relations)} relations, {len(use_text_units)} chunks\n"
+        f"Matched entities: {[x['entity_id'] for x in node_datas]}\n"
         f"Matched relations: {[x['src_tgt'] for x in use_relations]}"
     )
 
@@ -1496,6 +2379,7 @@ async def _find_most_related_text_unit_from_entities(
     query_param: QueryParam,
     text_chunks_db: BaseKVStorage,
     knowledge_graph_inst: BaseGraphStorage,
+    chunk_fetcher: BatchedKVFetcher | None = None,
 ):
     text_units = [
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
@@ -1540,18 +2424,13 @@ async def _find_most_related_text_unit_from_entities(
                 all_text_units_lookup[c_id] = index
                 tasks.append((c_id, index, this_edges))
 
-    # Process in batches tasks at a time to avoid overwhelming resources
-    batch_size = 5
-    results = []
-
-    for i in range(0, len(tasks), batch_size):
-        batch_tasks = tasks[i : i + batch_size]
-        batch_results = await asyncio.gather(
-            *[text_chunks_db.get_by_id(c_id) for c_id, _, _ in batch_tasks]
-        )
-        results.extend(batch_results)
+    # Fetch all chunks with one get_by_ids call
+    if chunk_fetcher is None:
+        chunk_fetcher = BatchedKVFetcher(text_chunks_db)
+    chunks = await chunk_fetcher.fetch([c_id for c_id, _, _ in tasks])
 
-    for (c_id, index, this_edges), data in zip(tasks, results):
+    for c_id, index, this_edges in tasks:
+        data = chunks.get(c_id)
         all_text_units_lookup[c_id] = {
             "data": data,
             "order": index,
@@ -1584,6 +2463,7 @@ async def _find_most_related_text_unit_from_entities(
     all_text_units = truncate_list_by_token_size(
         all_text_units,
         key=lambda x: x["data"]["content"],
+        count_key=lambda x: x["data"].get("tokens"),
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
     )
@@ -1652,6 +2532,7 @@ async def _find_most_related_edges_from_entities(
     all_edges_data = truncate_list_by_token_size(
         all_edges_data,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
     )
@@ -1669,13 +2550,15 @@ async def _get_edge_data(
     relationships_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
+    query_embedding: np.ndarray | None = None,
+    chunk_fetcher: BatchedKVFetcher | None = None,
 ):
     logger.info(
         f"Query edges: {keywords}, top_k: {query_param.top_k}, cosine: {relationships_vdb.cosine_better_than_threshold}"
     )
 
-    results = await relationships_vdb.query(
-        keywords, top_k=query_param.top_k, ids=query_param.ids
+    results = await _search_vdb(
+        relationships_vdb, keywords, query_embedding, query_param
     )
     logger.info(f"Vector search found {len(results)} edges")
 
@@ -1723,6 +2606,7 @@ async def _get_edge_data(
     edge_datas = truncate_list_by_token_size(
         edge_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
     )
@@ -1737,11 +2621,12 @@ async def _get_edge_data(
             query_param,
             text_chunks_db,
             knowledge_graph_inst,
+            chunk_fetcher,
         ),
     )
     logger.info(
-        f"Edge search: Global query uses {len(use_entities)} entites, {len(edge_datas)} relations, {len(use_text_units)} chunks\n" \
-        f"Matched entities: {[x['entity_id'] for x in use_entities]}\n" \
+        f"Edge search: Global query uses {len(use_entities)} entites, {len(edge_datas)} relations, {len(use_text_units)} chunks\n"
+        f"Matched entities: {[x['entity_id'] for x in use_entities]}\n"
         f"Matched relations: {[(x['src_id'], x['tgt_id']) for x in edge_datas]}"
     )
 
@@ -1842,6 +2727,7 @@ async def _find_most_related_entities_from_relationships(
     node_datas = truncate_list_by_token_size(
         node_datas,
         key=lambda x: x["description"] if x["description"] is not None else "",
+        count_key=lambda x: x.get("description_tokens"),
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
     )
@@ -1857,30 +2743,34 @@ async def _find_related_text_unit_from_relationships(
     query_param: QueryParam,
     text_chunks_db: BaseKVStorage,
     knowledge_graph_inst: BaseGraphStorage,
+    chunk_fetcher: BatchedKVFetcher | None = None,
 ):
     text_units = [
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
         for dp in edge_datas
         if dp["source_id"] is not None
     ]
-    all_text_units_lookup = {}
 
-    async def fetch_chunk_data(c_id, index):
-        if c_id not in all_text_units_lookup:
-            chunk_data = await text_chunks_db.get_by_id(c_id)
-            # Only store valid data
-            if chunk_data is not None and "content" in chunk_data:
-                all_text_units_lookup[c_id] = {
-                    "data": chunk_data,
-                    "order": index,
-                }
-
-    tasks = []
+    # Order of every chunk is the index of the first relation it belongs to
+    chunk_orders = {}
     for index, unit_list in enumerate(text_units):
         for c_id in unit_list:
-            tasks.append(fetch_chunk_data(c_id, index))
+            chunk_orders.setdefault(c_id, index)
 
-    await asyncio.gather(*tasks)
+    # Fetch all chunks with one get_by_ids call
+    if chunk_fetcher is None:
+        chunk_fetcher = BatchedKVFetcher(text_chunks_db)
+    chunks = await chunk_fetcher.fetch(list(chunk_orders))
+
+    all_text_units_lookup = {}
+    for c_id, index in chunk_orders.items():
+        chunk_data = chunks.get(c_id)
+        # Only store valid data
+        if chunk_data is not None and "content" in chunk_data:
+            all_text_units_lookup[c_id] = {
+                "data": chunk_data,
+                "order": index,
+            }
 
     if not all_text_units_lookup:
         logger.warning("No valid text chunks found")
@@ -1902,6 +2792,7 @@ async def _find_related_text_unit_from_relationships(
     truncated_text_units = truncate_list_by_token_size(
         valid_text_units,
         key=lambda x: x["data"]["content"],
+        count_key=lambda x: x["data"].get("tokens"),
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
     )
@@ -1931,9 +2822,20 @@ async def naive_query(
         use_model_func = partial(use_model_func, _priority=5)
 
     # Handle cache
-    args_hash = compute_args_hash(query_param.mode, query, cache_type="query")
+    args_hash = compute_query_cache_hash(
+        query, query_param, global_config, system_prompt
+    )
+    # Similar queries only share answers if everything else about them is the same
+    cache_scope = compute_query_cache_hash(
+        "", query_param, global_config, system_prompt
+    )
     cached_response, quantized, min_val, max_val = await handle_cache(
-        hashing_kv, args_hash, query, query_param.mode, cache_type="query"
+        hashing_kv,
+        args_hash,
+        query,
+        query_param.mode,
+        cache_type="query",
+        cache_scope=cache_scope,
     )
     if cached_response is not None:
         return cached_response
@@ -1946,7 +2848,7 @@ async def naive_query(
 
     if text_units_context is None or len(text_units_context) == 0:
         return PROMPTS["fail_response"]
-    
+
     logger.debug(f"Retrieved chunks: {len(text_units_context)}")
     logger.debug(f"First chunk: {text_units_context[0]}")
 
@@ -2018,6 +2920,7 @@ async def naive_query(
                 max_val=max_val,
                 mode=query_param.mode,
                 cache_type="query",
+                cache_scope=cache_scope,
             ),
         )
 
@@ -2050,9 +2953,16 @@ async def kg_query_with_keywords(
         # Apply higher priority (5) to query relation LLM function
         use_model_func = partial(use_model_func, _priority=5)
 
-    args_hash = compute_args_hash(query_param.mode, query, cache_type="query")
+    args_hash = compute_query_cache_hash(query, query_param, global_config)
+    # Similar queries only share answers if everything else about them is the same
+    cache_scope = compute_query_cache_hash("", query_param, global_config)
     cached_response, quantized, min_val, max_val = await handle_cache(
-        hashing_kv, args_hash, query, query_param.mode, cache_type="query"
+        hashing_kv,
+        args_hash,
+        query,
+        query_param.mode,
+        cache_type="query",
+        cache_scope=cache_scope,
     )
     if cached_response is not None:
         return cached_response
@@ -2082,6 +2992,8 @@ async def kg_query_with_keywords(
         text_chunks_db,
         query_param,
         chunks_vdb=chunks_vdb,
+        context_cache=global_config.get("retrieval_context_cache"),
+        kb_version=global_config.get("kb_version", 0),
     )
     if not context:
         return PROMPTS["fail_response"]
@@ -2141,6 +3053,7 @@ async def kg_query_with_keywords(
                     max_val=max_val,
                     mode=query_param.mode,
                     cache_type="query",
+                    cache_scope=cache_scope,
                 ),
             )
 
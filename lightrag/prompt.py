@@ -9,6 +9,7 @@ PROMPTS["DEFAULT_LANGUAGE"] = "English"
 PROMPTS["DEFAULT_TUPLE_DELIMITER"] = "<|>"
 PROMPTS["DEFAULT_RECORD_DELIMITER"] = "##"
 PROMPTS["DEFAULT_COMPLETION_DELIMITER"] = "<|COMPLETE|>"
+PROMPTS["DEFAULT_CHUNK_DELIMITER"] = "<|CHUNK|>"
 
 #"product (anything produced/sold, e.g. machines, tools, components, substances etc.)"
 PROMPTS["DEFAULT_ENTITY_TYPES"] = [
@@ -226,6 +227,17 @@ Format the content-level key words as ("content_keywords"{tuple_delimiter}<high_
 Add them below using the same format:\n
 """.strip()
 
+PROMPTS["entity_extraction_packed_input"] = """
+The text consists of {chunk_count} independent sections, each starting with a line {chunk_delimiter}<section_number>.
+Extract the entities and relationships of every section separately, as if it were the only text; a relationship may only connect entities of the same section.
+In the output, write {chunk_delimiter}<section_number>{record_delimiter} before the records of each section, also for a section without any entities.
+
+{sections}
+""".strip()
+
+PROMPTS["entity_extraction_packed_reminder"] = """
+Keep writing {chunk_delimiter}<section_number>{record_delimiter} before the records of each section."""
+
 PROMPTS["entity_if_loop_extraction"] = """
 ---Goal---'
 
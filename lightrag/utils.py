@@ -9,11 +9,17 @@ import logging
 import logging.handlers
 import os
 import re
+import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 from functools import wraps
 from hashlib import md5
-from typing import Any, Protocol, Callable, TYPE_CHECKING, List
+from typing import Any, Protocol, Callable, TYPE_CHECKING, Iterable, List
 import xml.etree.ElementTree as ET
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 from lightrag.prompt import PROMPTS
 from dotenv import load_dotenv
@@ -21,6 +27,7 @@ from lightrag.constants import (
     DEFAULT_LOG_MAX_BYTES,
     DEFAULT_LOG_BACKUP_COUNT,
     DEFAULT_LOG_FILENAME,
+    TOKEN_COUNT_CACHE_SIZE,
 )
 
 
@@ -596,6 +603,353 @@ def priority_limit_async_func_call(max_size: int, max_queue_size: int = 1000):
     return final_decro
 
 
+def micro_batch_async_func_call(max_batch_size: int, linger: float):
+    """
+    Coalesce concurrent calls of an embedding function into batched calls
+
+    Calls arriving within `linger` seconds of each other are combined into one call of up
+    to `max_batch_size` texts, and each caller gets the rows of its own texts. Calls are
+    only combined with calls of the same `_priority`, which is passed on to the decorated
+    function, so that a priority_limit_async_func_call below still serves them in priority
+    order. Calls with other arguments or of at least `max_batch_size` texts are passed
+    through unchanged.
+
+    Args:
+        max_batch_size: Maximum number of texts per combined call
+        linger: Seconds a combined call waits for more callers after its first text
+    Returns:
+        Decorator function
+    """
+
+    def final_decro(func):
+        batchers: dict[Any, TokenBudgetBatcher] = {}
+
+        @wraps(func)
+        async def batched_func(texts, *args, _priority=10, **kwargs):
+            if args or kwargs or len(texts) >= max_batch_size:
+                return await func(texts, *args, _priority=_priority, **kwargs)
+
+            async def process_batch(batch: list[list[str]]) -> list[np.ndarray]:
+                embeddings = await func(
+                    [text for texts in batch for text in texts], _priority=_priority
+                )
+                bounds = np.cumsum([0] + [len(texts) for texts in batch])
+                return [embeddings[start:end] for start, end in zip(bounds, bounds[1:])]
+
+            batcher = batchers.get(_priority)
+            if batcher is None:
+                batcher = batchers[_priority] = TokenBudgetBatcher(
+                    max_batch_size, linger
+                )
+            return await batcher.submit(list(texts), len(texts), process_batch)
+
+        return batched_func
+
+    return final_decro
+
+
+class FairTaskScheduler:
+    """
+    Run groups of tasks on a fixed pool of workers with a fair share between groups.
+
+    Each call to `run` submits one group of task factories (e.g. the chunks of one document).
+    Workers take the next task from the pending groups in round-robin order, so every group
+    gets an equal share of the workers regardless of its size, and exactly `max_workers` tasks
+    are in flight as long as enough tasks are pending. A group completes as soon as its last
+    task finishes. If one of its tasks fails, its pending tasks are dropped and the exception
+    is raised to the caller of `run`.
+    """
+
+    def __init__(self, max_workers: int):
+        self._max_workers = max_workers
+        self._groups: deque[dict[str, Any]] = deque()
+        self._pending_tasks = asyncio.Semaphore(0)
+        self._workers: list[asyncio.Task] = []
+
+    async def run(self, task_factories: list[Callable[[], Any]]) -> list[Any]:
+        """Run a group of tasks and return their results in submission order"""
+        if not task_factories:
+            return []
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker()) for _ in range(self._max_workers)
+            ]
+
+        group = {
+            "tasks": deque(enumerate(task_factories)),
+            "results": [None] * len(task_factories),
+            "remaining": len(task_factories),
+            "future": asyncio.get_running_loop().create_future(),
+        }
+        self._groups.append(group)
+        for _ in task_factories:
+            self._pending_tasks.release()
+
+        try:
+            return await group["future"]
+        finally:
+            # Drop tasks still queued if the group failed or the caller was cancelled
+            group["tasks"].clear()
+            if group in self._groups:
+                self._groups.remove(group)
+
+    async def _worker(self):
+        while True:
+            await self._pending_tasks.acquire()
+            if not self._groups:
+                # Tasks of a failed group were dropped
+                continue
+
+            group = self._groups.popleft()
+            if not group["tasks"] or group["future"].done():
+                continue
+            index, task_factory = group["tasks"].popleft()
+            if group["tasks"]:
+                # Move the group to the back of the queue to share workers fairly
+                self._groups.append(group)
+
+            try:
+                result = await task_factory()
+            except Exception as e:
+                if not group["future"].done():
+                    group["future"].set_exception(e)
+                continue
+
+            group["results"][index] = result
+            group["remaining"] -= 1
+            if group["remaining"] == 0 and not group["future"].done():
+                group["future"].set_result(group["results"])
+
+    async def shutdown(self):
+        """Stop all workers"""
+        for worker in self._workers:
+            worker.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+class TokenBudgetBatcher:
+    """
+    Collect small work items of concurrent callers into batches up to a token budget.
+
+    Each call to `submit` adds one item to the open batch. The batch is processed as soon
+    as the next item would exceed the budget, or `linger` seconds after its first item was
+    submitted. The batch processor of the first item processes the whole batch and returns
+    one result per item; every caller gets the result of its own item. If the processor
+    fails, all callers of the batch get the exception.
+    """
+
+    def __init__(self, token_budget: int, linger: float):
+        self._token_budget = token_budget
+        self._linger = linger
+        self._items: list[Any] = []
+        self._futures: list[asyncio.Future] = []
+        self._tokens = 0
+        self._process_batch: Callable[[list[Any]], Any] | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        item: Any,
+        tokens: int,
+        process_batch: Callable[[list[Any]], Any],
+    ) -> Any:
+        """Add an item to the open batch and return its result once the batch is processed"""
+        if self._items and self._tokens + tokens > self._token_budget:
+            self.flush()
+
+        future = asyncio.get_running_loop().create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        self._tokens += tokens
+        if self._process_batch is None:
+            self._process_batch = process_batch
+
+        if self._tokens >= self._token_budget:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._linger, self.flush
+            )
+        return await future
+
+    def flush(self) -> None:
+        """Process the open batch now"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._items:
+            return
+
+        items, futures, process_batch = (
+            self._items,
+            self._futures,
+            self._process_batch,
+        )
+        self._items, self._futures, self._tokens = [], [], 0
+        self._process_batch = None
+
+        task = asyncio.create_task(self._run_batch(items, futures, process_batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_batch(
+        self,
+        items: list[Any],
+        futures: list[asyncio.Future],
+        process_batch: Callable[[list[Any]], Any],
+    ) -> None:
+        try:
+            results = await process_batch(items)
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Callers must not wait forever if the batch was cancelled
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+
+
+class GleaningYieldTracker:
+    """
+    Track the yield of entity extraction gleaning rounds, i.e. new entities and relations per
+    extra LLM call, over a sliding window of the last `window` samples of every round number.
+
+    Gleaning is limited to the rounds that still pay off: the first round whose average yield
+    is below `threshold` is skipped, together with all later rounds. Every `probe_interval`-th
+    extraction runs one round beyond the limit, so that the yield of a skipped round is
+    measured again and gleaning resumes once it becomes productive. A threshold of 0 always
+    allows all rounds.
+    """
+
+    def __init__(self, threshold: float, window: int, probe_interval: int):
+        self._threshold = threshold
+        self._window = window
+        self._probe_interval = probe_interval
+        self._samples: list[deque[tuple[int, int]]] = []
+        self._extractions = 0
+        self._rounds_run = 0
+        self._rounds_skipped = 0
+
+    def _round_yield(self, round_index: int) -> float | None:
+        """Average yield of a round, None until its window is filled"""
+        if round_index >= len(self._samples):
+            return None
+        samples = self._samples[round_index]
+        if len(samples) < self._window:
+            return None
+        return sum(new for new, _ in samples) / max(sum(c for _, c in samples), 1)
+
+    def _rounds_limit(self, max_rounds: int) -> int:
+        limit = 0
+        while limit < max_rounds:
+            round_yield = self._round_yield(limit)
+            if round_yield is not None and round_yield < self._threshold:
+                break
+            limit += 1
+        return limit
+
+    def allowed_rounds(self, max_rounds: int) -> int:
+        """Number of gleaning rounds for the next extraction, at most max_rounds"""
+        if self._threshold <= 0:
+            return max_rounds
+        self._extractions += 1
+        allowed = self._rounds_limit(max_rounds)
+        if allowed < max_rounds and self._extractions % self._probe_interval == 0:
+            allowed += 1
+        self._rounds_skipped += max_rounds - allowed
+        return allowed
+
+    def record(self, round_index: int, new_items: int, llm_calls: int) -> None:
+        """Record the new entities and relations found by a gleaning round and its LLM calls"""
+        while len(self._samples) <= round_index:
+            self._samples.append(deque(maxlen=self._window))
+        self._samples[round_index].append((new_items, llm_calls))
+        self._rounds_run += 1
+
+    def stats(self, max_rounds: int) -> dict[str, Any]:
+        """Gleaning statistics for the pipeline status"""
+        return {
+            "threshold": self._threshold,
+            "max_rounds": max_rounds,
+            "rounds_allowed": (
+                self._rounds_limit(max_rounds) if self._threshold > 0 else max_rounds
+            ),
+            "round_yields": [
+                None if y is None else round(y, 3)
+                for y in (self._round_yield(i) for i in range(max_rounds))
+            ],
+            "rounds_run": self._rounds_run,
+            "rounds_skipped": self._rounds_skipped,
+        }
+
+
+class CpuWorkerPool:
+    """
+    Run CPU-bound functions (chunking, extraction result parsing, file parsing) in worker
+    processes, so that they do not block the event loop serving queries.
+
+    At most `max_workers + max_queue_size` calls are submitted to the process pool at a time,
+    further callers wait for a free slot instead of piling their arguments into the pool queue.
+    The processes are spawned on first use. Functions and arguments that cannot be pickled
+    (e.g. a lambda as chunking_func) run in a thread instead. With `max_workers` 0 the
+    functions are called directly on the event loop. As with any spawned process pool,
+    scripts using it must guard their entry point with `if __name__ == "__main__":`.
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int):
+        self._max_workers = max_workers
+        self._max_submitted = max_workers + max(max_queue_size, 0)
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) in a worker process and return its result"""
+        if self._max_workers <= 0:
+            return func(*args)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_submitted)
+        async with self._slots:
+            # Checked before submitting, so that errors raised by func itself propagate
+            # instead of running it a second time in a thread
+            try:
+                pickle.dumps((func, args))
+            except Exception as e:
+                logger.debug(
+                    f"Running {getattr(func, '__name__', func)} in a thread, "
+                    f"it cannot be sent to a worker process: {e}"
+                )
+            else:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self._max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(
+                        self._executor, func, *args
+                    )
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory), start a new pool for later calls
+                    self._executor = None
+                    raise
+        return await asyncio.to_thread(func, *args)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, they are spawned again on the next call"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
 def wrap_embedding_func_with_attrs(**kwargs):
     """Wrap a function with attributes"""
 
@@ -618,6 +972,113 @@ def write_json(json_obj, file_name):
         json.dump(json_obj, f, indent=2, ensure_ascii=False)
 
 
+class BatchedKVFetcher:
+    """
+    Request-scoped cache of the records of a KV storage, e.g. the text chunks of one query.
+
+    Each `fetch` loads the records that are neither cached nor being loaded by a concurrent
+    fetch with a single get_by_ids call, so callers sharing a fetcher (such as the local and
+    global retrieval branches of a query) never load a record twice.
+    """
+
+    def __init__(self, kv_storage: Any):
+        self._kv_storage = kv_storage
+        self._records: dict[str, asyncio.Future] = {}
+
+    async def fetch(self, ids: list[str]) -> dict[str, dict[str, Any] | None]:
+        """Return the records of ids, None for the ids not found"""
+        ids = list(dict.fromkeys(ids))
+        missing = [id_ for id_ in ids if id_ not in self._records]
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {id_: loop.create_future() for id_ in missing}
+            self._records.update(futures)
+        pending = {id_: self._records[id_] for id_ in ids}
+        if missing:
+            # Concurrent fetches wait for these records too, so the load runs in its own
+            # task that is not cancelled with this fetch (e.g. a timed-out retrieval branch)
+            await asyncio.shield(asyncio.ensure_future(self._load(missing, futures)))
+        return {id_: await future for id_, future in pending.items()}
+
+    async def _load(self, ids: list[str], futures: dict[str, asyncio.Future]) -> None:
+        """Load the records of ids and resolve their futures, failures are set on the futures"""
+        try:
+            records = _map_records_by_id(ids, await self._kv_storage.get_by_ids(ids))
+        except asyncio.CancelledError:
+            for id_, future in futures.items():
+                self._records.pop(id_, None)
+                future.cancel()
+            raise
+        except Exception as e:
+            for id_, future in futures.items():
+                self._records.pop(id_, None)
+                future.set_exception(e)
+                # Concurrent fetches may not be waiting for this record
+                future.exception()
+            return
+        for id_, future in futures.items():
+            future.set_result(records.get(id_))
+
+
+def _map_records_by_id(
+    ids: list[str], records: list[dict[str, Any] | None]
+) -> dict[str, dict[str, Any] | None]:
+    """Map get_by_ids results to their ids
+
+    Database storages return the found records with their id ("id" or Mongo's "_id") in any
+    order, the JSON and Redis storages return one record or None per id in order.
+    """
+    if records and all(
+        record is not None and ("id" in record or "_id" in record) for record in records
+    ):
+        return {record.get("id", record.get("_id")): record for record in records}
+    return dict(zip(ids, records))
+
+
+class RetrievalContextCache:
+    """
+    In-memory LRU cache of the query contexts assembled from the retrieval results.
+
+    Entries expire `ttl` seconds after they were stored (never with a ttl of 0), at most
+    `max_entries` are kept and the least recently used are evicted first. The keys include
+    the knowledge base version, so changes of the knowledge base are never served stale.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> str | None:
+        """Return the cached context of key, None if it is not cached or expired"""
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl > 0 and time.time() - entry[0] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, context: str) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.time(), context)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
 class TokenizerInterface(Protocol):
     """
     Defines the interface for a tokenizer, requiring encode and decode methods.
@@ -672,6 +1133,59 @@ class Tokenizer:
         """
         return self.tokenizer.decode(tokens)
 
+    def encode_with_offsets(self, content: str) -> tuple[List[int], np.ndarray]:
+        """
+        Encodes a string into a list of tokens and the character offset of each token.
+
+        Byte-level tokenizers exposing decode_single_token_bytes (tiktoken) map the token
+        byte lengths onto the UTF-8 encoded content without decoding it. Other tokenizers
+        fall back to the lengths of the individually decoded tokens.
+
+        Args:
+            content: The string to encode.
+
+        Returns:
+            A tuple of the integer tokens and an array of the offsets in content where each token starts.
+        """
+        tokens = self.encode(content)
+        if not tokens:
+            return tokens, np.empty(0, dtype=np.int64)
+
+        token_bytes = getattr(self.tokenizer, "decode_single_token_bytes", None)
+        if token_bytes is not None:
+            token_ids = np.fromiter(tokens, dtype=np.int64, count=len(tokens))
+            lengths = self._token_byte_lengths(token_ids, token_bytes)
+            data = np.frombuffer(content.encode("utf-8"), dtype=np.uint8)
+            if lengths.sum() == len(data):
+                # Character index of every byte, continuation bytes belong to the
+                # character they continue
+                char_index = np.cumsum((data & 0xC0) != 0x80) - 1
+                byte_offsets = np.cumsum(lengths) - lengths
+                return tokens, char_index[byte_offsets]
+
+        lengths = np.fromiter(
+            (len(self.tokenizer.decode([token])) for token in tokens),
+            dtype=np.int64,
+            count=len(tokens),
+        )
+        return tokens, np.minimum(np.cumsum(lengths) - lengths, len(content))
+
+    def _token_byte_lengths(
+        self, token_ids: np.ndarray, token_bytes: Callable[[int], bytes]
+    ) -> np.ndarray:
+        """Look up the byte lengths of tokens, caching them per token id"""
+        table = getattr(self, "_byte_length_table", np.empty(0, dtype=np.int64))
+        if len(table) <= token_ids.max():
+            grown = np.full(int(token_ids.max()) + 1, -1, dtype=np.int64)
+            grown[: len(table)] = table
+            table = self._byte_length_table = grown
+        lengths = table[token_ids]
+        missing = np.unique(token_ids[lengths < 0])
+        if len(missing):
+            table[missing] = [len(token_bytes(token)) for token in missing.tolist()]
+            lengths = table[token_ids]
+        return lengths
+
 
 class TiktokenTokenizer(Tokenizer):
     """
@@ -736,18 +1250,44 @@ def is_float_regex(value: str) -> bool:
     return bool(re.match(r"^[-+]?[0-9]*\.?[0-9]+$", value))
 
 
+_token_count_cache: OrderedDict[tuple[str, int, int], int] = OrderedDict()
+
+
+def count_tokens(text: str, tokenizer: Tokenizer) -> int:
+    """Count the tokens of a text, memoized in a bounded LRU cache keyed by the text hash"""
+    cache_key = (tokenizer.model_name, len(text), hash(text))
+    count = _token_count_cache.get(cache_key)
+    if count is not None:
+        _token_count_cache.move_to_end(cache_key)
+        return count
+    count = len(tokenizer.encode(text))
+    _token_count_cache[cache_key] = count
+    if len(_token_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+        _token_count_cache.popitem(last=False)
+    return count
+
+
 def truncate_list_by_token_size(
     list_data: list[Any],
     key: Callable[[Any], str],
     max_token_size: int,
     tokenizer: Tokenizer,
+    count_key: Callable[[Any], Any] | None = None,
 ) -> list[int]:
-    """Truncate a list of data by token size"""
+    """Truncate a list of data by token size
+
+    count_key returns the token count stored with an item (e.g. description_tokens of graph
+    nodes and edges, tokens of text chunks), items without one are counted by count_tokens.
+    """
     if max_token_size <= 0:
         return []
     tokens = 0
     for i, data in enumerate(list_data):
-        tokens += len(tokenizer.encode(key(data)))
+        stored_count = count_key(data) if count_key is not None else None
+        try:
+            tokens += int(stored_count)
+        except (TypeError, ValueError):
+            tokens += count_tokens(key(data), tokenizer)
         if tokens > max_token_size:
             return list_data[:i]
     return list_data
@@ -849,6 +1389,214 @@ def process_combine_contexts(*context_lists):
     return combined_data
 
 
+class SemanticCacheIndex:
+    """
+    Vector index of the prompt embeddings stored with the LLM response cache entries of a mode.
+
+    The quantized embeddings are decoded once into the rows of a contiguous int8 matrix of
+    normalized vectors with a scale per row, so that `search` finds the most similar cached
+    prompt with vectorized matrix-vector products. The index is loaded once with `sync`
+    and then kept in step with the cache by `add` and `discard`.
+    """
+
+    # Rows multiplied at a time, bounds the float32 copy of the matrix made by a search
+    _SEARCH_BLOCK_ROWS = 1024
+
+    def __init__(self):
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._invalid: set[str] = set()
+        # Row buffers grow geometrically, only their first len(self) rows are used
+        self._matrix: np.ndarray | None = None
+        self._scales = np.empty(0, dtype=np.float32)
+        # Per row: code of its (cache_type, cache_scope) label and creation time
+        self._labels: dict[tuple[str | None, str | None], int] = {}
+        self._label_codes = np.empty(0, dtype=np.int32)
+        self._query_label_codes: set[int] = set()
+        self._created_at = np.empty(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _decode(cache_data: dict[str, Any]) -> np.ndarray | None:
+        embedding_min = cache_data.get("embedding_min")
+        embedding_max = cache_data.get("embedding_max")
+        if (
+            embedding_min is None
+            or embedding_max is None
+            or embedding_min >= embedding_max
+        ):
+            logger.warning(
+                f"Invalid embedding min/max values: min={embedding_min}, max={embedding_max}"
+            )
+            return None
+        quantized = np.frombuffer(
+            bytes.fromhex(cache_data["embedding"]), dtype=np.uint8
+        ).reshape(cache_data["embedding_shape"])
+        embedding = dequantize_embedding(quantized, embedding_min, embedding_max)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else None
+
+    def _label_code(self, cache_type: str | None, cache_scope: str | None) -> int:
+        code = self._labels.setdefault((cache_type, cache_scope), len(self._labels))
+        if cache_type == "query":
+            self._query_label_codes.add(code)
+        return code
+
+    def _reserve(self, dim: int) -> None:
+        """Make room for one more row of dimension dim"""
+        size = len(self._ids)
+        if self._matrix is None:
+            self._matrix = np.empty((0, dim), dtype=np.int8)
+        capacity = self._matrix.shape[0]
+        if size < capacity:
+            return
+        capacity = max(2 * capacity, 16)
+
+        def grow(buffer: np.ndarray) -> np.ndarray:
+            grown = np.empty((capacity, *buffer.shape[1:]), dtype=buffer.dtype)
+            grown[:size] = buffer[:size]
+            return grown
+
+        self._matrix = grow(self._matrix)
+        self._scales = grow(self._scales)
+        self._label_codes = grow(self._label_codes)
+        self._created_at = grow(self._created_at)
+
+    def discard(self, cache_ids: Iterable[str]) -> None:
+        """Drop the rows of cache entries, e.g. removed or overwritten entries"""
+        cache_ids = set(cache_ids)
+        self._invalid -= cache_ids
+        if not cache_ids & self._rows.keys():
+            return
+        keep = [
+            row for row, cache_id in enumerate(self._ids) if cache_id not in cache_ids
+        ]
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {cache_id: row for row, cache_id in enumerate(self._ids)}
+        size = len(keep)
+        self._matrix[:size] = self._matrix[keep]
+        self._scales[:size] = self._scales[keep]
+        self._label_codes[:size] = self._label_codes[keep]
+        self._created_at[:size] = self._created_at[keep]
+
+    def add(self, entries: dict[str, Any]) -> None:
+        """Index new or overwritten cache entries, entries without a valid embedding are skipped"""
+        self.discard(entries.keys())
+        for cache_id, cache_data in entries.items():
+            vector = None
+            if isinstance(cache_data, dict) and cache_data.get("embedding") is not None:
+                try:
+                    vector = self._decode(cache_data)
+                except Exception as e:
+                    logger.warning(f"Error processing cached embedding: {str(e)}")
+            dim = self._matrix.shape[1] if self._matrix is not None else None
+            if vector is None or (dim is not None and vector.shape[0] != dim):
+                self._invalid.add(cache_id)
+                continue
+
+            self._reserve(vector.shape[0])
+            row = len(self._ids)
+            scale = float(np.abs(vector).max()) / 127
+            self._matrix[row] = np.round(vector / scale).astype(np.int8)
+            self._scales[row] = scale
+            self._label_codes[row] = self._label_code(
+                cache_data.get("cache_type"), cache_data.get("cache_scope")
+            )
+            self._created_at[row] = cache_data.get("created_at") or 0
+            self._rows[cache_id] = row
+            self._ids.append(cache_id)
+
+    def sync(self, mode_cache: dict[str, Any]) -> None:
+        """Add the rows of new cache entries and drop the rows of removed ones
+
+        Linear in the size of the cache, meant for loading the index.
+        """
+        self.discard(self._rows.keys() - mode_cache.keys())
+        self._invalid &= mode_cache.keys()
+        self.add(
+            {
+                cache_id: mode_cache[cache_id]
+                for cache_id in mode_cache.keys() - self._rows.keys() - self._invalid
+            }
+        )
+
+    def search(
+        self,
+        embedding: np.ndarray,
+        cache_type: str | None = None,
+        cache_scope: str | None = None,
+        ttl: float = 0,
+    ) -> tuple[str, float] | None:
+        """Most similar entry of the cache type (any if None) and scope
+
+        Query entries older than ttl seconds are skipped, unless ttl is 0.
+
+        Returns:
+            (cache_id, cosine similarity) of the best entry, or None
+        """
+        codes = [
+            code
+            for (label_type, label_scope), code in self._labels.items()
+            if label_scope == cache_scope
+            and (not cache_type or label_type == cache_type)
+        ]
+        if not self._ids or not codes:
+            return None
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if not norm or embedding.shape[0] != self._matrix.shape[1]:
+            return None
+
+        size = len(self._ids)
+        label_codes = self._label_codes[:size]
+        mask = np.isin(label_codes, codes)
+        if ttl > 0 and self._query_label_codes:
+            mask &= ~(
+                np.isin(label_codes, list(self._query_label_codes))
+                & (self._created_at[:size] < time.time() - ttl)
+            )
+        if not mask.any():
+            return None
+
+        query = embedding / norm
+        similarities = np.empty(size, dtype=np.float32)
+        for start in range(0, size, self._SEARCH_BLOCK_ROWS):
+            block = self._matrix[start : min(start + self._SEARCH_BLOCK_ROWS, size)]
+            similarities[start : start + len(block)] = block.astype(np.float32) @ query
+        similarities *= self._scales[:size]
+        similarities[~mask] = -np.inf
+        best_row = int(np.argmax(similarities))
+        return self._ids[best_row], float(similarities[best_row])
+
+
+# Vector indexes of the cached prompt embeddings per (working dir, cache namespace, mode),
+# loaded once per process and then updated by save_to_cache and the query cache eviction
+_semantic_cache_indexes: dict[tuple[str, str, str], SemanticCacheIndex] = {}
+
+
+def _semantic_cache_index_key(hashing_kv, mode: str) -> tuple[str, str, str]:
+    return (hashing_kv.global_config.get("working_dir", ""), hashing_kv.namespace, mode)
+
+
+async def _load_semantic_cache_index(
+    hashing_kv, mode: str
+) -> SemanticCacheIndex | None:
+    """Semantic index of the cache entries of a mode, None if the storage cannot list them"""
+    key = _semantic_cache_index_key(hashing_kv, mode)
+    index = _semantic_cache_indexes.get(key)
+    if index is None:
+        try:
+            mode_cache = await hashing_kv.get_by_mode(mode)
+        except NotImplementedError:
+            return None
+        index = SemanticCacheIndex()
+        index.sync(mode_cache)
+        index = _semantic_cache_indexes.setdefault(key, index)
+    return index
+
+
 async def get_best_cached_response(
     hashing_kv,
     current_embedding,
@@ -858,120 +1606,82 @@ async def get_best_cached_response(
     llm_func=None,
     original_prompt=None,
     cache_type=None,
+    cache_scope=None,
 ) -> str | None:
     logger.debug(
         f"get_best_cached_response:  mode={mode} cache_type={cache_type} use_llm_check={use_llm_check}"
     )
-    mode_cache = await hashing_kv.get_by_id(mode)
-    if not mode_cache:
+    index = await _load_semantic_cache_index(hashing_kv, mode)
+    if index is None:
         return None
 
-    best_similarity = -1
-    best_response = None
-    best_prompt = None
-    best_cache_id = None
-
-    # Only iterate through cache entries for this mode
-    for cache_id, cache_data in mode_cache.items():
-        # Skip if cache_type doesn't match
-        if cache_type and cache_data.get("cache_type") != cache_type:
-            continue
-
-        # Check if cache data is valid
-        if cache_data["embedding"] is None:
-            continue
+    ttl = hashing_kv.global_config.get("query_cache_ttl") or 0
+    while True:
+        best_match = index.search(current_embedding, cache_type, cache_scope, ttl)
+        if best_match is None or best_match[1] <= similarity_threshold:
+            return None
+        best_cache_id, best_similarity = best_match
+        best_entry = (
+            await hashing_kv.get_by_mode_and_id(mode, best_cache_id) or {}
+        ).get(best_cache_id)
+        if best_entry is not None:
+            break
+        # Removed by another process or by clearing the cache since it was indexed
+        index.discard({best_cache_id})
+    best_response = best_entry["return"]
+    best_prompt = best_entry["original_prompt"]
+
+    # If LLM check is enabled and all required parameters are provided
+    if (
+        use_llm_check
+        and llm_func
+        and original_prompt
+        and best_prompt
+        and best_response is not None
+    ):
+        compare_prompt = PROMPTS["similarity_check"].format(
+            original_prompt=original_prompt, cached_prompt=best_prompt
+        )
 
         try:
-            # Safely convert cached embedding
-            cached_quantized = np.frombuffer(
-                bytes.fromhex(cache_data["embedding"]), dtype=np.uint8
-            ).reshape(cache_data["embedding_shape"])
-
-            # Ensure min_val and max_val are valid float values
-            embedding_min = cache_data.get("embedding_min")
-            embedding_max = cache_data.get("embedding_max")
-
-            if (
-                embedding_min is None
-                or embedding_max is None
-                or embedding_min >= embedding_max
-            ):
-                logger.warning(
-                    f"Invalid embedding min/max values: min={embedding_min}, max={embedding_max}"
-                )
-                continue
-
-            cached_embedding = dequantize_embedding(
-                cached_quantized,
-                embedding_min,
-                embedding_max,
-            )
-        except Exception as e:
-            logger.warning(f"Error processing cached embedding: {str(e)}")
-            continue
-
-        similarity = cosine_similarity(current_embedding, cached_embedding)
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_response = cache_data["return"]
-            best_prompt = cache_data["original_prompt"]
-            best_cache_id = cache_id
-
-    if best_similarity > similarity_threshold:
-        # If LLM check is enabled and all required parameters are provided
-        if (
-            use_llm_check
-            and llm_func
-            and original_prompt
-            and best_prompt
-            and best_response is not None
-        ):
-            compare_prompt = PROMPTS["similarity_check"].format(
-                original_prompt=original_prompt, cached_prompt=best_prompt
-            )
-
-            try:
-                llm_result = await llm_func(compare_prompt)
-                llm_result = llm_result.strip()
-                llm_similarity = float(llm_result)
-
-                # Replace vector similarity with LLM similarity score
-                best_similarity = llm_similarity
-                if best_similarity < similarity_threshold:
-                    log_data = {
-                        "event": "cache_rejected_by_llm",
-                        "type": cache_type,
-                        "mode": mode,
-                        "original_question": original_prompt[:100] + "..."
-                        if len(original_prompt) > 100
-                        else original_prompt,
-                        "cached_question": best_prompt[:100] + "..."
-                        if len(best_prompt) > 100
-                        else best_prompt,
-                        "similarity_score": round(best_similarity, 4),
-                        "threshold": similarity_threshold,
-                    }
-                    logger.debug(json.dumps(log_data, ensure_ascii=False))
-                    logger.info(f"Cache rejected by LLM(mode:{mode} tpye:{cache_type})")
-                    return None
-            except Exception as e:  # Catch all possible exceptions
-                logger.warning(f"LLM similarity check failed: {e}")
-                return None  # Return None directly when LLM check fails
-
-        prompt_display = (
-            best_prompt[:50] + "..." if len(best_prompt) > 50 else best_prompt
-        )
-        log_data = {
-            "event": "cache_hit",
-            "type": cache_type,
-            "mode": mode,
-            "similarity": round(best_similarity, 4),
-            "cache_id": best_cache_id,
-            "original_prompt": prompt_display,
-        }
-        logger.debug(json.dumps(log_data, ensure_ascii=False))
-        return best_response
-    return None
+            llm_result = await llm_func(compare_prompt)
+            llm_result = llm_result.strip()
+            llm_similarity = float(llm_result)
+
+            # Replace vector similarity with LLM similarity score
+            best_similarity = llm_similarity
+            if best_similarity < similarity_threshold:
+                log_data = {
+                    "event": "cache_rejected_by_llm",
+                    "type": cache_type,
+                    "mode": mode,
+                    "original_question": original_prompt[:100] + "..."
+                    if len(original_prompt) > 100
+                    else original_prompt,
+                    "cached_question": best_prompt[:100] + "..."
+                    if len(best_prompt) > 100
+                    else best_prompt,
+                    "similarity_score": round(best_similarity, 4),
+                    "threshold": similarity_threshold,
+                }
+                logger.debug(json.dumps(log_data, ensure_ascii=False))
+                logger.info(f"Cache rejected by LLM(mode:{mode} tpye:{cache_type})")
+                return None
+        except Exception as e:  # Catch all possible exceptions
+            logger.warning(f"LLM similarity check failed: {e}")
+            return None  # Return None directly when LLM check fails
+
+    prompt_display = best_prompt[:50] + "..." if len(best_prompt) > 50 else best_prompt
+    log_data = {
+        "event": "cache_hit",
+        "type": cache_type,
+        "mode": mode,
+        "similarity": round(best_similarity, 4),
+        "cache_id": best_cache_id,
+        "original_prompt": prompt_display,
+    }
+    logger.debug(json.dumps(log_data, ensure_ascii=False))
+    return best_response
 
 
 def cosine_similarity(v1, v2):
@@ -1016,14 +1726,63 @@ def dequantize_embedding(
     return (quantized * scale + min_val).astype(np.float32)
 
 
+def make_cache_key(mode: str, args_hash: str) -> str:
+    """Flat key of an LLM response cache entry"""
+    return f"{mode}:{args_hash}"
+
+
+def parse_cache_key(cache_key: str) -> tuple[str, str] | None:
+    """Split a flat LLM response cache key into (mode, args_hash), None for other keys"""
+    mode, sep, args_hash = cache_key.partition(":")
+    return (mode, args_hash) if sep else None
+
+
+def flatten_cache_data(data: dict[str, Any]) -> dict[str, Any] | None:
+    """Convert LLM response cache data holding one dict of entries per mode to flat keys
+
+    Returns:
+        The data with every entry under its make_cache_key key, or None if the data
+        has no entries of the nested layout
+    """
+    nested_modes = [
+        key
+        for key, value in data.items()
+        if parse_cache_key(key) is None
+        and isinstance(value, dict)
+        and all(isinstance(entry, dict) for entry in value.values())
+    ]
+    if not nested_modes:
+        return None
+    flat_data = {key: value for key, value in data.items() if key not in nested_modes}
+    for mode in nested_modes:
+        for args_hash, entry in data[mode].items():
+            flat_data[make_cache_key(mode, args_hash)] = entry
+    return flat_data
+
+
+def _query_cache_expired(hashing_kv, entry: dict[str, Any]) -> bool:
+    """Whether a query cache entry is older than the configured query_cache_ttl"""
+    ttl = hashing_kv.global_config.get("query_cache_ttl") or 0
+    if ttl <= 0 or entry.get("cache_type") != "query":
+        return False
+    return time.time() - (entry.get("created_at") or 0) > ttl
+
+
 async def handle_cache(
     hashing_kv,
     args_hash,
     prompt,
     mode="default",
     cache_type=None,
+    cache_scope=None,
 ):
-    """Generic cache handling function"""
+    """Generic cache handling function
+
+    Looks up the exact args_hash first. When embedding_cache_config is enabled, query
+    prompts (any mode but "default") missing it are matched against the embeddings of
+    the cached prompts of the same cache_scope, and the quantized prompt embedding is
+    returned with a miss so that the caller stores it with the new answer.
+    """
     if hashing_kv is None:
         return None, None, None, None
 
@@ -1034,16 +1793,51 @@ async def handle_cache(
         if not hashing_kv.global_config.get("enable_llm_cache_for_entity_extract"):
             return None, None, None, None
 
-    if exists_func(hashing_kv, "get_by_mode_and_id"):
-        mode_cache = await hashing_kv.get_by_mode_and_id(mode, args_hash) or {}
-    else:
-        mode_cache = await hashing_kv.get_by_id(mode) or {}
-    if args_hash in mode_cache:
+    entry = (await hashing_kv.get_by_mode_and_id(mode, args_hash) or {}).get(args_hash)
+    if entry is not None and not _query_cache_expired(hashing_kv, entry):
         logger.debug(f"Non-embedding cached hit(mode:{mode} type:{cache_type})")
-        return mode_cache[args_hash]["return"], None, None, None
+        return entry["return"], None, None, None
 
-    logger.debug(f"Non-embedding cached missed(mode:{mode} type:{cache_type})")
-    return None, None, None, None
+    embedding_cache_config = (
+        hashing_kv.global_config.get("embedding_cache_config") or {}
+    )
+    if (
+        mode == "default"
+        or not embedding_cache_config.get("enabled")
+        or hashing_kv.embedding_func is None
+    ):
+        logger.debug(f"Non-embedding cached missed(mode:{mode} type:{cache_type})")
+        return None, None, None, None
+    # Storages that cannot list their cache entries never return embeddings to match,
+    # the prompt is not embedded for them
+    if await _load_semantic_cache_index(hashing_kv, mode) is None:
+        logger.debug(
+            f"{type(hashing_kv).__name__} cannot list cache entries, embedding cache skipped"
+        )
+        return None, None, None, None
+
+    current_embedding = (await hashing_kv.embedding_func([prompt], _priority=5))[0]
+    quantized, min_val, max_val = quantize_embedding(current_embedding)
+    use_llm_check = embedding_cache_config.get("use_llm_check", False)
+    best_cached_response = await get_best_cached_response(
+        hashing_kv,
+        current_embedding,
+        similarity_threshold=embedding_cache_config.get("similarity_threshold", 0.95),
+        mode=mode,
+        use_llm_check=use_llm_check,
+        llm_func=hashing_kv.global_config.get("llm_model_func")
+        if use_llm_check
+        else None,
+        original_prompt=prompt,
+        cache_type=cache_type,
+        cache_scope=cache_scope,
+    )
+    if best_cached_response is not None:
+        logger.debug(f"Embedding cached hit(mode:{mode} type:{cache_type})")
+        return best_cached_response, None, None, None
+
+    logger.debug(f"Embedding cached missed(mode:{mode} type:{cache_type})")
+    return None, quantized, float(min_val), float(max_val)
 
 
 @dataclass
@@ -1056,6 +1850,7 @@ class CacheData:
     max_val: float | None = None
     mode: str = "default"
     cache_type: str = "query"
+    cache_scope: str | None = None
 
 
 async def save_to_cache(hashing_kv, cache_data: CacheData):
@@ -1074,26 +1869,21 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
         logger.debug("Streaming response detected, skipping cache")
         return
 
-    # Get existing cache data
-    if exists_func(hashing_kv, "get_by_mode_and_id"):
-        mode_cache = (
-            await hashing_kv.get_by_mode_and_id(cache_data.mode, cache_data.args_hash)
-            or {}
-        )
-    else:
-        mode_cache = await hashing_kv.get_by_id(cache_data.mode) or {}
-
     # Check if we already have identical content cached
-    if cache_data.args_hash in mode_cache:
-        existing_content = mode_cache[cache_data.args_hash].get("return")
-        if existing_content == cache_data.content:
+    existing = (
+        await hashing_kv.get_by_mode_and_id(cache_data.mode, cache_data.args_hash) or {}
+    ).get(cache_data.args_hash)
+    if existing is not None:
+        if existing.get("return") == cache_data.content and not _query_cache_expired(
+            hashing_kv, existing
+        ):
             logger.info(
                 f"Cache content unchanged for {cache_data.args_hash}, skipping update"
             )
             return
 
     # Update cache with new content
-    mode_cache[cache_data.args_hash] = {
+    entry = {
         "return": cache_data.content,
         "cache_type": cache_data.cache_type,
         "embedding": cache_data.quantized.tobytes().hex()
@@ -1105,12 +1895,66 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
         "embedding_min": cache_data.min_val,
         "embedding_max": cache_data.max_val,
         "original_prompt": cache_data.prompt,
+        "cache_scope": cache_data.cache_scope,
+        "created_at": int(time.time()),
     }
 
     logger.info(f" == LLM cache == saving {cache_data.mode}: {cache_data.args_hash}")
 
     # Only upsert if there's actual new content
-    await hashing_kv.upsert({cache_data.mode: mode_cache})
+    await hashing_kv.upsert(
+        {make_cache_key(cache_data.mode, cache_data.args_hash): entry}
+    )
+
+    # Keep the loaded semantic index in step, an overwritten entry gets its new creation time
+    semantic_index = _semantic_cache_indexes.get(
+        _semantic_cache_index_key(hashing_kv, cache_data.mode)
+    )
+    if semantic_index is not None:
+        semantic_index.add({cache_data.args_hash: entry})
+
+    if cache_data.cache_type == "query":
+        await _evict_query_cache(hashing_kv, cache_data.mode)
+
+
+async def _evict_query_cache(hashing_kv, mode: str) -> None:
+    """Evict the oldest query answers of a mode beyond query_cache_max_entries
+
+    Listing the entries of a mode is linear, so it is only done after every tenth of
+    max_entries saves of the mode; the cache can exceed max_entries by that much.
+    """
+    max_entries = hashing_kv.global_config.get("query_cache_max_entries") or 0
+    if max_entries <= 0:
+        return
+    saves = getattr(hashing_kv, "_query_cache_saves", None)
+    if saves is None:
+        saves = {}
+        hashing_kv._query_cache_saves = saves
+    saves[mode] = saves.get(mode, 0) + 1
+    if saves[mode] < max(max_entries // 10, 1):
+        return
+    saves[mode] = 0
+
+    try:
+        mode_cache = await hashing_kv.get_by_mode(mode)
+    except NotImplementedError:
+        return
+    query_hashes = [
+        args_hash
+        for args_hash, entry in mode_cache.items()
+        if isinstance(entry, dict) and entry.get("cache_type") == "query"
+    ]
+    if len(query_hashes) > max_entries:
+        query_hashes.sort(key=lambda key: mode_cache[key].get("created_at") or 0)
+        evicted = query_hashes[: len(query_hashes) - max_entries]
+        await hashing_kv.delete(
+            [make_cache_key(mode, args_hash) for args_hash in evicted]
+        )
+        semantic_index = _semantic_cache_indexes.get(
+            _semantic_cache_index_key(hashing_kv, mode)
+        )
+        if semantic_index is not None:
+            semantic_index.discard(evicted)
 
 
 def safe_unicode_decode(content):
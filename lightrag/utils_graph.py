@@ -3,12 +3,23 @@ from __future__ import annotations
 import asyncio
 from typing import Any, cast
 
-from .kg.shared_storage import get_graph_db_lock
+from .kg.shared_storage import get_graph_db_keyed_lock
 from .prompt import GRAPH_FIELD_SEP
-from .utils import compute_mdhash_id, logger
+from .utils import TiktokenTokenizer, Tokenizer, compute_mdhash_id, count_tokens, logger
 from .base import StorageNameSpace
 
 
+def _set_description_tokens(data: dict[str, Any], tokenizer: Tokenizer | None) -> None:
+    """Store the token count of the description of a node or edge
+
+    The graph storages only add or overwrite attributes, so the count of a changed
+    description must be written, removing it would keep the old count stored.
+    """
+    if tokenizer is None:
+        tokenizer = TiktokenTokenizer()
+    data["description_tokens"] = count_tokens(data.get("description", ""), tokenizer)
+
+
 async def adelete_by_entity(
     chunk_entity_relation_graph, entities_vdb, relationships_vdb, entity_name: str
 ) -> None:
@@ -20,8 +31,8 @@ async def adelete_by_entity(
         relationships_vdb: Vector database storage for relationships
         entity_name: Name of the entity to delete
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
+    graph_db_lock = get_graph_db_keyed_lock([entity_name], enable_logging=False)
+    # Lock the stripes of the affected entities to ensure atomic graph and vector db operations
     async with graph_db_lock:
         try:
             await entities_vdb.delete_entity(entity_name)
@@ -68,8 +79,10 @@ async def adelete_by_relation(
         source_entity: Name of the source entity
         target_entity: Name of the target entity
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
+    graph_db_lock = get_graph_db_keyed_lock(
+        [source_entity, target_entity], enable_logging=False
+    )
+    # Lock the stripes of the affected entities to ensure atomic graph and vector db operations
     async with graph_db_lock:
         try:
             # Check if the relation exists
@@ -123,6 +136,7 @@ async def aedit_entity(
     entity_name: str,
     updated_data: dict[str, str],
     allow_rename: bool = True,
+    tokenizer: Tokenizer | None = None,
 ) -> dict[str, Any]:
     """Asynchronously edit entity information.
 
@@ -135,12 +149,16 @@ async def aedit_entity(
         entity_name: Name of the entity to edit
         updated_data: Dictionary containing updated attributes, e.g. {"description": "new description", "entity_type": "new type"}
         allow_rename: Whether to allow entity renaming, defaults to True
+        tokenizer: Tokenizer counting the description tokens, the default TiktokenTokenizer if None
 
     Returns:
         Dictionary containing updated entity information
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
+    graph_db_lock = get_graph_db_keyed_lock(
+        [entity_name, updated_data.get("entity_name", entity_name)],
+        enable_logging=False,
+    )
+    # Lock the stripes of the affected entities to ensure atomic graph and vector db operations
     async with graph_db_lock:
         try:
             # 1. Get current entity information
@@ -171,6 +189,8 @@ async def aedit_entity(
             # 2. Update entity information in the graph
             new_node_data = {**node_data, **updated_data}
             new_node_data["entity_id"] = new_entity_name
+            if "description" in updated_data:
+                _set_description_tokens(new_node_data, tokenizer)
 
             if "entity_name" in new_node_data:
                 del new_node_data[
@@ -335,6 +355,7 @@ async def aedit_relation(
     source_entity: str,
     target_entity: str,
     updated_data: dict[str, Any],
+    tokenizer: Tokenizer | None = None,
 ) -> dict[str, Any]:
     """Asynchronously edit relation information.
 
@@ -347,12 +368,15 @@ async def aedit_relation(
         source_entity: Name of the source entity
         target_entity: Name of the target entity
         updated_data: Dictionary containing updated attributes, e.g. {"description": "new description", "keywords": "new keywords"}
+        tokenizer: Tokenizer counting the description tokens, the default TiktokenTokenizer if None
 
     Returns:
         Dictionary containing updated relation information
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
+    graph_db_lock = get_graph_db_keyed_lock(
+        [source_entity, target_entity], enable_logging=False
+    )
+    # Lock the stripes of the affected entities to ensure atomic graph and vector db operations
     async with graph_db_lock:
         try:
             # 1. Get current relation information
@@ -377,6 +401,8 @@ async def aedit_relation(
 
             # 2. Update relation information in the graph
             new_edge_data = {**edge_data, **updated_data}
+            if "description" in updated_data:
+                _set_description_tokens(new_edge_data, tokenizer)
             await chunk_entity_relation_graph.upsert_edge(
                 source_entity, target_entity, new_edge_data
             )
@@ -450,6 +476,7 @@ async def acreate_entity(
     relationships_vdb,
     entity_name: str,
     entity_data: dict[str, Any],
+    tokenizer: Tokenizer | None = None,
 ) -> dict[str, Any]:
     """Asynchronously create a new entity.
 
@@ -461,12 +488,13 @@ async def acreate_entity(
         relationships_vdb: Vector database storage for relationships
         entity_name: Name of the new entity
         entity_data: Dictionary containing entity attributes, e.g. {"description": "description", "entity_type": "type"}
+        tokenizer: Tokenizer counting the description tokens, the default TiktokenTokenizer if None
 
     Returns:
         Dictionary containing created entity information
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
+    graph_db_lock = get_graph_db_keyed_lock([entity_name], enable_logging=False)
+    # Lock the stripes of the affected entities to ensure atomic graph and vector db operations
     async with graph_db_lock:
         try:
             # Check if entity already exists
@@ -481,6 +509,7 @@ async def acreate_entity(
                 "description": entity_data.get("description", ""),
                 "source_id": entity_data.get("source_id", "manual"),
             }
+            _set_description_tokens(node_data, tokenizer)
 
             # Add entity to knowledge graph
             await chunk_entity_relation_graph.upsert_node(entity_name, node_data)
@@ -533,6 +562,7 @@ async def acreate_relation(
     source_entity: str,
     target_entity: str,
     relation_data: dict[str, Any],
+    tokenizer: Tokenizer | None = None,
 ) -> dict[str, Any]:
     """Asynchronously create a new relation between entities.
 
@@ -545,12 +575,15 @@ async def acreate_relation(
         source_entity: Name of the source entity
         target_entity: Name of the target entity
         relation_data: Dictionary containing relation attributes, e.g. {"description": "description", "keywords": "keywords"}
+        tokenizer: Tokenizer counting the description tokens, the default TiktokenTokenizer if None
 
     Returns:
         Dictionary containing created relation information
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
+    graph_db_lock = get_graph_db_keyed_lock(
+        [source_entity, target_entity], enable_logging=False
+    )
+    # Lock the stripes of the affected entities to ensure atomic graph and vector db operations
     async with graph_db_lock:
         try:
             # Check if both entities exist
@@ -578,6 +611,7 @@ async def acreate_relation(
                 "source_id": relation_data.get("source_id", "manual"),
                 "weight": float(relation_data.get("weight", 1.0)),
             }
+            _set_description_tokens(edge_data, tokenizer)
 
             # Add relation to knowledge graph
             await chunk_entity_relation_graph.upsert_edge(
@@ -643,6 +677,7 @@ async def amerge_entities(
     target_entity: str,
     merge_strategy: dict[str, str] = None,
     target_entity_data: dict[str, Any] = None,
+    tokenizer: Tokenizer | None = None,
 ) -> dict[str, Any]:
     """Asynchronously merge multiple entities into one entity.
 
@@ -663,12 +698,15 @@ async def amerge_entities(
             - "join_unique": Join all unique values (for fields separated by delimiter)
         target_entity_data: Dictionary of specific values to set for the target entity,
             overriding any merged values, e.g. {"description": "custom description", "entity_type": "PERSON"}
+        tokenizer: Tokenizer counting the description tokens, the default TiktokenTokenizer if None
 
     Returns:
         Dictionary containing the merged entity information
     """
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    # Use graph database lock to ensure atomic graph and vector db operations
+    graph_db_lock = get_graph_db_keyed_lock(
+        [*source_entities, target_entity], enable_logging=False
+    )
+    # Lock the stripes of the affected entities to ensure atomic graph and vector db operations
     async with graph_db_lock:
         try:
             # Default merge strategy
@@ -717,6 +755,7 @@ async def amerge_entities(
             # Apply any explicitly provided target entity data (overrides merged data)
             for key, value in target_entity_data.items():
                 merged_entity_data[key] = value
+            _set_description_tokens(merged_entity_data, tokenizer)
 
             # 4. Get all relationships of the source entities
             all_relations = []
@@ -776,6 +815,7 @@ async def amerge_entities(
                             "weight": "max",
                         },
                     )
+                    _set_description_tokens(merged_relation, tokenizer)
                     relation_updates[relation_key]["data"] = merged_relation
                     logger.info(
                         f"Merged duplicate relationship: {new_src} -> {new_tgt}"
@@ -907,6 +947,9 @@ def _merge_entity_attributes(
     for data in entity_data_list:
         all_keys.update(data.keys())
 
+    # Token counts of the merged descriptions are not valid for the merged description
+    all_keys.discard("description_tokens")
+
     # Merge values for each key
     for key in all_keys:
         # Get all values for this key
@@ -957,6 +1000,9 @@ def _merge_relation_attributes(
     for data in relation_data_list:
         all_keys.update(data.keys())
 
+    # Token counts of the merged descriptions are not valid for the merged description
+    all_keys.discard("description_tokens")
+
     # Merge values for each key
     for key in all_keys:
         # Get all values for this key
@@ -0,0 +1,272 @@
+"""
+Tests of LightRAG.aupdate_document: only the chunks added by the new content are extracted,
+the removed chunks are retracted from the chunk, graph and status storages.
+"""
+
+import asyncio
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag import LightRAG
+from lightrag.base import DocStatus
+from lightrag.kg.networkx_impl import NetworkXStorage
+from lightrag.kg.shared_storage import (
+    finalize_share_data,
+    get_namespace_data,
+    initialize_pipeline_status,
+)
+from lightrag.utils import EmbeddingFunc, Tokenizer, compute_mdhash_id
+
+PARAGRAPHS = [
+    "Alice met Bob in Paris.",
+    "Carol works with Dave.",
+    "Mona sings with Nina.",
+    "Eve likes Frank.",
+]
+
+
+class _CharTokenizer:
+    def encode(self, content):
+        return [ord(c) for c in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+def _extraction(text):
+    names = list(dict.fromkeys(re.findall(r"\b([A-Z][a-z]+)\b", text)))[:2]
+    records = [
+        f'("entity"<|>"{name}"<|>"person"<|>"{name} is a person")' for name in names
+    ]
+    if len(names) == 2:
+        records.append(
+            f'("relationship"<|>"{names[0]}"<|>"{names[1]}"<|>"knows"<|>"friends"<|>1)'
+        )
+    return "##".join(records) + "<|COMPLETE|>"
+
+
+async def _embed(texts):
+    return np.array([[len(text) % 7 + 1.0, 1.0, 2.0, 3.0] for text in texts])
+
+
+@pytest.fixture
+def rag_factory(tmp_path, monkeypatch):
+    async def upsert_document(self, doc_id, doc_data):
+        pass
+
+    # The document nodes are only written by the Neo4j storage
+    monkeypatch.setattr(NetworkXStorage, "upsert_document", upsert_document)
+    extracted = []
+
+    async def llm(prompt, system_prompt=None, history_messages=[], **kwargs):
+        if "---Real Data---" in prompt:
+            text = prompt.split("---Real Data---")[-1].split("Text:")[-1]
+            extracted.append(text)
+            return _extraction(text.split("######################")[0])
+        return "summary"
+
+    async def create():
+        rag = LightRAG(
+            working_dir=str(tmp_path),
+            llm_model_func=llm,
+            embedding_func=EmbeddingFunc(
+                embedding_dim=4, max_token_size=8192, func=_embed
+            ),
+            tokenizer=Tokenizer("char", _CharTokenizer()),
+            chunk_token_size=200,
+            chunk_overlap_token_size=0,
+            entity_extract_max_gleaning=0,
+            max_cpu_workers=0,
+        )
+        await rag.initialize_storages()
+        await initialize_pipeline_status()
+        return rag
+
+    yield create, extracted
+    finalize_share_data()
+
+
+def _chunk_ids(paragraphs):
+    return {compute_mdhash_id(p, prefix="chunk-") for p in paragraphs}
+
+
+def test_update_extracts_only_added_chunks_and_retracts_removed_ones(rag_factory):
+    create, extracted = rag_factory
+    updated = PARAGRAPHS[:2] + ["Kate paints with Liam."] + PARAGRAPHS[3:]
+
+    async def main():
+        rag = await create()
+        try:
+            await rag.ainsert(
+                "\n\n".join(PARAGRAPHS),
+                ids="doc-1",
+                split_by_character="\n\n",
+                split_by_character_only=True,
+            )
+            inserted_extractions = len(extracted)
+            extracted.clear()
+            await rag.aupdate_document(
+                "doc-1",
+                "\n\n".join(updated),
+                split_by_character="\n\n",
+                split_by_character_only=True,
+            )
+            removed_chunk = await rag.text_chunks.get_by_id(
+                compute_mdhash_id(PARAGRAPHS[2], prefix="chunk-")
+            )
+            missing_chunk_ids = await rag.text_chunks.filter_keys(_chunk_ids(updated))
+            graph = rag.chunk_entity_relation_graph
+            nodes = {
+                name: await graph.has_node(name)
+                for name in ("Alice", "Mona", "Nina", "Kate", "Liam")
+            }
+            status = await rag.doc_status.get_by_id("doc-1")
+            full_doc = await rag.full_docs.get_by_id("doc-1")
+        finally:
+            await rag.finalize_storages()
+        return (
+            inserted_extractions,
+            removed_chunk,
+            missing_chunk_ids,
+            nodes,
+            status,
+            full_doc,
+        )
+
+    (
+        inserted_extractions,
+        removed_chunk,
+        missing_chunk_ids,
+        nodes,
+        status,
+        full_doc,
+    ) = asyncio.run(main())
+    assert inserted_extractions == len(PARAGRAPHS)
+    assert len(extracted) == 1 and "Kate paints with Liam." in extracted[0]
+    assert removed_chunk is None
+    assert missing_chunk_ids == set()
+    assert nodes == {
+        "Alice": True,
+        "Mona": False,
+        "Nina": False,
+        "Kate": True,
+        "Liam": True,
+    }
+    assert status["status"] == DocStatus.PROCESSED
+    assert set(status["chunks_list"]) == _chunk_ids(updated)
+    assert full_doc["content"] == "\n\n".join(updated)
+
+
+def test_update_with_unchanged_content_extracts_nothing(rag_factory):
+    create, extracted = rag_factory
+
+    async def main():
+        rag = await create()
+        try:
+            content = "\n\n".join(PARAGRAPHS)
+            await rag.ainsert(
+                content,
+                ids="doc-1",
+                split_by_character="\n\n",
+                split_by_character_only=True,
+            )
+            extracted.clear()
+            await rag.aupdate_document(
+                "doc-1",
+                content,
+                split_by_character="\n\n",
+                split_by_character_only=True,
+            )
+            return await rag.doc_status.get_by_id("doc-1")
+        finally:
+            await rag.finalize_storages()
+
+    status = asyncio.run(main())
+    assert extracted == []
+    assert set(status["chunks_list"]) == _chunk_ids(PARAGRAPHS)
+
+
+def test_update_of_unknown_document_raises(rag_factory):
+    create, _ = rag_factory
+
+    async def main():
+        rag = await create()
+        try:
+            await rag.aupdate_document("doc-missing", "content")
+        finally:
+            await rag.finalize_storages()
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+
+def test_update_rewrites_vector_records_of_retracted_entities(rag_factory):
+    create, _ = rag_factory
+    paragraphs = ["Alice met Bob in Paris.", "Alice likes Frank."]
+
+    async def main():
+        rag = await create()
+        try:
+            await rag.ainsert(
+                "\n\n".join(paragraphs),
+                ids="doc-1",
+                split_by_character="\n\n",
+                split_by_character_only=True,
+            )
+            await rag.aupdate_document(
+                "doc-1",
+                paragraphs[0],
+                split_by_character="\n\n",
+                split_by_character_only=True,
+            )
+            node = await rag.chunk_entity_relation_graph.get_node("Alice")
+            record = await rag.entities_vdb.get_by_id(
+                compute_mdhash_id("Alice", prefix="ent-")
+            )
+            removed_relation = await rag.relationships_vdb.get_by_id(
+                compute_mdhash_id("AliceFrank", prefix="rel-")
+            )
+        finally:
+            await rag.finalize_storages()
+        return node, record, removed_relation
+
+    node, record, removed_relation = asyncio.run(main())
+    chunk_id = compute_mdhash_id(paragraphs[0], prefix="chunk-")
+    assert node["source_id"] == chunk_id
+    assert record["source_id"] == chunk_id
+    assert record["content"] == f"Alice\n{node['description']}"
+    assert removed_relation is None
+
+
+def test_update_while_pipeline_is_busy_raises(rag_factory):
+    create, _ = rag_factory
+
+    async def main():
+        rag = await create()
+        try:
+            await rag.ainsert("Alice met Bob in Paris.", ids="doc-1")
+            pipeline_status = await get_namespace_data("pipeline_status")
+            pipeline_status["busy"] = True
+            try:
+                with pytest.raises(RuntimeError):
+                    await rag.aupdate_document("doc-1", "Eve likes Frank.")
+            finally:
+                pipeline_status["busy"] = False
+            await rag.aupdate_document("doc-1", "Eve likes Frank.")
+            return pipeline_status["busy"], await rag.full_docs.get_by_id("doc-1")
+        finally:
+            await rag.finalize_storages()
+
+    busy, full_doc = asyncio.run(main())
+    assert busy is False
+    assert full_doc["content"] == "Eve likes Frank."
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,81 @@
+"""
+Tests of BatchedKVFetcher: concurrent fetches share a single load of every record, and
+cancelling the fetch that started a shared load does not fail the fetches waiting for it.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import BatchedKVFetcher
+
+
+class _SlowKV:
+    def __init__(self, delay: float = 0.05, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    async def get_by_ids(self, ids):
+        self.calls.append(list(ids))
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [{"id": id_, "content": f"record {id_}"} for id_ in ids]
+
+
+def test_concurrent_fetches_load_every_record_once():
+    async def main():
+        kv = _SlowKV()
+        fetcher = BatchedKVFetcher(kv)
+        first, second = await asyncio.gather(
+            fetcher.fetch(["a", "b"]), fetcher.fetch(["b", "c"])
+        )
+        return kv.calls, first, second
+
+    calls, first, second = asyncio.run(main())
+    assert calls == [["a", "b"], ["c"]]
+    assert first["b"] == second["b"] == {"id": "b", "content": "record b"}
+    assert second["c"]["content"] == "record c"
+
+
+def test_cancelled_owner_does_not_fail_waiting_fetches():
+    async def main():
+        kv = _SlowKV()
+        fetcher = BatchedKVFetcher(kv)
+        owner = asyncio.ensure_future(fetcher.fetch(["a", "b"]))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(fetcher.fetch(["a"]))
+        await asyncio.sleep(0)
+        owner.cancel()
+        records = await waiter
+        return owner.cancelled(), records, kv.calls
+
+    owner_cancelled, records, calls = asyncio.run(main())
+    assert owner_cancelled
+    assert records == {"a": {"id": "a", "content": "record a"}}
+    assert calls == [["a", "b"]]
+
+
+def test_failed_load_is_raised_to_every_fetch_and_retried():
+    async def main():
+        kv = _SlowKV(error=RuntimeError("storage down"))
+        fetcher = BatchedKVFetcher(kv)
+        outcomes = await asyncio.gather(
+            fetcher.fetch(["a"]), fetcher.fetch(["a"]), return_exceptions=True
+        )
+        kv.error = None
+        return outcomes, await fetcher.fetch(["a"]), kv.calls
+
+    outcomes, records, calls = asyncio.run(main())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert records == {"a": {"id": "a", "content": "record a"}}
+    assert calls == [["a"], ["a"]]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,103 @@
+"""
+Tests of the flat LLM response cache keys: make_cache_key / parse_cache_key round trip,
+flatten_cache_data converts the nested per-mode layout, and JsonKVStorage migrates a
+nested cache file when it is loaded.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.kg.json_kv_impl import JsonKVStorage
+from lightrag.kg.shared_storage import finalize_share_data, initialize_share_data
+from lightrag.utils import flatten_cache_data, make_cache_key, parse_cache_key
+
+NESTED = {
+    "default": {
+        "hash-1": {"return": "extracted", "cache_type": "extract"},
+    },
+    "local": {
+        "hash-2": {"return": "answer", "cache_type": "query"},
+        "hash-3": {"return": "keywords", "cache_type": "keywords"},
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "mode, args_hash", [("local", "abc"), ("mix", "a:b"), ("", "x")]
+)
+def test_cache_key_round_trip(mode, args_hash):
+    key = make_cache_key(mode, args_hash)
+    assert key == f"{mode}:{args_hash}"
+    assert parse_cache_key(key) == (mode, args_hash)
+
+
+def test_keys_without_mode_are_not_cache_keys():
+    assert parse_cache_key("chunk-123") is None
+
+
+def test_nested_cache_data_is_flattened():
+    assert flatten_cache_data(NESTED) == {
+        "default:hash-1": NESTED["default"]["hash-1"],
+        "local:hash-2": NESTED["local"]["hash-2"],
+        "local:hash-3": NESTED["local"]["hash-3"],
+    }
+
+
+def test_flat_cache_data_is_left_as_is():
+    flat = flatten_cache_data(NESTED)
+    assert flatten_cache_data(flat) is None
+    assert flatten_cache_data({}) is None
+
+
+def test_partly_migrated_cache_data_keeps_its_flat_entries():
+    data = {"global:hash-4": {"return": "flat"}, **NESTED}
+    flat = flatten_cache_data(data)
+    assert flat["global:hash-4"] == {"return": "flat"}
+    assert set(flat) == {
+        "global:hash-4",
+        "default:hash-1",
+        "local:hash-2",
+        "local:hash-3",
+    }
+
+
+@pytest.fixture
+def working_dir(tmp_path):
+    initialize_share_data()
+    yield tmp_path
+    finalize_share_data()
+
+
+def test_json_storage_migrates_a_nested_cache_file(working_dir):
+    with open(working_dir / "kv_store_llm_response_cache.json", "w") as f:
+        json.dump(NESTED, f)
+
+    async def main():
+        storage = JsonKVStorage(
+            namespace="llm_response_cache",
+            global_config={"working_dir": str(working_dir)},
+            embedding_func=None,
+        )
+        await storage.initialize()
+        local = await storage.get_by_mode("local")
+        entry = await storage.get_by_mode_and_id("default", "hash-1")
+        missing = await storage.get_by_mode_and_id("local", "hash-1")
+        await storage.index_done_callback()
+        return local, entry, missing
+
+    local, entry, missing = asyncio.run(main())
+    assert local == NESTED["local"]
+    assert entry == {"hash-1": NESTED["default"]["hash-1"]}
+    assert missing is None
+    with open(working_dir / "kv_store_llm_response_cache.json") as f:
+        assert json.load(f) == flatten_cache_data(NESTED)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
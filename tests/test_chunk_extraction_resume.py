@@ -0,0 +1,113 @@
+"""
+Tests of the chunk extraction checkpoints of the insert pipeline: chunks_done of a
+document only counts the stored chunk extractions of the current extraction prompts.
+"""
+
+import asyncio
+import os
+import sys
+from dataclasses import asdict
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag import LightRAG
+from lightrag.base import DocStatus
+from lightrag.kg.networkx_impl import NetworkXStorage
+from lightrag.kg.shared_storage import finalize_share_data, initialize_pipeline_status
+from lightrag.operate import extraction_prompt_version
+from lightrag.utils import EmbeddingFunc, Tokenizer, compute_mdhash_id
+
+PARAGRAPHS = ["Alice met Bob in Paris.", "Carol works with Dave."]
+
+
+class _CharTokenizer:
+    def encode(self, content):
+        return [ord(c) for c in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+async def _embed(texts):
+    return np.array([[len(text) % 7 + 1.0, 1.0, 2.0, 3.0] for text in texts])
+
+
+@pytest.fixture
+def rag_factory(tmp_path, monkeypatch):
+    async def upsert_document(self, doc_id, doc_data):
+        pass
+
+    # The document nodes are only written by the Neo4j storage
+    monkeypatch.setattr(NetworkXStorage, "upsert_document", upsert_document)
+
+    async def llm(prompt, system_prompt=None, history_messages=[], **kwargs):
+        raise RuntimeError("LLM unavailable")
+
+    async def create():
+        rag = LightRAG(
+            working_dir=str(tmp_path),
+            llm_model_func=llm,
+            embedding_func=EmbeddingFunc(
+                embedding_dim=4, max_token_size=8192, func=_embed
+            ),
+            tokenizer=Tokenizer("char", _CharTokenizer()),
+            chunk_token_size=200,
+            chunk_overlap_token_size=0,
+            entity_extract_max_gleaning=0,
+            max_cpu_workers=0,
+        )
+        await rag.initialize_storages()
+        await initialize_pipeline_status()
+        return rag
+
+    yield create
+    finalize_share_data()
+
+
+def test_chunks_done_ignores_extractions_of_other_prompt_versions(rag_factory):
+    async def main():
+        rag = await rag_factory()
+        try:
+            await rag.apipeline_enqueue_documents(
+                "\n\n".join(PARAGRAPHS), ids=["doc-1"]
+            )
+            current_version = extraction_prompt_version(asdict(rag))
+            await rag.chunk_extractions.upsert(
+                {
+                    chunk_id: {
+                        "chunk_id": chunk_id,
+                        "prompt_version": version,
+                        "nodes": [],
+                        "edges": [],
+                    }
+                    for chunk_id, version in (
+                        (
+                            compute_mdhash_id(PARAGRAPHS[0], prefix="chunk-"),
+                            current_version,
+                        ),
+                        (
+                            compute_mdhash_id(PARAGRAPHS[1], prefix="chunk-"),
+                            "outdated",
+                        ),
+                    )
+                }
+            )
+            # The chunk with an outdated extraction is sent to the failing LLM again
+            await rag.apipeline_process_enqueue_documents(
+                split_by_character="\n\n", split_by_character_only=True
+            )
+            return await rag.doc_status.get_by_id("doc-1")
+        finally:
+            await rag.finalize_storages()
+
+    status = asyncio.run(main())
+    assert status["status"] == DocStatus.FAILED
+    assert status["chunks_count"] == 2
+    assert status["chunks_done"] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
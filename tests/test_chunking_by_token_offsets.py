@@ -0,0 +1,141 @@
+"""
+Tests of chunking_by_token_offsets: every chunk carries the character span it was
+sliced from, and the chunks match the ones of chunking_by_token_size.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.operate import chunking_by_token_offsets, chunking_by_token_size
+from lightrag.utils import Tokenizer
+
+CONTENT = (
+    "  The first paragraph talks about graphs and retrieval.\n\n"
+    "Der zweite Absatz enthält Umlaute: äöü ß.\n\n"
+    "\n\n"
+    "第三段是中文文本，用于测试多字节字符。\n\n"
+    "The last paragraph ends the document.   "
+)
+
+
+class _CharTokenizer:
+    def encode(self, content):
+        return [ord(c) for c in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+class _ByteTokenizer:
+    """Byte-level tokenizer with two byte tokens, splitting multi-byte characters"""
+
+    def __init__(self):
+        self.vocab = {}
+        self.pieces = []
+
+    def encode(self, content):
+        data = content.encode("utf-8")
+        tokens = []
+        for start in range(0, len(data), 2):
+            piece = data[start : start + 2]
+            if piece not in self.vocab:
+                self.vocab[piece] = len(self.pieces)
+                self.pieces.append(piece)
+            tokens.append(self.vocab[piece])
+        return tokens
+
+    def decode_single_token_bytes(self, token):
+        return self.pieces[token]
+
+    def decode(self, tokens):
+        return b"".join(self.pieces[t] for t in tokens).decode("utf-8", "replace")
+
+
+def _tokenizers():
+    return [
+        Tokenizer("char", _CharTokenizer()),
+        Tokenizer("bytes", _ByteTokenizer()),
+    ]
+
+
+def _assert_offsets_slice_content(chunks, content):
+    assert chunks
+    for index, chunk in enumerate(chunks):
+        assert chunk["chunk_order_index"] == index
+        assert content[chunk["start_offset"] : chunk["end_offset"]] == chunk["content"]
+        assert chunk["content"] == chunk["content"].strip()
+
+
+@pytest.mark.parametrize("tokenizer", _tokenizers(), ids=["char", "bytes"])
+@pytest.mark.parametrize(
+    "split_by_character, split_by_character_only",
+    [(None, False), ("\n\n", False), ("\n\n", True)],
+)
+def test_offsets_slice_the_chunk_content(
+    tokenizer, split_by_character, split_by_character_only
+):
+    chunks = list(
+        chunking_by_token_offsets(
+            tokenizer,
+            CONTENT,
+            split_by_character,
+            split_by_character_only,
+            overlap_token_size=4,
+            max_token_size=16,
+        )
+    )
+    _assert_offsets_slice_content(chunks, CONTENT)
+    if not split_by_character_only:
+        assert all(chunk["tokens"] <= 16 for chunk in chunks)
+
+
+@pytest.mark.parametrize(
+    "split_by_character, split_by_character_only",
+    [(None, False), ("\n\n", False), ("\n\n", True)],
+)
+def test_chunks_match_chunking_by_token_size(
+    split_by_character, split_by_character_only
+):
+    tokenizer = Tokenizer("char", _CharTokenizer())
+    args = (tokenizer, CONTENT, split_by_character, split_by_character_only, 4, 16)
+    expected = [
+        (chunk["tokens"], chunk["content"])
+        for chunk in chunking_by_token_size(*args)
+        if chunk["content"]
+    ]
+    actual = [
+        (chunk["tokens"], chunk["content"])
+        for chunk in chunking_by_token_offsets(*args)
+    ]
+    assert actual == expected
+
+
+def test_windows_overlap_by_the_overlap_size():
+    tokenizer = Tokenizer("char", _CharTokenizer())
+    content = "abcdefghijklmnopqrstuvwxyz"
+    chunks = list(
+        chunking_by_token_offsets(
+            tokenizer, content, overlap_token_size=2, max_token_size=10
+        )
+    )
+    assert [(c["start_offset"], c["end_offset"]) for c in chunks] == [
+        (0, 10),
+        (8, 18),
+        (16, 26),
+        (24, 26),
+    ]
+    _assert_offsets_slice_content(chunks, content)
+
+
+def test_empty_content_yields_no_chunks():
+    for tokenizer in _tokenizers():
+        assert list(chunking_by_token_offsets(tokenizer, "")) == []
+        assert list(chunking_by_token_offsets(tokenizer, "\n\n", "\n\n")) == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
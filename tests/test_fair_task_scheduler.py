@@ -0,0 +1,115 @@
+"""
+Tests of FairTaskScheduler: result order, worker limit, fair share between groups and
+failure handling.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import FairTaskScheduler
+
+
+def test_results_in_submission_order_within_worker_limit():
+    async def main():
+        scheduler = FairTaskScheduler(max_workers=3)
+        running = 0
+        max_running = 0
+
+        def task(value, delay):
+            async def run():
+                nonlocal running, max_running
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(delay)
+                running -= 1
+                return value
+
+            return run
+
+        try:
+            results = await scheduler.run([task(i, 0.01 * (8 - i)) for i in range(8)])
+        finally:
+            await scheduler.shutdown()
+        return results, max_running
+
+    results, max_running = asyncio.run(main())
+    assert results == list(range(8))
+    assert max_running == 3
+
+
+def test_groups_share_workers_round_robin():
+    async def main():
+        scheduler = FairTaskScheduler(max_workers=1)
+        order = []
+
+        def task(name):
+            async def run():
+                order.append(name)
+                await asyncio.sleep(0)
+                return name
+
+            return run
+
+        try:
+            large = scheduler.run([task(f"a{i}") for i in range(4)])
+            small = scheduler.run([task(f"b{i}") for i in range(2)])
+            results = await asyncio.gather(large, small)
+        finally:
+            await scheduler.shutdown()
+        return results, order
+
+    results, order = asyncio.run(main())
+    assert results == [["a0", "a1", "a2", "a3"], ["b0", "b1"]]
+    # The small group is not starved behind the whole large group
+    assert order == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+def test_failed_group_drops_pending_tasks_and_others_complete():
+    async def main():
+        scheduler = FairTaskScheduler(max_workers=1)
+        executed = []
+
+        def task(name, fail=False):
+            async def run():
+                executed.append(name)
+                await asyncio.sleep(0)
+                if fail:
+                    raise ValueError(name)
+                return name
+
+            return run
+
+        try:
+            failing = scheduler.run(
+                [task("a0"), task("a1", fail=True), task("a2"), task("a3")]
+            )
+            other = scheduler.run([task("b0"), task("b1"), task("b2")])
+            results = await asyncio.gather(failing, other, return_exceptions=True)
+        finally:
+            await scheduler.shutdown()
+        return results, executed
+
+    (error, other_results), executed = asyncio.run(main())
+    assert isinstance(error, ValueError)
+    assert other_results == ["b0", "b1", "b2"]
+    assert "a2" not in executed and "a3" not in executed
+
+
+def test_empty_group_returns_immediately():
+    async def main():
+        scheduler = FairTaskScheduler(max_workers=2)
+        try:
+            return await scheduler.run([])
+        finally:
+            await scheduler.shutdown()
+
+    assert asyncio.run(main()) == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,69 @@
+"""
+Tests of GleaningYieldTracker: gleaning rounds below the yield threshold are skipped,
+skipped rounds are probed again periodically and resume once they pay off.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import GleaningYieldTracker
+
+
+def _record(tracker, round_index, new_items, times):
+    for _ in range(times):
+        tracker.record(round_index, new_items, 1)
+
+
+def test_zero_threshold_always_allows_all_rounds():
+    tracker = GleaningYieldTracker(threshold=0, window=2, probe_interval=3)
+    _record(tracker, 0, 0, 5)
+    assert [tracker.allowed_rounds(3) for _ in range(4)] == [3, 3, 3, 3]
+    assert tracker.stats(3)["rounds_skipped"] == 0
+
+
+def test_all_rounds_are_allowed_until_the_window_is_filled():
+    tracker = GleaningYieldTracker(threshold=0.5, window=3, probe_interval=10)
+    _record(tracker, 0, 0, 2)
+    assert tracker.allowed_rounds(2) == 2
+    assert tracker.stats(2)["round_yields"] == [None, None]
+
+
+def test_unproductive_round_and_later_rounds_are_skipped_and_probed():
+    tracker = GleaningYieldTracker(threshold=0.5, window=2, probe_interval=3)
+    _record(tracker, 0, 2, 2)
+    _record(tracker, 1, 0, 2)
+    _record(tracker, 2, 5, 2)
+
+    # Round 1 does not pay off, round 2 is skipped with it, every third one probes
+    assert [tracker.allowed_rounds(3) for _ in range(6)] == [1, 1, 2, 1, 1, 2]
+    stats = tracker.stats(3)
+    assert stats["rounds_allowed"] == 1
+    assert stats["round_yields"] == [2.0, 0.0, 5.0]
+    assert stats["rounds_skipped"] == 10
+    assert stats["rounds_run"] == 6
+
+
+def test_gleaning_resumes_once_the_probed_round_pays_off():
+    tracker = GleaningYieldTracker(threshold=0.5, window=2, probe_interval=1)
+    _record(tracker, 0, 0, 2)
+    assert tracker.stats(2)["rounds_allowed"] == 0
+    # The probe runs round 0 again, its new samples push out the old ones
+    assert tracker.allowed_rounds(2) == 1
+    _record(tracker, 0, 3, 2)
+    assert tracker.allowed_rounds(2) == 2
+
+
+def test_yield_is_per_llm_call():
+    tracker = GleaningYieldTracker(threshold=0.5, window=2, probe_interval=10)
+    tracker.record(0, 1, 4)
+    tracker.record(0, 0, 4)
+    assert tracker.stats(1)["round_yields"] == [0.125]
+    assert tracker.allowed_rounds(1) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
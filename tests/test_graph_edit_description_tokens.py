@@ -0,0 +1,114 @@
+"""
+Tests of the description token counts stored with graph nodes and edges: creating,
+editing and merging entities and relations store the count of the new description.
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag import LightRAG
+from lightrag.kg.shared_storage import finalize_share_data, initialize_pipeline_status
+from lightrag.utils import EmbeddingFunc, Tokenizer
+
+
+class _CharTokenizer:
+    def encode(self, content):
+        return [ord(c) for c in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+async def _embed(texts):
+    return np.array([[len(text) % 7 + 1.0, 1.0, 2.0, 3.0] for text in texts])
+
+
+async def _llm(prompt, **kwargs):
+    return "unused"
+
+
+@pytest.fixture
+def rag_factory(tmp_path):
+    async def create():
+        rag = LightRAG(
+            working_dir=str(tmp_path),
+            llm_model_func=_llm,
+            embedding_func=EmbeddingFunc(
+                embedding_dim=4, max_token_size=8192, func=_embed
+            ),
+            tokenizer=Tokenizer("char", _CharTokenizer()),
+            max_cpu_workers=0,
+        )
+        await rag.initialize_storages()
+        await initialize_pipeline_status()
+        return rag
+
+    yield create
+    finalize_share_data()
+
+
+def _run(create, steps):
+    async def main():
+        rag = await create()
+        try:
+            await rag.acreate_entity("Alice", {"description": "short"})
+            await rag.acreate_entity("Bob", {"description": "a person"})
+            await rag.acreate_relation("Alice", "Bob", {"description": "friends"})
+            await steps(rag)
+            graph = rag.chunk_entity_relation_graph
+            return graph, {
+                "Alice": await graph.get_node("Alice"),
+                "Bob": await graph.get_node("Bob"),
+            }
+        finally:
+            await rag.finalize_storages()
+
+    return asyncio.run(main())
+
+
+def test_created_entities_and_relations_store_the_count(rag_factory):
+    async def steps(rag):
+        edge = await rag.chunk_entity_relation_graph.get_edge("Alice", "Bob")
+        assert edge["description_tokens"] == len("friends")
+
+    _, nodes = _run(rag_factory, steps)
+    assert nodes["Alice"]["description_tokens"] == len("short")
+    assert nodes["Bob"]["description_tokens"] == len("a person")
+
+
+def test_edits_store_the_count_of_the_new_description(rag_factory):
+    edges = {}
+
+    async def steps(rag):
+        await rag.aedit_entity("Alice", {"description": "a much longer description"})
+        await rag.aedit_entity("Bob", {"entity_type": "person"})
+        await rag.aedit_relation("Alice", "Bob", {"description": "old friends"})
+        edges["Alice", "Bob"] = await rag.chunk_entity_relation_graph.get_edge(
+            "Alice", "Bob"
+        )
+
+    _, nodes = _run(rag_factory, steps)
+    assert nodes["Alice"]["description_tokens"] == len("a much longer description")
+    # Edits not changing the description keep the stored count
+    assert nodes["Bob"]["description_tokens"] == len("a person")
+    assert edges["Alice", "Bob"]["description_tokens"] == len("old friends")
+
+
+def test_merge_into_an_existing_entity_stores_the_merged_count(rag_factory):
+    async def steps(rag):
+        await rag.amerge_entities(["Alice"], "Bob")
+
+    _, nodes = _run(rag_factory, steps)
+    assert nodes["Alice"] is None
+    assert nodes["Bob"]["description"] == "short\n\na person"
+    assert nodes["Bob"]["description_tokens"] == len("short\n\na person")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
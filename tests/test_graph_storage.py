@@ -748,6 +748,53 @@ async def test_graph_batch_operations(storage):
 
         print("无向图特性验证成功：批量获取的节点边包含所有相关的边（无论方向）")
 
+        # 7. 测试 upsert_nodes_batch 和 upsert_edges_batch - 批量插入节点和边
+        print("== 测试 upsert_nodes_batch 和 upsert_edges_batch")
+        node6_id = "强化学习"
+        node6_data = {
+            "entity_id": node6_id,
+            "description": "强化学习是机器学习的一个分支，智能体通过与环境交互获得奖励来学习策略。",
+            "keywords": "奖励,策略,智能体",
+            "entity_type": "技术领域",
+        }
+        node7_id = "AlphaGo"
+        node7_data = {
+            "entity_id": node7_id,
+            "description": "AlphaGo是使用深度强化学习的围棋程序。",
+            "keywords": "围棋,DeepMind",
+            "entity_type": "产品",
+        }
+        await storage.upsert_nodes_batch(
+            [(node6_id, node6_data), (node7_id, node7_data)]
+        )
+        edge7_data = {
+            "relationship": "属于",
+            "weight": 1.0,
+            "description": "强化学习属于机器学习",
+        }
+        edge8_data = {
+            "relationship": "使用",
+            "weight": 0.9,
+            "description": "AlphaGo使用强化学习技术",
+        }
+        await storage.upsert_edges_batch(
+            [(node6_id, node2_id, edge7_data), (node7_id, node6_id, edge8_data)]
+        )
+
+        nodes_dict = await storage.get_nodes_batch([node6_id, node7_id])
+        assert len(nodes_dict) == 2, f"应返回2个节点，实际返回 {len(nodes_dict)} 个"
+        assert (
+            nodes_dict[node7_id]["description"] == node7_data["description"]
+        ), f"{node7_id} 描述不匹配"
+        edges_dict = await storage.get_edges_batch(
+            [{"src": node6_id, "tgt": node2_id}, {"src": node6_id, "tgt": node7_id}]
+        )
+        assert len(edges_dict) == 2, f"应返回2条边的属性，实际返回 {len(edges_dict)} 条"
+        assert (
+            edges_dict[(node6_id, node7_id)]["relationship"]
+            == edge8_data["relationship"]
+        ), f"边 {node6_id} -> {node7_id} 关系不匹配"
+
         print("\n批量操作测试完成")
         return True
 
@@ -0,0 +1,109 @@
+"""
+Tests of the batched graph upserts: upsert_nodes_batch and upsert_edges_batch of
+NetworkXStorage and the per-item fallback of BaseGraphStorage merge the attributes of
+existing nodes and edges and create missing ones.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.base import BaseGraphStorage
+from lightrag.kg.networkx_impl import NetworkXStorage
+from lightrag.kg.shared_storage import finalize_share_data, initialize_share_data
+
+
+@pytest.fixture
+def graph(tmp_path):
+    initialize_share_data()
+
+    async def create():
+        storage = NetworkXStorage(
+            namespace="chunk_entity_relation",
+            global_config={"working_dir": str(tmp_path)},
+            embedding_func=None,
+        )
+        await storage.initialize()
+        return storage
+
+    yield create
+    finalize_share_data()
+
+
+def _node(name, **attributes):
+    return {"entity_id": name, "entity_type": "person", **attributes}
+
+
+async def _upsert_batches(storage, use_fallback):
+    nodes = [
+        ("Alice", _node("Alice", description="updated")),
+        ("Carol", _node("Carol", description="new")),
+    ]
+    edges = [
+        ("Alice", "Bob", {"weight": 2.0, "description": "updated"}),
+        ("Alice", "Carol", {"weight": 1.0, "description": "new"}),
+    ]
+    if use_fallback:
+        await BaseGraphStorage.upsert_nodes_batch(storage, nodes)
+        await BaseGraphStorage.upsert_edges_batch(storage, edges)
+    else:
+        await storage.upsert_nodes_batch(nodes)
+        await storage.upsert_edges_batch(edges)
+
+
+@pytest.mark.parametrize("use_fallback", [False, True])
+def test_batch_upserts_merge_attributes_and_create_missing_elements(
+    graph, use_fallback
+):
+    async def main():
+        storage = await graph()
+        await storage.upsert_node(
+            "Alice", _node("Alice", description="old", source_id="chunk-1")
+        )
+        await storage.upsert_node("Bob", _node("Bob", description="bob"))
+        await storage.upsert_edge(
+            "Alice", "Bob", {"weight": 1.0, "description": "old", "keywords": "k"}
+        )
+
+        await _upsert_batches(storage, use_fallback)
+
+        nodes = await storage.get_nodes_batch(["Alice", "Bob", "Carol"])
+        edges = await storage.get_edges_batch(
+            [{"src": "Bob", "tgt": "Alice"}, {"src": "Alice", "tgt": "Carol"}]
+        )
+        return nodes, edges
+
+    nodes, edges = asyncio.run(main())
+    # Existing attributes missing in the upserted data are kept
+    assert nodes["Alice"]["description"] == "updated"
+    assert nodes["Alice"]["source_id"] == "chunk-1"
+    assert nodes["Bob"]["description"] == "bob"
+    assert nodes["Carol"]["description"] == "new"
+    assert edges[("Bob", "Alice")]["weight"] == 2.0
+    assert edges[("Bob", "Alice")]["description"] == "updated"
+    assert edges[("Bob", "Alice")]["keywords"] == "k"
+    assert edges[("Alice", "Carol")]["description"] == "new"
+
+
+@pytest.mark.parametrize("use_fallback", [False, True])
+def test_empty_batches_change_nothing(graph, use_fallback):
+    async def main():
+        storage = await graph()
+        await storage.upsert_node("Alice", _node("Alice"))
+        if use_fallback:
+            await BaseGraphStorage.upsert_nodes_batch(storage, [])
+            await BaseGraphStorage.upsert_edges_batch(storage, [])
+        else:
+            await storage.upsert_nodes_batch([])
+            await storage.upsert_edges_batch([])
+        return await storage.get_all_labels()
+
+    assert asyncio.run(main()) == ["Alice"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,254 @@
+"""
+Tests of the summarize-outside-the-lock merge of merge_nodes_and_edges: descriptions are
+summarized without holding the graph lock, and a node changed by another writer while
+summarizing is merged and summarized again before the commit.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.constants import GRAPH_DB_LOCK_GROUP_SIZE, MAX_MERGE_ATTEMPTS
+from lightrag.kg.networkx_impl import NetworkXStorage
+from lightrag.kg.shared_storage import (
+    finalize_share_data,
+    get_graph_db_keyed_lock,
+    get_graph_db_lock,
+    initialize_share_data,
+)
+from lightrag.operate import _lock_groups, merge_nodes_and_edges
+from lightrag.prompt import GRAPH_FIELD_SEP
+from lightrag.utils import Tokenizer
+
+
+class _CharTokenizer:
+    def encode(self, content):
+        return [ord(c) for c in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+@pytest.fixture
+def working_dir(tmp_path):
+    initialize_share_data()
+    yield str(tmp_path)
+    finalize_share_data()
+
+
+def _global_config(llm_model_func, working_dir):
+    return {
+        "working_dir": working_dir,
+        "llm_model_func": llm_model_func,
+        "tokenizer": Tokenizer("char", _CharTokenizer()),
+        "llm_model_max_token_size": 32768,
+        "summary_to_max_tokens": 500,
+        "force_llm_summary_on_merge": 2,
+        "addon_params": {},
+    }
+
+
+def _node(name, description, chunk_id="chunk-1"):
+    return {
+        "entity_id": name,
+        "entity_name": name,
+        "entity_type": "person",
+        "description": description,
+        "source_id": chunk_id,
+        "file_path": "a.txt",
+        "source_project": "generic",
+    }
+
+
+async def _graph(working_dir):
+    graph = NetworkXStorage(
+        namespace="chunk_entity_relation",
+        global_config={"working_dir": working_dir},
+        embedding_func=None,
+    )
+    await graph.initialize()
+    return graph
+
+
+async def _write_concurrently(graph, description):
+    """Change the node like another document would, if its graph lock is free"""
+    lock = get_graph_db_keyed_lock(["Alice"])
+    try:
+        await asyncio.wait_for(lock.__aenter__(), 0.2)
+    except asyncio.TimeoutError:
+        return False
+    try:
+        await graph.upsert_node("Alice", _node("Alice", description))
+    finally:
+        await lock.__aexit__(None, None, None)
+    return True
+
+
+async def _merge(graph, global_config, description):
+    await merge_nodes_and_edges(
+        chunk_results=[({"Alice": [_node("Alice", description, "chunk-2")]}, {})],
+        knowledge_graph_inst=graph,
+        entity_vdb=None,
+        relationships_vdb=None,
+        global_config=global_config,
+        pipeline_status={"latest_message": "", "history_messages": []},
+        pipeline_status_lock=asyncio.Lock(),
+    )
+
+
+def test_summary_runs_outside_the_lock_and_conflicts_are_resummarized(working_dir):
+    async def main():
+        graph = await _graph(working_dir)
+        await graph.upsert_node("Alice", _node("Alice", "first"))
+        prompts = []
+        written = []
+
+        async def llm(prompt, **kwargs):
+            prompts.append(prompt)
+            if len(prompts) == 1:
+                # Another document changes the node while it is summarized
+                written.append(
+                    await _write_concurrently(
+                        graph, f"first{GRAPH_FIELD_SEP}concurrent"
+                    )
+                )
+            return f"summary {len(prompts)}"
+
+        await _merge(graph, _global_config(llm, working_dir), "second")
+        return prompts, written, await graph.get_node("Alice")
+
+    prompts, written, node = asyncio.run(main())
+    # The graph lock was free while summarizing
+    assert written == [True]
+    assert len(prompts) == 2
+    assert "concurrent" not in prompts[0]
+    assert "concurrent" in prompts[1] and "second" in prompts[1]
+    assert node["description"] == "summary 2"
+    assert set(node["source_id"].split(GRAPH_FIELD_SEP)) == {"chunk-1", "chunk-2"}
+
+
+def test_repeated_conflicts_summarize_under_the_lock_on_the_last_attempt(working_dir):
+    async def main():
+        graph = await _graph(working_dir)
+        await graph.upsert_node("Alice", _node("Alice", "first"))
+        written = []
+
+        async def llm(prompt, **kwargs):
+            # Every summary is outdated by another writer, unless the lock is held
+            written.append(
+                await _write_concurrently(
+                    graph, f"first{GRAPH_FIELD_SEP}change {len(written)}"
+                )
+            )
+            return f"summary {len(written)}"
+
+        await _merge(graph, _global_config(llm, working_dir), "second")
+        return written, await graph.get_node("Alice")
+
+    written, node = asyncio.run(main())
+    assert written == [True] * (MAX_MERGE_ATTEMPTS - 1) + [False]
+    assert node["description"] == f"summary {MAX_MERGE_ATTEMPTS}"
+
+
+def test_merge_without_summary_does_not_call_the_llm(working_dir):
+    async def main():
+        graph = await _graph(working_dir)
+
+        async def llm(prompt, **kwargs):
+            raise AssertionError("no summary expected")
+
+        await _merge(graph, _global_config(llm, working_dir), "only")
+        return await graph.get_node("Alice")
+
+    node = asyncio.run(main())
+    assert node["description"] == "only"
+
+
+def test_lock_groups_are_bounded_and_keep_case_variants_together():
+    names = [f"Entity {i}" for i in range(20)]
+    all_nodes = {name: [_node(name, "d")] for name in names}
+    all_nodes["entity 3"] = [_node("entity 3", "d")]
+    all_edges = {
+        tuple(sorted((names[i], names[i + 1]))): [{"weight": 1.0}]
+        for i in range(len(names) - 1)
+    }
+
+    node_groups, edge_groups = _lock_groups(all_nodes, all_edges)
+
+    assert sorted(name for group in node_groups for name in group) == sorted(all_nodes)
+    for group in node_groups:
+        assert len({name.lower() for name in group}) <= GRAPH_DB_LOCK_GROUP_SIZE
+    assert any({"Entity 3", "entity 3"} <= set(group) for group in node_groups)
+    assert [key for group in edge_groups for key in group] == list(all_edges)
+    for group in edge_groups:
+        group_names = {name.lower() for edge_key in group for name in edge_key}
+        assert len(group_names) <= GRAPH_DB_LOCK_GROUP_SIZE
+
+
+def test_merge_of_many_entities_commits_every_group(working_dir):
+    async def main():
+        graph = await _graph(working_dir)
+
+        async def llm(prompt, **kwargs):
+            raise AssertionError("no summary expected")
+
+        names = [f"Entity {i}" for i in range(3 * GRAPH_DB_LOCK_GROUP_SIZE)]
+        edges = {
+            (names[i], names[i + 1]): [
+                {
+                    "src_id": names[i],
+                    "tgt_id": names[i + 1],
+                    "weight": 1.0,
+                    "description": "related",
+                    "keywords": "k",
+                    "source_id": "chunk-1",
+                    "file_path": "a.txt",
+                    "source_project": "generic",
+                }
+            ]
+            for i in range(len(names) - 1)
+        }
+        await merge_nodes_and_edges(
+            chunk_results=[({name: [_node(name, "d")] for name in names}, edges)],
+            knowledge_graph_inst=graph,
+            entity_vdb=None,
+            relationships_vdb=None,
+            global_config=_global_config(llm, working_dir),
+            pipeline_status={"latest_message": "", "history_messages": []},
+            pipeline_status_lock=asyncio.Lock(),
+        )
+        nodes = await graph.get_nodes_batch(names)
+        edge_count = sum(
+            [
+                await graph.has_edge(names[i], names[i + 1])
+                for i in range(len(names) - 1)
+            ]
+        )
+        return nodes, edge_count, len(names)
+
+    nodes, edge_count, count = asyncio.run(main())
+    assert len(nodes) == count
+    assert all(node["entity_type"] == "person" for node in nodes.values())
+    assert edge_count == count - 1
+
+
+def test_deprecated_graph_db_lock_excludes_keyed_locks(working_dir):
+    async def main():
+        async with get_graph_db_lock():
+            lock = get_graph_db_keyed_lock(["Alice"])
+            try:
+                await asyncio.wait_for(lock.__aenter__(), 0.1)
+            except asyncio.TimeoutError:
+                return True
+            await lock.__aexit__(None, None, None)
+            return False
+
+    assert asyncio.run(main())
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,100 @@
+"""
+Tests of micro_batch_async_func_call: concurrent embedding calls are combined into
+batched calls per priority, and every caller gets the rows of its own texts.
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import micro_batch_async_func_call
+
+
+def _embedding_func(calls, max_batch_size=8, linger=0.01):
+    @micro_batch_async_func_call(max_batch_size, linger)
+    async def embed(texts, **kwargs):
+        calls.append((list(texts), kwargs))
+        await asyncio.sleep(0)
+        return np.array([[len(text), 1.0] for text in texts])
+
+    return embed
+
+
+def test_concurrent_calls_are_combined_and_split_back():
+    async def main():
+        calls = []
+        embed = _embedding_func(calls)
+        results = await asyncio.gather(
+            embed(["a", "bb"]), embed(["ccc"]), embed(["dddd", "eeeee"])
+        )
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert calls == [(["a", "bb", "ccc", "dddd", "eeeee"], {"_priority": 10})]
+    assert [result[:, 0].tolist() for result in results] == [[1, 2], [3], [4, 5]]
+
+
+def test_combined_calls_stay_within_the_batch_size():
+    async def main():
+        calls = []
+        embed = _embedding_func(calls, max_batch_size=4)
+        results = await asyncio.gather(*(embed(["x" * i, "y"]) for i in range(1, 4)))
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert [len(texts) for texts, _ in calls] == [4, 2]
+    assert [result[:, 0].tolist() for result in results] == [[1, 1], [2, 1], [3, 1]]
+
+
+def test_calls_are_only_combined_within_the_same_priority():
+    async def main():
+        calls = []
+        embed = _embedding_func(calls)
+        await asyncio.gather(
+            embed(["a"], _priority=1), embed(["b"], _priority=5), embed(["c"])
+        )
+        return calls
+
+    calls = asyncio.run(main())
+    assert sorted((kwargs["_priority"], texts) for texts, kwargs in calls) == [
+        (1, ["a"]),
+        (5, ["b"]),
+        (10, ["c"]),
+    ]
+
+
+def test_large_calls_and_calls_with_arguments_pass_through():
+    async def main():
+        calls = []
+        embed = _embedding_func(calls, max_batch_size=2, linger=60)
+        large = await asyncio.wait_for(embed(["a", "b", "c"]), 1)
+        with_kwargs = await asyncio.wait_for(embed(["d"], dimensions=2), 1)
+        return large, with_kwargs, calls
+
+    large, with_kwargs, calls = asyncio.run(main())
+    assert large.shape == (3, 2) and with_kwargs.shape == (1, 2)
+    assert calls == [
+        (["a", "b", "c"], {"_priority": 10}),
+        (["d"], {"_priority": 10, "dimensions": 2}),
+    ]
+
+
+def test_failed_call_raises_to_every_combined_caller():
+    async def main():
+        @micro_batch_async_func_call(8, 0.01)
+        async def embed(texts, **kwargs):
+            raise RuntimeError("embedding failed")
+
+        return await asyncio.gather(embed(["a"]), embed(["b"]), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
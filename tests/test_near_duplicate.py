@@ -0,0 +1,119 @@
+"""
+Tests of NearDuplicateIndex: MinHash signatures estimate the Jaccard similarity of the
+shingled text, the LSH query finds near duplicates above the threshold only, removed
+documents are no longer found and the index survives a save/load round trip.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.constants import (
+    DEFAULT_MINHASH_NUM_PERM,
+    DEFAULT_NEAR_DUPLICATE_THRESHOLD,
+    DEFAULT_SHINGLE_SIZE,
+)
+from lightrag.near_duplicate import NearDuplicateIndex, _optimal_bands
+
+WORDS = [f"word{i}" for i in range(400)]
+ORIGINAL = " ".join(WORDS)
+# One word of four hundred changed, nearly all shingles are shared
+NEAR_DUPLICATE = " ".join(WORDS[:200] + ["changed"] + WORDS[201:])
+UNRELATED = " ".join(f"other{i}" for i in range(400))
+
+
+def _index(file_name, **kwargs):
+    return NearDuplicateIndex(
+        file_name=str(file_name),
+        threshold=kwargs.get("threshold", DEFAULT_NEAR_DUPLICATE_THRESHOLD),
+        num_perm=kwargs.get("num_perm", DEFAULT_MINHASH_NUM_PERM),
+        shingle_size=kwargs.get("shingle_size", DEFAULT_SHINGLE_SIZE),
+        seed=kwargs.get("seed", 1),
+    )
+
+
+@pytest.mark.parametrize("num_perm, threshold", [(128, 0.9), (128, 0.5), (64, 0.8)])
+def test_band_layout_covers_the_signature_below_the_threshold(num_perm, threshold):
+    bands, rows = _optimal_bands(num_perm, threshold)
+    assert bands * rows == num_perm
+    assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_signature_is_deterministic_and_ignores_case(tmp_path):
+    index = _index(tmp_path / "index.json")
+    signature = index.signature(ORIGINAL)
+    assert signature.shape == (DEFAULT_MINHASH_NUM_PERM,)
+    assert (signature == index.signature(ORIGINAL.upper())).all()
+    assert (signature == _index(tmp_path / "other.json").signature(ORIGINAL)).all()
+
+
+def test_query_finds_near_duplicates_only(tmp_path):
+    index = _index(tmp_path / "index.json")
+    index.add("doc-1", index.signature(ORIGINAL))
+
+    match = index.query(index.signature(NEAR_DUPLICATE))
+    assert match is not None
+    doc_id, similarity = match
+    assert doc_id == "doc-1"
+    assert DEFAULT_NEAR_DUPLICATE_THRESHOLD <= similarity < 1.0
+
+    assert index.query(index.signature(ORIGINAL)) == ("doc-1", 1.0)
+    assert index.query(index.signature(UNRELATED)) is None
+
+
+def test_query_returns_the_most_similar_document(tmp_path):
+    index = _index(tmp_path / "index.json")
+    index.add("near", index.signature(NEAR_DUPLICATE))
+    index.add("exact", index.signature(ORIGINAL))
+    index.add("unrelated", index.signature(UNRELATED))
+    assert index.query(index.signature(ORIGINAL)) == ("exact", 1.0)
+
+
+def test_add_replaces_and_remove_forgets_documents(tmp_path):
+    index = _index(tmp_path / "index.json")
+    index.add("doc-1", index.signature(ORIGINAL))
+    index.add("doc-1", index.signature(UNRELATED))
+    assert len(index) == 1
+    assert index.query(index.signature(ORIGINAL)) is None
+
+    assert index.remove(["doc-1", "doc-missing"]) is True
+    assert index.remove(["doc-1"]) is False
+    assert len(index) == 0
+    assert index.query(index.signature(UNRELATED)) is None
+    assert all(not buckets for buckets in index._buckets)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    file_name = tmp_path / "index.json"
+    index = _index(file_name)
+    index.add("doc-1", index.signature(ORIGINAL))
+    index.save()
+
+    reloaded = _index(file_name)
+    reloaded.load()
+    assert len(reloaded) == 1
+    assert reloaded.query(reloaded.signature(NEAR_DUPLICATE))[0] == "doc-1"
+
+
+def test_load_with_different_parameters_starts_a_new_index(tmp_path):
+    file_name = tmp_path / "index.json"
+    index = _index(file_name)
+    index.add("doc-1", index.signature(ORIGINAL))
+    index.save()
+
+    reloaded = _index(file_name, seed=2)
+    reloaded.load()
+    assert len(reloaded) == 0
+
+
+def test_load_without_file_keeps_an_empty_index(tmp_path):
+    index = _index(tmp_path / "missing.json")
+    index.load()
+    assert len(index) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
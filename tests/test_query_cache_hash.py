@@ -0,0 +1,71 @@
+"""
+Tests of compute_query_cache_hash: the key of a cached answer changes with every
+answer-affecting query parameter, the system prompt and the knowledge base version.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.base import QueryParam
+from lightrag.operate import compute_query_cache_hash
+
+
+def _hash(query="What is LightRAG?", system_prompt=None, kb_version=0, **param):
+    return compute_query_cache_hash(
+        query,
+        QueryParam(**param),
+        {"kb_version": kb_version},
+        system_prompt,
+    )
+
+
+async def _other_model(prompt, **kwargs):
+    return prompt
+
+
+def test_same_query_and_parameters_give_the_same_hash():
+    assert _hash(mode="local", top_k=5) == _hash(mode="local", top_k=5)
+    assert _hash() == compute_query_cache_hash(
+        "What is LightRAG?", QueryParam(), {}, None
+    )
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"query": "What is GraphRAG?"},
+        {"mode": "naive"},
+        {"only_need_context": True},
+        {"only_need_prompt": True},
+        {"response_type": "Bullet Points"},
+        {"top_k": 7},
+        {"max_token_for_text_unit": 100},
+        {"max_token_for_global_context": 100},
+        {"max_token_for_local_context": 100},
+        {"hl_keywords": ["graphs"]},
+        {"ll_keywords": ["lightrag"]},
+        {"conversation_history": [{"role": "user", "content": "Hi"}]},
+        {"history_turns": 1},
+        {"ids": ["doc-1"]},
+        {"user_prompt": "Answer in French"},
+        {"model_func": _other_model},
+        {"system_prompt": "You are terse"},
+        {"kb_version": 1},
+    ],
+    ids=lambda changes: next(iter(changes)),
+)
+def test_answer_affecting_changes_give_a_new_hash(changes):
+    assert _hash(**changes) != _hash()
+
+
+def test_streaming_and_timeouts_share_the_cached_answer():
+    assert _hash(stream=True) == _hash()
+    assert _hash(retrieval_timeout=5.0) == _hash()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,70 @@
+"""
+Tests of the query embedding of the retrieval planner: every query text is embedded with
+the embedding_func of the storage it searches, and storages sharing an embedding_func
+get all their texts embedded in a single call.
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.operate import _embed_query_texts
+
+
+def _embedding_func(calls, offset):
+    async def embed(texts, _priority=None):
+        calls.append(list(texts))
+        return np.array([[len(text) + offset, 1.0] for text in texts])
+
+    return embed
+
+
+def test_storages_sharing_an_embedding_func_are_embedded_in_one_call():
+    calls = []
+    shared = _embedding_func(calls, 0.0)
+    entities_vdb = SimpleNamespace(namespace="entities", embedding_func=shared)
+    relationships_vdb = SimpleNamespace(
+        namespace="relationships", embedding_func=shared
+    )
+
+    embeddings = asyncio.run(
+        _embed_query_texts(
+            [(entities_vdb, "alice, bob"), (relationships_vdb, "friendship")]
+        )
+    )
+
+    assert calls == [["alice, bob", "friendship"]]
+    assert embeddings[("entities", "alice, bob")][0] == len("alice, bob")
+    assert embeddings[("relationships", "friendship")][0] == len("friendship")
+
+
+def test_each_storage_is_embedded_with_its_own_embedding_func():
+    entity_calls, chunk_calls = [], []
+    entities_vdb = SimpleNamespace(
+        namespace="entities", embedding_func=_embedding_func(entity_calls, 0.0)
+    )
+    chunks_vdb = SimpleNamespace(
+        namespace="chunks", embedding_func=_embedding_func(chunk_calls, 100.0)
+    )
+
+    embeddings = asyncio.run(
+        _embed_query_texts(
+            [(entities_vdb, "alice"), (chunks_vdb, "alice"), (chunks_vdb, "")]
+        )
+    )
+
+    assert entity_calls == [["alice"]]
+    assert chunk_calls == [["alice"]]
+    assert embeddings[("entities", "alice")][0] == len("alice")
+    assert embeddings[("chunks", "alice")][0] == len("alice") + 100.0
+    assert ("chunks", "") not in embeddings
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
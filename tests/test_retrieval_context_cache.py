@@ -0,0 +1,112 @@
+"""
+Tests of the retrieval context cache: LRU eviction and expiry of RetrievalContextCache,
+and the keys of _retrieval_cache_key shared by queries with the same keywords.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.base import QueryParam
+from lightrag.operate import _retrieval_cache_key
+from lightrag.utils import RetrievalContextCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("lightrag.utils.time.time", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = RetrievalContextCache(max_entries=2, ttl=0)
+    cache.put("a", "context a")
+    cache.put("b", "context b")
+    assert cache.get("a") == "context a"
+    cache.put("c", "context c")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "context a"
+    assert cache.get("c") == "context c"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = RetrievalContextCache(max_entries=10, ttl=60)
+    cache.put("a", "context a")
+    clock[0] += 60
+    assert cache.get("a") == "context a"
+    clock[0] += 1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_zero_ttl_never_expires(clock):
+    cache = RetrievalContextCache(max_entries=10, ttl=0)
+    cache.put("a", "context a")
+    clock[0] += 10**9
+    assert cache.get("a") == "context a"
+
+
+def test_zero_max_entries_disables_the_cache():
+    cache = RetrievalContextCache(max_entries=0, ttl=0)
+    cache.put("a", "context a")
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_clear_drops_all_entries():
+    cache = RetrievalContextCache(max_entries=10, ttl=0)
+    cache.put("a", "context a")
+    cache.clear()
+    assert cache.get("a") is None
+
+
+def _key(ll="Alice, Bob", hl="friendship", kb_version=0, original_query=None, **param):
+    query_param = QueryParam(**param)
+    if original_query is not None:
+        query_param.original_query = original_query
+    return _retrieval_cache_key(ll, hl, query_param, kb_version)
+
+
+def test_keywords_are_normalized():
+    assert _key(ll=" bob,ALICE,, alice ", hl="Friendship") == _key()
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"ll": "Alice"},
+        {"hl": "rivalry"},
+        {"mode": "local"},
+        {"top_k": 7},
+        {"max_token_for_text_unit": 100},
+        {"max_token_for_global_context": 100},
+        {"max_token_for_local_context": 100},
+        {"ids": ["doc-1"]},
+        {"kb_version": 1},
+    ],
+    ids=lambda changes: next(iter(changes)),
+)
+def test_retrieval_changes_give_a_new_key(changes):
+    assert _key(**changes) != _key()
+
+
+def test_answer_only_parameters_share_the_key():
+    assert _key(response_type="Bullet Points", stream=True, user_prompt="Hi") == _key()
+
+
+def test_original_query_is_part_of_the_key_in_mix_mode_only():
+    assert _key(mode="mix", original_query="a") != _key(mode="mix", original_query="b")
+    assert _key(mode="hybrid", original_query="a") == _key(
+        mode="hybrid", original_query="b"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
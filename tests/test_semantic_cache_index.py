@@ -0,0 +1,221 @@
+"""
+Tests of SemanticCacheIndex: the most similar cached prompt is found within its cache
+type and scope, the index follows added, overwritten and removed cache entries, and
+query entries older than the ttl are skipped. handle_cache only embeds prompts for
+storages able to list their cache entries.
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import (
+    CacheData,
+    SemanticCacheIndex,
+    handle_cache,
+    make_cache_key,
+    quantize_embedding,
+    save_to_cache,
+)
+
+DIM = 16
+VECTORS = np.random.RandomState(0).normal(size=(40, DIM))
+
+
+def _entry(vector, cache_type="query", cache_scope=None, created_at=1000):
+    quantized, min_val, max_val = quantize_embedding(np.asarray(vector))
+    return {
+        "return": "cached answer",
+        "embedding": quantized.tobytes().hex(),
+        "embedding_shape": quantized.shape,
+        "embedding_min": min_val,
+        "embedding_max": max_val,
+        "cache_type": cache_type,
+        "cache_scope": cache_scope,
+        "created_at": created_at,
+    }
+
+
+def _index(count):
+    index = SemanticCacheIndex()
+    index.add({f"entry-{i}": _entry(VECTORS[i]) for i in range(count)})
+    return index
+
+
+def test_search_finds_the_most_similar_entry():
+    # More entries than the initial buffer, the rows are copied when it grows
+    index = _index(len(VECTORS))
+    assert len(index) == len(VECTORS)
+    for i in (0, 17, 39):
+        cache_id, similarity = index.search(VECTORS[i] + 0.01)
+        assert cache_id == f"entry-{i}"
+        assert similarity > 0.98
+
+
+def test_search_is_limited_to_the_cache_type_and_scope():
+    index = SemanticCacheIndex()
+    index.add(
+        {
+            "query": _entry(VECTORS[0]),
+            "keywords": _entry(VECTORS[0] + 0.1, cache_type="keywords"),
+            "scoped": _entry(VECTORS[0] + 0.2, cache_scope="project-a"),
+        }
+    )
+    assert index.search(VECTORS[0], cache_type="keywords")[0] == "keywords"
+    assert index.search(VECTORS[0], cache_type="query")[0] == "query"
+    assert index.search(VECTORS[0], cache_scope="project-a")[0] == "scoped"
+    assert index.search(VECTORS[0], cache_scope="project-b") is None
+    assert index.search(VECTORS[0], cache_type="extract") is None
+
+
+def test_discard_and_overwrite_update_the_rows():
+    index = _index(5)
+    index.discard(["entry-1", "entry-3", "missing"])
+    assert len(index) == 3
+    assert index.search(VECTORS[1])[0] != "entry-1"
+    assert index.search(VECTORS[4])[0] == "entry-4"
+
+    index.add({"entry-0": _entry(VECTORS[3])})
+    assert len(index) == 3
+    assert index.search(VECTORS[3])[0] == "entry-0"
+    assert index.search(VECTORS[0])[0] != "entry-0"
+
+
+def test_sync_follows_the_cache_content():
+    index = _index(3)
+    mode_cache = {
+        "entry-1": _entry(VECTORS[1]),
+        "entry-5": _entry(VECTORS[5]),
+        "invalid": {"return": "no embedding", "embedding": None},
+    }
+    index.sync(mode_cache)
+    assert len(index) == 2
+    assert index.search(VECTORS[0])[0] != "entry-0"
+    assert index.search(VECTORS[5])[0] == "entry-5"
+
+    # Entries without a valid embedding are remembered and not decoded again
+    index.sync(mode_cache)
+    assert len(index) == 2
+
+
+def test_entries_of_another_dimension_are_skipped():
+    index = _index(2)
+    index.add({"other-dim": _entry(np.arange(DIM + 1, dtype=float))})
+    assert len(index) == 2
+    assert index.search(np.ones(DIM + 1)) is None
+
+
+def test_expired_query_entries_are_skipped(monkeypatch):
+    monkeypatch.setattr("lightrag.utils.time.time", lambda: 2000)
+    index = SemanticCacheIndex()
+    index.add(
+        {
+            "old": _entry(VECTORS[0], created_at=1000),
+            "new": _entry(VECTORS[0] + 0.3, created_at=1900),
+            "old-keywords": _entry(VECTORS[0], "keywords", created_at=1000),
+        }
+    )
+    assert index.search(VECTORS[0], cache_type="query")[0] == "old"
+    assert index.search(VECTORS[0], cache_type="query", ttl=500)[0] == "new"
+    # The ttl only applies to query entries
+    assert index.search(VECTORS[0], cache_type="keywords", ttl=500)[0] == (
+        "old-keywords"
+    )
+    assert index.search(VECTORS[0], cache_type="query", ttl=50) is None
+
+
+def test_empty_index_and_zero_query_find_nothing():
+    assert SemanticCacheIndex().search(VECTORS[0]) is None
+    assert _index(2).search(np.zeros(DIM)) is None
+
+
+class _DictCache:
+    """LLM response cache storage kept in a dict, optionally unable to list entries by mode"""
+
+    def __init__(self, working_dir, can_list=True):
+        self.namespace = "llm_response_cache"
+        self.global_config = {
+            "working_dir": str(working_dir),
+            "enable_llm_cache": True,
+            "embedding_cache_config": {"enabled": True, "similarity_threshold": 0.9},
+        }
+        self.data = {}
+        self.embedded = []
+        self.can_list = can_list
+
+    async def embedding_func(self, texts, **kwargs):
+        self.embedded.extend(texts)
+        return np.array([VECTORS[len(text) % len(VECTORS)] for text in texts])
+
+    async def get_by_mode_and_id(self, mode, id):
+        entry = self.data.get(make_cache_key(mode, id))
+        return {id: entry} if entry is not None else None
+
+    async def get_by_mode(self, mode):
+        if not self.can_list:
+            raise NotImplementedError
+        prefix = make_cache_key(mode, "")
+        return {
+            key[len(prefix) :]: value
+            for key, value in self.data.items()
+            if key.startswith(prefix)
+        }
+
+    async def upsert(self, data):
+        self.data.update(data)
+
+
+async def _ask(cache, args_hash, prompt):
+    answer, quantized, min_val, max_val = await handle_cache(
+        cache, args_hash, prompt, mode="local", cache_type="query"
+    )
+    if answer is None:
+        await save_to_cache(
+            cache,
+            CacheData(
+                args_hash=args_hash,
+                content=f"answer to {prompt}",
+                prompt=prompt,
+                quantized=quantized,
+                min_val=min_val,
+                max_val=max_val,
+                mode="local",
+            ),
+        )
+    return answer
+
+
+def test_similar_prompt_is_answered_from_the_cache(tmp_path):
+    async def main():
+        cache = _DictCache(tmp_path)
+        first = await _ask(cache, "hash-1", "What is LightRAG?")
+        # Same length, the fake embedding is the same vector
+        second = await _ask(cache, "hash-2", "What is GraphRAG?")
+        return cache, first, second
+
+    cache, first, second = asyncio.run(main())
+    assert first is None
+    assert second == "answer to What is LightRAG?"
+    assert cache.embedded == ["What is LightRAG?", "What is GraphRAG?"]
+
+
+def test_prompts_are_not_embedded_for_storages_that_cannot_list_entries(tmp_path):
+    async def main():
+        cache = _DictCache(tmp_path, can_list=False)
+        await _ask(cache, "hash-1", "What is LightRAG?")
+        second = await _ask(cache, "hash-2", "What is GraphRAG?")
+        return cache, second
+
+    cache, second = asyncio.run(main())
+    assert second is None
+    assert cache.embedded == []
+    assert cache.data["local:hash-1"]["embedding"] is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,145 @@
+"""
+Tests of chunks shared by several documents: a shared chunk is extracted once, keeps the
+provenance of all its documents, and survives the deletion of one of them.
+"""
+
+import asyncio
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag import LightRAG
+from lightrag.kg.networkx_impl import NetworkXStorage
+from lightrag.kg.shared_storage import finalize_share_data, initialize_pipeline_status
+from lightrag.prompt import GRAPH_FIELD_SEP
+from lightrag.utils import EmbeddingFunc, Tokenizer, compute_mdhash_id
+
+FIRST_ONLY = "Alice met Bob in Paris."
+SHARED = "Carol works with Dave."
+SECOND_ONLY = "Eve likes Frank."
+
+
+class _CharTokenizer:
+    def encode(self, content):
+        return [ord(c) for c in content]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+def _extraction(text):
+    names = list(dict.fromkeys(re.findall(r"\b([A-Z][a-z]+)\b", text)))[:2]
+    records = [
+        f'("entity"<|>"{name}"<|>"person"<|>"{name} is a person")' for name in names
+    ]
+    if len(names) == 2:
+        records.append(
+            f'("relationship"<|>"{names[0]}"<|>"{names[1]}"<|>"knows"<|>"friends"<|>1)'
+        )
+    return "##".join(records) + "<|COMPLETE|>"
+
+
+async def _embed(texts):
+    return np.array([[len(text) % 7 + 1.0, 1.0, 2.0, 3.0] for text in texts])
+
+
+@pytest.fixture
+def rag_factory(tmp_path, monkeypatch):
+    async def upsert_document(self, doc_id, doc_data):
+        pass
+
+    # The document nodes are only written by the Neo4j storage
+    monkeypatch.setattr(NetworkXStorage, "upsert_document", upsert_document)
+    extracted = []
+
+    async def llm(prompt, system_prompt=None, history_messages=[], **kwargs):
+        if "---Real Data---" in prompt:
+            text = prompt.split("---Real Data---")[-1].split("Text:")[-1]
+            extracted.append(text)
+            return _extraction(text.split("######################")[0])
+        return "summary"
+
+    async def create():
+        rag = LightRAG(
+            working_dir=str(tmp_path),
+            llm_model_func=llm,
+            embedding_func=EmbeddingFunc(
+                embedding_dim=4, max_token_size=8192, func=_embed
+            ),
+            tokenizer=Tokenizer("char", _CharTokenizer()),
+            chunk_token_size=200,
+            chunk_overlap_token_size=0,
+            entity_extract_max_gleaning=0,
+            max_cpu_workers=0,
+        )
+        await rag.initialize_storages()
+        await initialize_pipeline_status()
+        return rag
+
+    yield create, extracted
+    finalize_share_data()
+
+
+async def _insert(rag, doc_id, paragraphs, file_path):
+    await rag.ainsert(
+        "\n\n".join(paragraphs),
+        ids=doc_id,
+        file_paths=file_path,
+        split_by_character="\n\n",
+        split_by_character_only=True,
+    )
+
+
+def test_deleting_a_document_keeps_chunks_shared_with_another_one(rag_factory):
+    create, extracted = rag_factory
+    shared_id = compute_mdhash_id(SHARED, prefix="chunk-")
+
+    async def main():
+        rag = await create()
+        try:
+            await _insert(rag, "doc-1", [FIRST_ONLY, SHARED], "first.txt")
+            await _insert(rag, "doc-2", [SHARED, SECOND_ONLY], "second.txt")
+            shared_before = await rag.text_chunks.get_by_id(shared_id)
+            await rag.adelete_by_doc_id("doc-1")
+
+            graph = rag.chunk_entity_relation_graph
+            return (
+                shared_before,
+                await rag.text_chunks.get_by_id(shared_id),
+                await rag.text_chunks.get_by_id(
+                    compute_mdhash_id(FIRST_ONLY, prefix="chunk-")
+                ),
+                {
+                    name: await graph.get_node(name)
+                    for name in ("Alice", "Carol", "Dave", "Eve")
+                },
+                await graph.get_edge("Carol", "Dave"),
+            )
+        finally:
+            await rag.finalize_storages()
+
+    shared_before, shared_after, first_only, nodes, shared_edge = asyncio.run(main())
+    # The shared chunk was extracted for the first document only
+    assert sum(SHARED in text for text in extracted) == 1
+    assert shared_before["full_doc_ids"] == ["doc-1", "doc-2"]
+    assert shared_before["file_paths"] == ["first.txt", "second.txt"]
+
+    assert first_only is None
+    assert shared_after["full_doc_id"] == "doc-2"
+    assert shared_after["full_doc_ids"] == ["doc-2"]
+    assert shared_after["file_paths"] == ["second.txt"]
+    assert nodes["Alice"] is None
+    assert nodes["Eve"] is not None
+    for name in ("Carol", "Dave"):
+        assert shared_id in nodes[name]["source_id"].split(GRAPH_FIELD_SEP)
+    assert shared_edge is not None
+    assert shared_edge["weight"] == 1.0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,104 @@
+"""
+Tests of TokenBudgetBatcher: items of concurrent callers are batched up to the token
+budget or the linger time, every caller gets its own result and batch failures reach
+all callers of the batch.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.utils import TokenBudgetBatcher
+
+
+def _processor(batches):
+    async def process_batch(items):
+        batches.append(list(items))
+        await asyncio.sleep(0)
+        return [item * 10 for item in items]
+
+    return process_batch
+
+
+def test_items_are_batched_up_to_the_token_budget():
+    async def main():
+        batcher = TokenBudgetBatcher(token_budget=10, linger=0.01)
+        batches = []
+        results = await asyncio.gather(
+            *(batcher.submit(i, 4, _processor(batches)) for i in range(5))
+        )
+        return results, batches
+
+    results, batches = asyncio.run(main())
+    assert results == [0, 10, 20, 30, 40]
+    assert batches == [[0, 1], [2, 3], [4]]
+
+
+def test_full_batch_is_processed_without_waiting_for_the_linger_time():
+    async def main():
+        batcher = TokenBudgetBatcher(token_budget=10, linger=60)
+        batches = []
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                batcher.submit(1, 5, _processor(batches)),
+                batcher.submit(2, 5, _processor(batches)),
+            ),
+            1,
+        )
+        return results, batches
+
+    results, batches = asyncio.run(main())
+    assert results == [10, 20]
+    assert batches == [[1, 2]]
+
+
+def test_open_batch_is_processed_after_the_linger_time():
+    async def main():
+        batcher = TokenBudgetBatcher(token_budget=100, linger=0.01)
+        batches = []
+        first = asyncio.create_task(batcher.submit(1, 1, _processor(batches)))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(batcher.submit(2, 1, _processor(batches)))
+        results = await asyncio.wait_for(asyncio.gather(first, second), 1)
+        late = await batcher.submit(3, 1, _processor(batches))
+        return results, late, batches
+
+    results, late, batches = asyncio.run(main())
+    assert results == [10, 20]
+    assert late == 30
+    assert batches == [[1, 2], [3]]
+
+
+def test_failed_batch_raises_to_all_its_callers():
+    async def main():
+        batcher = TokenBudgetBatcher(token_budget=100, linger=0.01)
+
+        async def process_batch(items):
+            raise ValueError("batch failed")
+
+        return await asyncio.gather(
+            batcher.submit(1, 1, process_batch),
+            batcher.submit(2, 1, process_batch),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert len(results) == 2
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_flush_of_empty_batch_does_nothing():
+    async def main():
+        batcher = TokenBudgetBatcher(token_budget=10, linger=0.01)
+        batcher.flush()
+        return await batcher.submit(1, 1, _processor([]))
+
+    assert asyncio.run(main()) == 10
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,122 @@
+"""
+Tests of the unchanged record skip of NanoVectorDBStorage.upsert: records whose content
+and meta fields did not change are neither embedded nor rewritten, also after a reload
+from disk, while changed, deleted and new records are embedded.
+"""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lightrag.kg.nano_vector_db_impl import NanoVectorDBStorage
+from lightrag.kg.shared_storage import finalize_share_data, initialize_share_data
+from lightrag.utils import EmbeddingFunc
+
+
+@pytest.fixture
+def storage_factory(tmp_path):
+    initialize_share_data()
+    embedded = []
+
+    async def embed(texts):
+        embedded.extend(texts)
+        return np.array([[len(text) % 7 + 1.0, 1.0, 2.0, 3.0] for text in texts])
+
+    async def create():
+        storage = NanoVectorDBStorage(
+            namespace="entities",
+            global_config={
+                "working_dir": str(tmp_path),
+                "embedding_batch_num": 10,
+                "vector_db_storage_cls_kwargs": {"cosine_better_than_threshold": 0.2},
+            },
+            embedding_func=EmbeddingFunc(
+                embedding_dim=4, max_token_size=8192, func=embed
+            ),
+            meta_fields={"entity_name", "source_id", "content"},
+        )
+        await storage.initialize()
+        return storage
+
+    yield create, embedded
+    finalize_share_data()
+
+
+def _record(name, description, source_id="chunk-1"):
+    return {
+        "entity_name": name,
+        "source_id": source_id,
+        "content": f"{name}\n{description}",
+    }
+
+
+def test_unchanged_records_are_not_embedded_again(storage_factory):
+    create, embedded = storage_factory
+
+    async def main():
+        storage = await create()
+        await storage.upsert(
+            {"ent-a": _record("Alice", "a person"), "ent-b": _record("Bob", "a cat")}
+        )
+        first = list(embedded)
+        embedded.clear()
+
+        await storage.upsert(
+            {
+                "ent-a": _record("Alice", "a person"),
+                "ent-b": _record("Bob", "a dog"),
+            }
+        )
+        changed_content = list(embedded)
+        embedded.clear()
+
+        await storage.upsert({"ent-a": _record("Alice", "a person", "chunk-2")})
+        changed_meta = list(embedded)
+        embedded.clear()
+
+        await storage.delete(["ent-a"])
+        await storage.upsert({"ent-a": _record("Alice", "a person", "chunk-2")})
+        deleted = list(embedded)
+        return (
+            first,
+            changed_content,
+            changed_meta,
+            deleted,
+            await storage.get_by_id("ent-a"),
+            await storage.get_by_id("ent-b"),
+        )
+
+    first, changed_content, changed_meta, deleted, alice, bob = asyncio.run(main())
+    assert len(first) == 2
+    assert changed_content == ["Bob\na dog"]
+    assert changed_meta == ["Alice\na person"]
+    assert deleted == ["Alice\na person"]
+    assert alice["source_id"] == "chunk-2"
+    assert bob["content"] == "Bob\na dog"
+
+
+def test_records_loaded_from_disk_are_not_embedded_again(storage_factory):
+    create, embedded = storage_factory
+
+    async def main():
+        storage = await create()
+        await storage.upsert({"ent-a": _record("Alice", "a person")})
+        await storage.index_done_callback()
+        embedded.clear()
+
+        reloaded = await create()
+        await reloaded.upsert(
+            {"ent-a": _record("Alice", "a person"), "ent-c": _record("Carol", "new")}
+        )
+        return list(embedded)
+
+    assert asyncio.run(main()) == ["Carol\nnew"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))